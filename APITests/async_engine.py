@@ -0,0 +1,316 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import aiohttp
+from requests.exceptions import InvalidSchema
+
+import transport
+from payload import ResponseBody, read_response_async
+from phases import aiohttp_trace_config
+from progress import current_tracker
+from retry import RequestPolicy, TimedResult, send_with_retries_async
+from timing import NANOSECONDS_PER_SECOND, elapsed_seconds
+from tracing import client_span
+
+
+def encode_params(params: dict) -> List[Tuple[str, str]]:
+    """
+    Encode query parameters the same way requests does, so that both engines send the same query string.
+    None values are dropped, booleans become "True"/"False" and lists become repeated keys.
+    Args:
+        params (dict): parameters of running a given api request
+    Returns:
+        list: list of (key, value) pairs
+    """
+    encoded = []
+    for key, value in (params or {}).items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            if item is not None:
+                encoded.append((key, str(item)))
+    return encoded
+
+
+def client_timeout(
+    timeout: Tuple[Optional[float], Optional[float]] = None
+) -> aiohttp.ClientTimeout:
+    """
+    Convert a requests timeout to an aiohttp timeout, so that both engines time out the same way
+    Args:
+        timeout (tuple, optional): default to None (no timeout). (connect timeout, read timeout) in seconds
+    Returns:
+        aiohttp.ClientTimeout: a timeout on connecting and on every read, without a limit on the whole request
+    """
+    connect_timeout, read_timeout = timeout or (None, None)
+    return aiohttp.ClientTimeout(
+        total=None, sock_connect=connect_timeout, sock_read=read_timeout
+    )
+
+
+async def fetch_async(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: dict,
+    headers: dict = None,
+    timeout: Tuple[Optional[float], Optional[float]] = None,
+) -> ResponseBody:
+    """
+    Trigger a get request. Same as utils.fetch for the async engine.
+    Args:
+        session (aiohttp.ClientSession): session used to send the request
+        url (str): the url to run a given api request
+        params (dict): parameter of running a given api request
+        headers (dict): headers used for API requests. For example, authorization headers.
+        timeout (tuple, optional): default to None (no timeout). (connect timeout, read timeout) in seconds
+    Returns:
+        ResponseBody: status code, size and read time of the response
+    """
+    with client_span("GET", url, headers) as span:
+        async with session.get(
+            url,
+            params=encode_params(params),
+            headers=span.headers,
+            timeout=client_timeout(timeout),
+        ) as response:
+            return span.record_response(await read_response_async(response))
+
+
+async def send_manifest_async(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: dict,
+    headers: dict = None,
+    manifest_path: str = None,
+    compression: str = None,
+    timeout: Tuple[Optional[float], Optional[float]] = None,
+) -> ResponseBody:
+    """
+    Upload a manifest with a post request. Same as utils.send_manifest for the async engine.
+    Args:
+        session (aiohttp.ClientSession): session used to send the request
+        url (str): the url to run a given api request
+        params (dict): parameters of running the post request
+        headers (dict): headers used for API requests. For example, authorization headers.
+        manifest_path (str): full file path of a manifest
+        compression (str, optional): default to None. if "gzip" or "zstd", the manifest is compressed with this codec
+        timeout (tuple, optional): default to None (no timeout). (connect timeout, read timeout) in seconds
+    Returns:
+        ResponseBody: status code, size and read time of the response
+    """
+    payload = transport.load_manifest_payload(manifest_path, compression)
+    with client_span("POST", url, payload.headers(headers)) as span:
+        async with session.post(
+            url,
+            params=encode_params(params),
+            headers=span.headers,
+            data=payload.body,
+            timeout=client_timeout(timeout),
+        ) as response:
+            return span.record_response(
+                await read_response_async(response, len(payload.body)),
+                len(payload.body),
+            )
+
+
+async def timed_request_async(
+    request_func: Callable[..., Awaitable[ResponseBody]],
+    *args,
+    intended_start_ns: int = None,
+    policy: RequestPolicy = None,
+) -> TimedResult:
+    """
+    Send a single request, retrying it as allowed by the policy, and measure how long it takes
+    Args:
+        request_func (Callable): a coroutine function that sends a request. For example, fetch_async
+        args: arguments passed to request_func
+        intended_start_ns (int, optional): default to None. time.perf_counter_ns() value at which the request was scheduled to be sent.
+            If set, latency is measured from this time so that time spent waiting to be sent is included.
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the request
+    Returns:
+        TimedResult: status code of the response (or the exception raised if the request failed, for example a timeout),
+            latency with and without retries and number of retries
+    """
+    start_ns = (
+        time.perf_counter_ns() if intended_start_ns is None else intended_start_ns
+    )
+    # the live dashboard, if one is shown (see progress.Dashboard)
+    tracker = current_tracker()
+    if tracker is not None:
+        tracker.started()
+    result = await send_with_retries_async(
+        request_func, args, policy or RequestPolicy(), start_ns
+    )
+    if tracker is not None:
+        tracker.finished(result.latency, result.response)
+    return result
+
+
+def client_session() -> aiohttp.ClientSession:
+    """
+    Create a session for the async engine. Must be called from a running event loop.
+    Returns:
+        aiohttp.ClientSession: a session without a limit on the number of connections that records the phases of every request
+    """
+    # no limit on the number of connections so that every request is in flight at the same time
+    connector = aiohttp.TCPConnector(
+        limit=0, force_close=not transport.USE_CONNECTION_POOL
+    )
+    # every request sets its own timeout (see client_timeout)
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=client_timeout(),
+        # responses are decompressed by read_response_async, which counts the bytes received
+        auto_decompress=False,
+        trace_configs=[aiohttp_trace_config()],
+    )
+
+
+async def run_concurrent_requests(
+    request_func: Callable[..., Awaitable[ResponseBody]],
+    concurrent_requests: int,
+    *args,
+    policy: RequestPolicy = None,
+) -> List[TimedResult]:
+    """
+    Send concurrent requests from one event loop
+    Args:
+        request_func (Callable): a coroutine function that sends a request. For example, fetch_async
+        concurrent_requests (int): number of requests to send at the same time
+        args: arguments passed to request_func after the session
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+    Returns:
+        list: status code (or exception raised), latency and retries of every request
+    """
+    async with client_session() as session:
+        try:
+            return await asyncio.gather(
+                *(
+                    timed_request_async(request_func, session, *args, policy=policy)
+                    for _ in range(concurrent_requests)
+                )
+            )
+        except aiohttp.InvalidURL as err:
+            raise InvalidSchema(
+                f"No connection adapters were found for {err.url}. Please make sure that your URL is correct. "
+            )
+
+
+async def send_requests_at_rate(
+    request_func: Callable[..., Awaitable[ResponseBody]],
+    schedule: List[float],
+    *args,
+    policy: RequestPolicy = None,
+) -> List[TimedResult]:
+    """
+    Send requests at the times given by a schedule, whether or not earlier requests have finished
+    Args:
+        request_func (Callable): a coroutine function that sends a request. For example, fetch_async
+        schedule (list): offset in seconds from the start of the run of every request
+        args: arguments passed to request_func after the session
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+    Returns:
+        list: status code (or exception raised), latency (measured from the scheduled time) and retries of every request
+    """
+    async with client_session() as session:
+        tasks = []
+        run_start_ns = time.perf_counter_ns()
+        for offset in schedule:
+            intended_start_ns = run_start_ns + round(offset * NANOSECONDS_PER_SECOND)
+            delay = elapsed_seconds(time.perf_counter_ns(), intended_start_ns)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(
+                asyncio.create_task(
+                    timed_request_async(
+                        request_func,
+                        session,
+                        *args,
+                        intended_start_ns=intended_start_ns,
+                        policy=policy,
+                    )
+                )
+            )
+        return await asyncio.gather(*tasks)
+
+
+def run_requests_at_rate(
+    request_func: Callable[..., Awaitable[ResponseBody]],
+    schedule: List[float],
+    *args,
+    policy: RequestPolicy = None,
+) -> List[TimedResult]:
+    """
+    Send requests at a constant arrival rate with the async engine
+    Args:
+        request_func (Callable): a coroutine function that sends a request. For example, fetch_async
+        schedule (list): offset in seconds from the start of the run of every request
+        args: arguments passed to request_func after the session
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+    Returns:
+        list: status code (or exception raised), latency (measured from the scheduled time) and retries of every request
+    """
+    return asyncio.run(
+        send_requests_at_rate(request_func, schedule, *args, policy=policy)
+    )
+
+
+def run_get_requests(
+    url: str,
+    params: dict,
+    concurrent_requests: int,
+    headers: dict = None,
+    policy: RequestPolicy = None,
+) -> List[TimedResult]:
+    """
+    Send concurrent get requests with the async engine
+    Args:
+        url (str): the url that users want to access
+        params (dict): the parameters need to use for the request
+        concurrent_requests (int): number of concurrent requests
+        headers (dict): headers used for API requests. For example, authorization headers.
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+    Returns:
+        list: status code (or exception raised), latency and retries of every request
+    """
+    return asyncio.run(
+        run_concurrent_requests(
+            fetch_async, concurrent_requests, url, params, headers, policy=policy
+        )
+    )
+
+
+def run_post_requests(
+    url: str,
+    params: dict,
+    concurrent_requests: int,
+    manifest_path: str,
+    headers: dict = None,
+    policy: RequestPolicy = None,
+    compression: str = None,
+) -> List[TimedResult]:
+    """
+    Send concurrent post requests that upload a manifest with the async engine
+    Args:
+        url (str): the url that users want to access
+        params (dict): the parameters need to use for the request
+        concurrent_requests (int): number of concurrent requests
+        manifest_path (str): full file path of the manifest to upload
+        headers (dict): headers used for API requests. For example, authorization headers.
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+        compression (str, optional): default to None. if "gzip" or "zstd", the manifest is compressed with this codec
+    Returns:
+        list: status code (or exception raised), latency and retries of every request
+    """
+    return asyncio.run(
+        run_concurrent_requests(
+            send_manifest_async,
+            concurrent_requests,
+            url,
+            params,
+            headers,
+            manifest_path,
+            compression,
+            policy=policy,
+        )
+    )
@@ -0,0 +1,239 @@
+import argparse
+import csv
+import logging
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Callable, List, Optional, Tuple
+
+from results_store import ResultsStore, SynapseSync
+from scenario_catalog import (
+    ScenarioSpec,
+    add_catalog_arguments,
+    run_scenario,
+    select_scenarios,
+)
+from transport import IDENTITY, REQUEST_CODECS, check_compression
+from utils import Row, row_to_dict
+
+logger = logging.getLogger("compression-benchmark")
+
+# scenarios compared when none are selected on the command line: uploads of the test manifests and of the
+# synthetic larger manifests
+DEFAULT_ENDPOINTS = ["model/submit"]
+
+
+def relative_change(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    """
+    Get the change from one value to another as a fraction of the first one. For example, -0.25 if after is 25% lower
+    """
+    if not before or after is None:
+        return None
+    return round(after / before - 1, 4)
+
+
+@dataclass
+class CompressionComparison:
+    """
+    Latency and bandwidth of a scenario run without and with compression
+    """
+
+    scenario: str
+    codec: str
+    num_rows: Optional[int]
+    latency_p50_identity: Optional[float]
+    latency_p50_compressed: Optional[float]
+    latency_p99_identity: Optional[float]
+    latency_p99_compressed: Optional[float]
+    request_bytes_identity: Optional[int]
+    request_bytes_compressed: Optional[int]
+    response_bytes_identity: Optional[int]
+    response_bytes_compressed: Optional[int]
+    num_errors_identity: int
+    num_errors_compressed: int
+
+    @classmethod
+    def from_rows(
+        cls, spec: ScenarioSpec, codec: str, identity_row: Row, compressed_row: Row
+    ) -> "CompressionComparison":
+        """
+        Compare the result rows of a pair of runs
+        Args:
+            spec (ScenarioSpec): the scenario of the runs
+            codec (str): codec of the compressed run
+            identity_row (Row): result row of the run without compression
+            compressed_row (Row): result row of the run with compression
+        Returns:
+            CompressionComparison: the comparison of the runs
+        """
+        identity = row_to_dict(identity_row)
+        compressed = row_to_dict(compressed_row)
+        return cls(
+            scenario=spec.name,
+            codec=codec,
+            num_rows=identity["num_rows"],
+            latency_p50_identity=identity["latency_p50"],
+            latency_p50_compressed=compressed["latency_p50"],
+            latency_p99_identity=identity["latency_p99"],
+            latency_p99_compressed=compressed["latency_p99"],
+            request_bytes_identity=identity["request_bytes_total"],
+            request_bytes_compressed=compressed["request_bytes_total"],
+            response_bytes_identity=identity["response_bytes_total"],
+            response_bytes_compressed=compressed["response_bytes_total"],
+            num_errors_identity=identity["num_errors"],
+            num_errors_compressed=compressed["num_errors"],
+        )
+
+    @property
+    def latency_p50_change(self) -> Optional[float]:
+        return relative_change(self.latency_p50_identity, self.latency_p50_compressed)
+
+    @property
+    def latency_p99_change(self) -> Optional[float]:
+        return relative_change(self.latency_p99_identity, self.latency_p99_compressed)
+
+    @property
+    def bytes_change(self) -> Optional[float]:
+        """
+        Change of the bytes sent and received by the run
+        """
+        identity_bytes = (self.request_bytes_identity or 0) + (
+            self.response_bytes_identity or 0
+        )
+        compressed_bytes = (self.request_bytes_compressed or 0) + (
+            self.response_bytes_compressed or 0
+        )
+        return relative_change(identity_bytes, compressed_bytes)
+
+
+def paired_specs(spec: ScenarioSpec, codec: str) -> Tuple[ScenarioSpec, ScenarioSpec]:
+    """
+    Get the two runs of a scenario that are compared
+    Args:
+        spec (ScenarioSpec): the scenario
+        codec (str): one of transport.REQUEST_CODECS
+    Returns:
+        tuple: the run without compression and the run with compression
+    """
+    return (
+        replace(spec, name=f"{spec.name}-{IDENTITY}", compression=IDENTITY),
+        replace(spec, name=f"{spec.name}-{codec}", compression=codec),
+    )
+
+
+def run_pairs(
+    specs: List[ScenarioSpec],
+    codec: str = "gzip",
+    repeats: int = 1,
+    run_func: Callable[[ScenarioSpec], Row] = run_scenario,
+) -> List[Tuple[CompressionComparison, Row, Row]]:
+    """
+    Run every scenario without and with compression, one run right after the other.
+    The order of the two runs alternates between repeats, so that a server warming up or slowing down over time
+    does not favor one of them.
+    Args:
+        specs (list): the scenarios to compare
+        codec (str, optional): default to "gzip". codec of the compressed runs
+        repeats (int, optional): default to 1. number of pairs of runs of every scenario
+        run_func (Callable, optional): default to run_scenario. function that runs a scenario and returns its row
+    Returns:
+        list: the comparison and the two result rows of every pair of runs
+    """
+    check_compression(codec)
+    if codec not in REQUEST_CODECS:
+        raise ValueError(f"Unknown codec {codec}. Please use one of {REQUEST_CODECS}")
+
+    pairs = []
+    for spec in specs:
+        identity_spec, compressed_spec = paired_specs(spec, codec)
+        for repeat in range(repeats):
+            order = [identity_spec, compressed_spec]
+            if repeat % 2:
+                order.reverse()
+            rows = {}
+            for i, run_spec in enumerate(order):
+                if i and spec.cooldown:
+                    time.sleep(spec.cooldown)
+                logger.info(f"Running {run_spec.name} ({repeat + 1}/{repeats})")
+                rows[run_spec.compression] = run_func(run_spec)
+            comparison = CompressionComparison.from_rows(
+                spec, codec, rows[IDENTITY], rows[codec]
+            )
+            pairs.append((comparison, rows[IDENTITY], rows[codec]))
+            if spec.cooldown:
+                time.sleep(spec.cooldown)
+    return pairs
+
+
+def format_change(change: Optional[float]) -> str:
+    return "n/a" if change is None else f"{change:+.1%}"
+
+
+def report_comparisons(
+    comparisons: List[CompressionComparison], output_path: str = None
+) -> None:
+    """
+    Log the latency and bandwidth difference of every pair of runs
+    Args:
+        comparisons (list): comparisons returned by run_pairs
+        output_path (str, optional): default to None. if set, the comparisons are also written to this csv file
+    """
+    for comparison in comparisons:
+        logger.info(
+            f"{comparison.scenario} ({comparison.num_rows} rows) with {comparison.codec}: "
+            f"p50 {comparison.latency_p50_identity} -> {comparison.latency_p50_compressed} "
+            f"({format_change(comparison.latency_p50_change)}), "
+            f"p99 {comparison.latency_p99_identity} -> {comparison.latency_p99_compressed} "
+            f"({format_change(comparison.latency_p99_change)}), "
+            f"bytes sent and received {format_change(comparison.bytes_change)}, "
+            f"errors {comparison.num_errors_identity} -> {comparison.num_errors_compressed}"
+        )
+
+    if output_path:
+        fieldnames = list(CompressionComparison.__dataclass_fields__) + [
+            "latency_p50_change",
+            "latency_p99_change",
+            "bytes_change",
+        ]
+        with open(output_path, "w", newline="") as output:
+            writer = csv.DictWriter(output, fieldnames=fieldnames)
+            writer.writeheader()
+            for comparison in comparisons:
+                writer.writerow(
+                    {
+                        **asdict(comparison),
+                        "latency_p50_change": comparison.latency_p50_change,
+                        "latency_p99_change": comparison.latency_p99_change,
+                        "bytes_change": comparison.bytes_change,
+                    }
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run scenarios without and with compression and compare their latency and bandwidth"
+    )
+    add_catalog_arguments(parser)
+    parser.add_argument(
+        "--codec",
+        choices=REQUEST_CODECS,
+        default="gzip",
+        help="codec of the compressed runs",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=1, help="number of pairs of runs per scenario"
+    )
+    parser.add_argument("--output", help="csv file to write the comparisons to")
+    args = parser.parse_args()
+    if not (args.tag or args.endpoint or args.scenario):
+        args.endpoint = DEFAULT_ENDPOINTS
+
+    store = ResultsStore()
+    synapse_sync = SynapseSync(store)
+    synapse_sync.start()
+    try:
+        pairs = run_pairs(select_scenarios(args), args.codec, args.repeats)
+        for _, identity_row, compressed_row in pairs:
+            store.insert_rows([identity_row, compressed_row])
+    finally:
+        synapse_sync.close()
+    report_comparisons([comparison for comparison, _, _ in pairs], args.output)
@@ -0,0 +1,393 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from dataclasses import asdict
+from multiprocessing.connection import Client, Connection, Listener
+from typing import List, Optional, Tuple
+
+from scenario_catalog import (
+    ScenarioSpec,
+    save_scenario_result,
+    send_scenario_requests,
+    warm_up_scenario,
+)
+from outcomes import OutcomeCounter
+from progress import Dashboard
+from resources import monitor_resources
+from stats import LatencyStats, ThroughputStats
+from timing import RunWindow
+from transport import load_manifest_payload
+from utils import Row, get_test_manifest_path, return_time_now
+
+logger = logging.getLogger("distributed")
+
+# address the coordinator listens on when none is given
+DEFAULT_COORDINATOR_ADDRESS = ("127.0.0.1", 5555)
+# shared secret checked when a worker connects to the coordinator
+AUTHKEY = os.environ.get("PROFILER_DISTRIBUTED_AUTHKEY", "schematic-profiler").encode()
+# seconds the coordinator waits for all workers to connect
+WORKER_CONNECT_TIMEOUT = 60
+# seconds between the start message and the start of the load, so that all workers start at the same time
+START_DELAY = 0.2
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """
+    Parse an address given as host:port
+    """
+    host, _, port = address.rpartition(":")
+    return host or DEFAULT_COORDINATOR_ADDRESS[0], int(port)
+
+
+def send_message(connection: Connection, message: dict) -> None:
+    # messages are json, so workers and coordinator can run different python versions
+    connection.send_bytes(json.dumps(message).encode())
+
+
+def receive_message(connection: Connection) -> dict:
+    return json.loads(connection.recv_bytes())
+
+
+def split_load(concurrent_threads: int, num_workers: int) -> List[int]:
+    """
+    Split the requests of a run between workers
+    Args:
+        concurrent_threads (int): number of concurrent requests of the run
+        num_workers (int): number of workers
+    Returns:
+        list: number of requests of every worker. The shares differ by at most one request.
+    """
+    share, extra = divmod(concurrent_threads, num_workers)
+    return [share + (1 if i < extra else 0) for i in range(num_workers)]
+
+
+def spec_to_dict(spec: ScenarioSpec) -> dict:
+    return asdict(spec)
+
+
+def spec_from_dict(values: dict) -> ScenarioSpec:
+    return ScenarioSpec(
+        **{
+            **values,
+            "tags": tuple(values["tags"]),
+            "exclusive": tuple(values["exclusive"]),
+        }
+    )
+
+
+def merge_results(
+    results: List[dict],
+) -> Tuple[str, float, OutcomeCounter, LatencyStats, Optional[int], ThroughputStats]:
+    """
+    Merge the results of the workers of a run. Histograms and outcome counts are added, so the merged percentiles are the
+    percentiles of all requests, not an average of the percentiles of every worker.
+    Args:
+        results (list): result messages of the workers
+    Returns:
+        dt_string (str): start time of the first worker.
+        time_diff (float): time from the start of the first worker to the end of the last worker, in seconds.
+        status_code_dict (OutcomeCounter): number of requests and latency of every outcome.
+        latency_stats (LatencyStats): latency distribution of all requests.
+        num_rows (int): number of rows of the uploaded manifest.
+        throughput (ThroughputStats): throughput of all workers together.
+    """
+    latency_stats = LatencyStats()
+    status_code_dict = OutcomeCounter()
+    window = None
+    for result in results:
+        latency_stats.merge(LatencyStats.from_dict(result["latency_stats"]))
+        status_code_dict.merge(OutcomeCounter.from_dict(result["status_code_dict"]))
+        # clocks of workers on different hosts should be synchronized (for example with NTP)
+        window = RunWindow.from_dict(result["window"]).merge(window)
+    status_code_dict.window = window
+
+    throughput = ThroughputStats(
+        completed=status_code_dict.total, elapsed=window.duration
+    )
+    return (
+        return_time_now(epoch_ns=window.start_ns),
+        round(window.duration, 4),
+        status_code_dict,
+        latency_stats,
+        results[0]["num_rows"],
+        throughput,
+    )
+
+
+def prepare_scenario(spec: ScenarioSpec) -> None:
+    """
+    Generate and load the manifest of a scenario before its load starts, so that workers start at the same time
+    """
+    if spec.method == "post":
+        load_manifest_payload(
+            get_test_manifest_path(spec.manifest_path()), spec.compression
+        )
+
+
+def run_worker(
+    address: Tuple[str, int] = DEFAULT_COORDINATOR_ADDRESS,
+    authkey: bytes = AUTHKEY,
+    name: str = None,
+) -> None:
+    """
+    Connect to a coordinator and run the share of the load it sends until it stops the worker
+    Args:
+        address (tuple, optional): default to DEFAULT_COORDINATOR_ADDRESS. (host, port) of the coordinator
+        authkey (bytes, optional): default to AUTHKEY. shared secret of the coordinator
+        name (str, optional): default to host-pid. name of the worker in the coordinator logs
+    """
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    with Client(address, authkey=authkey) as connection:
+        send_message(connection, {"type": "hello", "worker": name})
+        logger.info(f"Worker {name} connected to {address}")
+        while True:
+            message = receive_message(connection)
+            if message["type"] == "stop":
+                break
+            spec = spec_from_dict(message["spec"])
+            try:
+                prepare_scenario(spec)
+            except Exception as err:
+                logger.exception(f"Worker {name} could not prepare {spec.name}")
+                send_message(connection, {"type": "error", "message": repr(err)})
+                continue
+            send_message(connection, {"type": "ready"})
+
+            start = receive_message(connection)
+            if start["type"] != "start":
+                continue
+            time.sleep(max(start["start_at"] - time.time(), 0))
+            try:
+                # the requests are timed with the monotonic clock, and their window is sent in nanoseconds since the
+                # epoch so that the coordinator can merge the windows of workers on other hosts
+                (
+                    _,
+                    _,
+                    status_code_dict,
+                    latency_stats,
+                    num_rows,
+                ) = send_scenario_requests(
+                    spec, message["concurrent_threads"], message["url"]
+                )
+            except Exception as err:
+                logger.exception(f"Worker {name} failed to run {spec.name}")
+                send_message(connection, {"type": "error", "message": repr(err)})
+                continue
+            send_message(
+                connection,
+                {
+                    "type": "result",
+                    "worker": name,
+                    "window": status_code_dict.window.to_dict(),
+                    "status_code_dict": status_code_dict.to_dict(),
+                    "latency_stats": latency_stats.to_dict(),
+                    "num_rows": num_rows,
+                },
+            )
+
+
+def spawn_local_workers(
+    num_workers: int,
+    address: Tuple[str, int] = DEFAULT_COORDINATOR_ADDRESS,
+    authkey: bytes = AUTHKEY,
+) -> List[multiprocessing.Process]:
+    """
+    Start workers as local processes, for example to use several cores of one machine or to test the coordinator
+    Args:
+        num_workers (int): number of worker processes
+        address (tuple, optional): default to DEFAULT_COORDINATOR_ADDRESS. (host, port) of the coordinator
+        authkey (bytes, optional): default to AUTHKEY. shared secret of the coordinator
+    Returns:
+        list: the worker processes
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(address, authkey, f"local-{i}"),
+            name=f"profiler-worker-{i}",
+            daemon=True,
+        )
+        for i in range(num_workers)
+    ]
+    for process in processes:
+        process.start()
+    return processes
+
+
+class Coordinator:
+    """
+    Split the load of every scenario between workers and merge their results into one result row.
+    Workers can run in local processes (see spawn_local_workers) or on other hosts (python distributed.py worker).
+    Scenarios are run one at a time on all workers.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        address: Tuple[str, int] = DEFAULT_COORDINATOR_ADDRESS,
+        authkey: bytes = AUTHKEY,
+    ):
+        if num_workers < 1:
+            raise ValueError(f"At least one worker is needed, got {num_workers}")
+        self.num_workers = num_workers
+        self._listener = Listener(address, authkey=authkey)
+        # the port chosen by the system if port is 0
+        self.address = self._listener.address
+        self._connections: List[Connection] = []
+        self._lock = threading.Lock()
+
+    def _accept_workers(self) -> None:
+        while len(self._connections) < self.num_workers:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                # the listener was closed
+                return
+            except Exception:
+                logger.exception("A worker could not connect")
+                continue
+            hello = receive_message(connection)
+            self._connections.append(connection)
+            logger.info(
+                f"Worker {hello['worker']} connected "
+                f"({len(self._connections)}/{self.num_workers})"
+            )
+
+    def wait_for_workers(self, timeout: float = WORKER_CONNECT_TIMEOUT) -> None:
+        """
+        Wait until all workers are connected
+        Args:
+            timeout (float, optional): default to WORKER_CONNECT_TIMEOUT. seconds to wait
+        """
+        accept_thread = threading.Thread(target=self._accept_workers, daemon=True)
+        accept_thread.start()
+        accept_thread.join(timeout)
+        if len(self._connections) < self.num_workers:
+            self.close()
+            raise TimeoutError(
+                f"Only {len(self._connections)} of {self.num_workers} workers connected to {self.address}"
+            )
+
+    def _receive_all(self, connections: List[Connection]) -> List[dict]:
+        messages = [receive_message(connection) for connection in connections]
+        errors = [
+            message["message"] for message in messages if message["type"] == "error"
+        ]
+        if errors:
+            raise RuntimeError(f"Workers failed: {errors}")
+        return messages
+
+    def run_scenario(self, spec: ScenarioSpec) -> Row:
+        """
+        Run a scenario on all workers and record the merged result
+        Args:
+            spec (ScenarioSpec): the run spec. Its concurrent requests are split between the workers.
+        Returns:
+            Row: the result row of the run
+        """
+        with self._lock:
+            logger.info(f"Running scenario {spec.name} on {self.num_workers} workers")
+            # generate the synthetic manifest once, before the workers that share this file system look for it
+            spec.manifest_path()
+            # warm up from the coordinator, so that the server is warmed up once and not by every worker
+            cold_start = warm_up_scenario(spec)
+            shares = split_load(spec.concurrent_threads, len(self._connections))
+            jobs = [
+                (connection, share)
+                for connection, share in zip(self._connections, shares)
+                if share
+            ]
+            connections = [connection for connection, _ in jobs]
+            for connection, share in jobs:
+                send_message(
+                    connection,
+                    {
+                        "type": "job",
+                        "spec": spec_to_dict(spec),
+                        "url": spec.url,
+                        "concurrent_threads": share,
+                    },
+                )
+
+            replies = [receive_message(connection) for connection in connections]
+            errors = [reply["message"] for reply in replies if reply["type"] == "error"]
+            if errors:
+                for connection, reply in zip(connections, replies):
+                    if reply["type"] == "ready":
+                        send_message(connection, {"type": "cancel"})
+                raise RuntimeError(f"Workers could not prepare {spec.name}: {errors}")
+
+            start_at = time.time() + START_DELAY
+            for connection in connections:
+                send_message(connection, {"type": "start", "start_at": start_at})
+            # the coordinator samples the server while the workers send the load
+            with monitor_resources() as resources:
+                results = self._receive_all(connections)
+
+        (
+            dt_string,
+            time_diff,
+            status_code_dict,
+            latency_stats,
+            num_rows,
+            throughput,
+        ) = merge_results(results)
+        return save_scenario_result(
+            spec,
+            dt_string,
+            time_diff,
+            status_code_dict,
+            latency_stats,
+            num_rows,
+            throughput=throughput,
+            cold_start=cold_start,
+            resources=resources,
+        )
+
+    def close(self) -> None:
+        """
+        Stop the workers and stop listening
+        """
+        for connection in self._connections:
+            try:
+                send_message(connection, {"type": "stop"})
+                connection.close()
+            except OSError:
+                pass
+        self._connections = []
+        self._listener.close()
+
+    def __enter__(self) -> "Coordinator":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a worker that sends the load of a coordinator (see run_all_parallel.py --distributed-workers)"
+    )
+    parser.add_argument(
+        "--coordinator",
+        default="{}:{}".format(*DEFAULT_COORDINATOR_ADDRESS),
+        help="host:port of the coordinator",
+    )
+    parser.add_argument("--name", help="name of the worker in the coordinator logs")
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="show a live view of the requests sent by this worker, refreshed every second",
+    )
+    args = parser.parse_args()
+    if args.progress:
+        with Dashboard():
+            run_worker(parse_address(args.coordinator), name=args.name)
+    else:
+        run_worker(parse_address(args.coordinator), name=args.name)
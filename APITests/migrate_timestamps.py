@@ -0,0 +1,125 @@
+import argparse
+import logging
+import math
+from datetime import datetime
+from typing import Optional
+
+import pytz
+import synapseclient
+from synapseclient import Table
+
+from results_store import ResultsStore
+from timing import NANOSECONDS_PER_SECOND, RunWindow
+from utils import DT_STRING_FORMAT, DT_STRING_TIMEZONE, RESULT_TABLE_ID, StoreRuntime
+
+logger = logging.getLogger("migrate-timestamps")
+
+# names of the columns filled by the migration, in the order of RunWindow.to_row
+WINDOW_COLUMNS = ["start_time_utc", "end_time_utc", "start_time_ns", "end_time_ns"]
+
+
+def legacy_window(dt_string: str, latency: Optional[float]) -> Optional[RunWindow]:
+    """
+    Get the window of a run recorded before the start_time_* and end_time_* columns. Its dt_string is the start of the
+    run to the second, in DT_STRING_TIMEZONE, and its end is the start plus the latency of the run.
+    Args:
+        dt_string (str): start of the run, formatted as DT_STRING_FORMAT
+        latency (float): duration of the run in seconds, or None
+    Returns:
+        RunWindow: the window of the run, or None if dt_string cannot be parsed
+    """
+    try:
+        start = datetime.strptime(dt_string, DT_STRING_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    start_ns = (
+        int(pytz.timezone(DT_STRING_TIMEZONE).localize(start).timestamp())
+        * NANOSECONDS_PER_SECOND
+    )
+    if latency is None or math.isnan(latency):
+        latency = 0
+    return RunWindow(start_ns, start_ns + round(latency * NANOSECONDS_PER_SECOND))
+
+
+def migrate_store(store: ResultsStore) -> int:
+    """
+    Fill the start and end of the runs saved in the local results store without them
+    Args:
+        store (ResultsStore): the local results store
+    Returns:
+        int: number of rows filled
+    """
+    runs = store.connection.execute(
+        "SELECT id, dt_string, latency FROM results WHERE start_time_ns IS NULL"
+    ).fetchall()
+    updates = []
+    for run in runs:
+        window = legacy_window(run["dt_string"], run["latency"])
+        if window is None:
+            logger.warning(
+                f"Cannot parse the dt_string {run['dt_string']!r} of row {run['id']}"
+            )
+            continue
+        updates.append((*window.to_row(), run["id"]))
+    with store.connection as connection:
+        connection.executemany(
+            "UPDATE results SET "
+            + ", ".join(f"{name} = ?" for name in WINDOW_COLUMNS)
+            + " WHERE id = ?",
+            updates,
+        )
+    logger.info(f"Filled the start and end of {len(updates)} runs in {store.db_path}")
+    return len(updates)
+
+
+def migrate_synapse(syn: synapseclient.Synapse, table_id: str = RESULT_TABLE_ID) -> int:
+    """
+    Fill the start and end of the runs stored in the result table on synapse without them. The columns are added to
+    the table first if they are missing.
+    Args:
+        syn (synapseclient.Synapse): synapse object that is logged in
+        table_id (str, optional): default to RESULT_TABLE_ID. synapse id of the result table
+    Returns:
+        int: number of rows filled
+    """
+    table_schema = StoreRuntime.add_missing_columns(syn, syn.get(table_id))
+    results = syn.tableQuery(
+        f"SELECT dt_string, latency, {', '.join(WINDOW_COLUMNS)} FROM {table_id} "
+        "WHERE start_time_ns IS NULL"
+    )
+    runs = results.asDataFrame()
+    # nanoseconds since the epoch do not fit in the float64 columns pandas uses for integers with missing values
+    runs[WINDOW_COLUMNS] = runs[WINDOW_COLUMNS].astype(object)
+    filled = []
+    for index, run in runs.iterrows():
+        window = legacy_window(run["dt_string"], run["latency"])
+        if window is None:
+            logger.warning(
+                f"Cannot parse the dt_string {run['dt_string']!r} of row {index}"
+            )
+            continue
+        runs.loc[index, WINDOW_COLUMNS] = window.to_row()
+        filled.append(index)
+    if filled:
+        # rows are updated in place: the index of the data frame keeps their ROW_ID and ROW_VERSION
+        syn.store(Table(table_schema, runs.loc[filled], etag=results.etag))
+    logger.info(f"Filled the start and end of {len(filled)} runs in {table_id}")
+    return len(filled)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fill the start_time_* and end_time_* columns of the runs recorded before they were added, "
+        "from their dt_string and latency"
+    )
+    parser.add_argument(
+        "--synapse",
+        action="store_true",
+        help=f"also fill the result table on synapse ({RESULT_TABLE_ID})",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    migrate_store(ResultsStore())
+    if args.synapse:
+        migrate_synapse(StoreRuntime().login_synapse())
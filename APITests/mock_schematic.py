@@ -0,0 +1,431 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yaml
+import requests
+from aiohttp import web
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+    ExportTraceServiceResponse,
+)
+
+from resources import process_metrics_text
+
+logger = logging.getLogger("mock-schematic")
+
+# prefix of the schematic API routes, same as in BASE_URL
+API_PREFIX = "/v1"
+
+# latency distributions: "constant" (median), "uniform" (between min and max) or "lognormal" (median and sigma)
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "lognormal")
+
+
+@dataclass
+class EndpointBehavior:
+    """
+    How the mock server responds to one endpoint
+    """
+
+    latency: str = "lognormal"
+    median: float = 0.1
+    sigma: float = 0.5
+    min: float = 0.0
+    max: float = 1.0
+    # probability of responding with each error status code. For example, {500: 0.01, 503: 0.005}
+    error_rates: Dict[int, float] = field(default_factory=dict)
+    # size of the response body in bytes
+    response_bytes: int = 256
+    # compress responses with gzip or deflate when the client accepts it
+    compress: bool = False
+
+    def __post_init__(self):
+        if self.latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown latency distribution {self.latency}. Please use one of {LATENCY_DISTRIBUTIONS}"
+            )
+        self.error_rates = {
+            int(status): rate for status, rate in self.error_rates.items()
+        }
+        if sum(self.error_rates.values()) > 1:
+            raise ValueError("The sum of the error rates can not be greater than 1")
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """
+        Draw the latency of one response
+        Args:
+            rng (random.Random): random number generator of the server
+        Returns:
+            float: latency in seconds
+        """
+        if self.latency == "constant":
+            return self.median
+        if self.latency == "uniform":
+            return rng.uniform(self.min, self.max)
+        return rng.lognormvariate(0, self.sigma) * self.median
+
+    def sample_status(self, rng: random.Random) -> int:
+        """
+        Draw the status code of one response
+        Args:
+            rng (random.Random): random number generator of the server
+        Returns:
+            int: status code
+        """
+        draw = rng.random()
+        for status, rate in self.error_rates.items():
+            if draw < rate:
+                return status
+            draw -= rate
+        return 200
+
+
+# endpoints served by the mock server, their method and default behavior
+DEFAULT_BEHAVIORS: Dict[Tuple[str, str], EndpointBehavior] = {
+    ("GET", "/manifest/generate"): EndpointBehavior(median=2.0),
+    ("GET", "/storage/assets/tables"): EndpointBehavior(
+        median=1.0, response_bytes=1_000_000
+    ),
+    ("GET", "/storage/project/datasets"): EndpointBehavior(median=0.5),
+    ("POST", "/model/validate"): EndpointBehavior(median=5.0),
+    ("POST", "/model/submit"): EndpointBehavior(median=10.0),
+}
+
+
+@dataclass
+class EndpointCounters:
+    """
+    What the mock server saw for one endpoint, to compare with what the profiler measured
+    """
+
+    requests: int = 0
+    request_bytes: int = 0
+    first_arrival: Optional[float] = None
+    last_arrival: Optional[float] = None
+    total_latency: float = 0.0
+    status_codes: Dict[int, int] = field(default_factory=dict)
+    # requests that carried a W3C trace context (traceparent header)
+    traced_requests: int = 0
+
+    def to_dict(self) -> dict:
+        duration = self.last_arrival - self.first_arrival if self.requests > 1 else None
+        return {
+            "requests": self.requests,
+            "request_bytes": self.request_bytes,
+            "arrival_rate": (self.requests - 1) / duration if duration else None,
+            "mean_latency": self.total_latency / self.requests
+            if self.requests
+            else None,
+            "status_codes": {str(k): v for k, v in self.status_codes.items()},
+            "traced_requests": self.traced_requests,
+        }
+
+
+def load_behaviors(config_path: str = None) -> Dict[Tuple[str, str], EndpointBehavior]:
+    """
+    Load the behavior of every endpoint. Endpoints that are not in the config file keep their default behavior.
+    The config file maps an endpoint to the fields of EndpointBehavior, for example:
+
+        /model/validate:
+          latency: lognormal
+          median: 2.0
+          error_rates: {500: 0.01, 504: 0.001}
+
+    Args:
+        config_path (str, optional): default to None. path of a yaml config file
+    Returns:
+        dict: behavior of every (method, endpoint)
+    """
+    behaviors = dict(DEFAULT_BEHAVIORS)
+    if config_path:
+        with open(config_path) as config_file:
+            config = yaml.safe_load(config_file) or {}
+        routes = {path: method for method, path in DEFAULT_BEHAVIORS}
+        for path, settings in config.items():
+            if path not in routes:
+                raise ValueError(
+                    f"Unknown endpoint {path}. Please use one of {list(routes)}"
+                )
+            behaviors[(routes[path], path)] = EndpointBehavior(**settings)
+    return behaviors
+
+
+def create_app(
+    behaviors: Dict[Tuple[str, str], EndpointBehavior] = None, seed: int = 0
+) -> web.Application:
+    """
+    Create a stand-in for the schematic API
+    Args:
+        behaviors (dict, optional): default to DEFAULT_BEHAVIORS. behavior of every (method, endpoint)
+        seed (int, optional): default to 0. seed of the random generator, so that runs can be reproduced
+    Returns:
+        web.Application: the application
+    """
+    behaviors = behaviors or DEFAULT_BEHAVIORS
+    rng = random.Random(seed)
+    counters: Dict[str, EndpointCounters] = {}
+    # trace ids of the traceparent headers received, and the spans received by the OTLP endpoint
+    traceparents: List[str] = []
+    spans: List[dict] = []
+
+    def make_handler(path: str, behavior: EndpointBehavior) -> Callable:
+        # a json body of about response_bytes bytes, built once
+        response_body = json.dumps(
+            {"result": "x" * max(behavior.response_bytes - 14, 0)}
+        ).encode()
+
+        async def handler(request: web.Request) -> web.Response:
+            arrival = time.monotonic()
+            body = await request.read()
+            latency = behavior.sample_latency(rng)
+            status = behavior.sample_status(rng)
+
+            counter = counters.setdefault(path, EndpointCounters())
+            counter.requests += 1
+            counter.request_bytes += len(body)
+            if counter.first_arrival is None:
+                counter.first_arrival = arrival
+            counter.last_arrival = arrival
+            counter.total_latency += latency
+            counter.status_codes[status] = counter.status_codes.get(status, 0) + 1
+            traceparent = request.headers.get("traceparent")
+            if traceparent:
+                counter.traced_requests += 1
+                traceparents.append(traceparent.split("-")[1])
+
+            if latency > 0:
+                await asyncio.sleep(latency)
+            response = web.Response(
+                status=status,
+                body=response_body,
+                content_type="application/json",
+            )
+            if behavior.compress:
+                response.enable_compression()
+            return response
+
+        return handler
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(
+            {path: counter.to_dict() for path, counter in counters.items()}
+        )
+
+    async def reset(request: web.Request) -> web.Response:
+        counters.clear()
+        traceparents.clear()
+        spans.clear()
+        return web.json_response({})
+
+    async def export_traces(request: web.Request) -> web.Response:
+        # stand-in for an OTLP collector: keep the spans sent by the profiler (see tracing.py)
+        export = ExportTraceServiceRequest()
+        export.ParseFromString(await request.read())
+        for resource_spans in export.resource_spans:
+            for scope_spans in resource_spans.scope_spans:
+                for span in scope_spans.spans:
+                    spans.append(
+                        {
+                            "trace_id": span.trace_id.hex(),
+                            "span_id": span.span_id.hex(),
+                            "name": span.name,
+                            "duration": (
+                                span.end_time_unix_nano - span.start_time_unix_nano
+                            )
+                            / 1e9,
+                            "attributes": {
+                                attribute.key: getattr(
+                                    attribute.value, attribute.value.WhichOneof("value")
+                                )
+                                for attribute in span.attributes
+                            },
+                        }
+                    )
+        return web.Response(
+            body=ExportTraceServiceResponse().SerializeToString(),
+            content_type="application/x-protobuf",
+        )
+
+    async def traces(request: web.Request) -> web.Response:
+        return web.json_response({"traceparents": traceparents, "spans": spans})
+
+    async def metrics(request: web.Request) -> web.Response:
+        # cpu and memory of the mock, in the format of a server monitored with prometheus (see resources.py)
+        return web.Response(
+            text=process_metrics_text(), content_type="text/plain", charset="utf-8"
+        )
+
+    app = web.Application(client_max_size=1024**3)
+    for (method, path), behavior in behaviors.items():
+        app.router.add_route(method, API_PREFIX + path, make_handler(path, behavior))
+    app.router.add_get("/mock/stats", stats)
+    app.router.add_post("/mock/reset", reset)
+    app.router.add_get("/metrics", metrics)
+    # default path of the OTLP http exporter: OTEL_EXPORTER_OTLP_ENDPOINT=http://HOST:PORT
+    app.router.add_post("/v1/traces", export_traces)
+    app.router.add_get("/mock/traces", traces)
+    return app
+
+
+class MockSchematicServer:
+    """
+    Run the mock server on a background thread, for example to benchmark the profiler itself.
+    The base url of the API is available as base_url once the server is started.
+    """
+
+    def __init__(
+        self,
+        behaviors: Dict[Tuple[str, str], EndpointBehavior] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0,
+    ):
+        self.app = create_app(behaviors, seed)
+        self.host = host
+        self.port = port
+        self.base_url: Optional[str] = None
+        self._loop = asyncio.new_event_loop()
+        self._runner = web.AppRunner(self.app, access_log=None)
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="mock-schematic", daemon=True
+        )
+
+    async def _start(self) -> None:
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port, backlog=4096)
+        await site.start()
+        # the port chosen by the system if port is 0
+        self.port = self._runner.addresses[0][1]
+
+    def start(self) -> "MockSchematicServer":
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        self.base_url = f"http://{self.host}:{self.port}{API_PREFIX}"
+        logger.info(f"Mock schematic API running at {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def __enter__(self) -> "MockSchematicServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def _serve(
+    behaviors: Dict[Tuple[str, str], EndpointBehavior], host: str, port: int, seed: int
+) -> None:
+    web.run_app(
+        create_app(behaviors, seed),
+        host=host,
+        port=port,
+        access_log=None,
+        print=None,
+    )
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    """
+    Get a port that no server listens on
+    Args:
+        host (str, optional): default to "127.0.0.1". host the port is free on
+    Returns:
+        int: the port
+    """
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class MockSchematicProcess:
+    """
+    Run the mock server in a child process. Unlike MockSchematicServer, the server does not share the interpreter
+    (and its GIL) with the profiler, so the time it spends handling requests is not counted against the profiler.
+    The base url of the API is available as base_url once the server is started.
+    """
+
+    def __init__(
+        self,
+        behaviors: Dict[Tuple[str, str], EndpointBehavior] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0,
+        startup_timeout: float = 30.0,
+    ):
+        self.behaviors = behaviors or DEFAULT_BEHAVIORS
+        self.host = host
+        self.port = port or free_port(host)
+        self.seed = seed
+        self.startup_timeout = startup_timeout
+        self.base_url = f"http://{self.host}:{self.port}{API_PREFIX}"
+        # spawn a fresh interpreter: forking copies the threads of the profiler in an unknown state
+        self._process = multiprocessing.get_context("spawn").Process(
+            target=_serve,
+            args=(self.behaviors, self.host, self.port, self.seed),
+            name="mock-schematic",
+            daemon=True,
+        )
+
+    def start(self) -> "MockSchematicProcess":
+        self._process.start()
+        stats_url = f"http://{self.host}:{self.port}/mock/stats"
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            if not self._process.is_alive():
+                raise RuntimeError(
+                    f"The mock schematic server exited with code {self._process.exitcode}"
+                )
+            try:
+                requests.get(stats_url, timeout=1).raise_for_status()
+                break
+            except requests.RequestException:
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(
+                        f"The mock schematic server did not start within {self.startup_timeout}s"
+                    )
+                time.sleep(0.1)
+        logger.info(f"Mock schematic API running at {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        self._process.terminate()
+        self._process.join()
+
+    def __enter__(self) -> "MockSchematicProcess":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a local stand-in for the schematic API. "
+        "Point the profiler at it with: export SCHEMATIC_BASE_URL=http://localhost:PORT/v1"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--config", help="yaml file with the behavior of endpoints")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(
+        create_app(load_behaviors(args.config), args.seed),
+        host=args.host,
+        port=args.port,
+        access_log=None,
+    )
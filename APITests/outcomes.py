@@ -0,0 +1,376 @@
+import asyncio
+import json
+import socket
+from typing import Dict, Iterator, List, Optional, Union
+
+import aiohttp
+from requests import Response
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import (
+    ChunkedEncodingError,
+    InvalidSchema,
+    InvalidURL,
+    MissingSchema,
+    Timeout,
+)
+
+from payload import PayloadStats, ResponseBody
+from phases import PHASES
+from stats import ConcurrencyStats, LatencyStats
+from timing import RunWindow
+
+# outcomes of requests that did not get a response. Requests that got a response are counted by status code ("200", "404"...)
+TIMEOUT = "timeout"
+CONNECTION_RESET = "connection_reset"
+CONNECTION_REFUSED = "connection_refused"
+DNS_FAILURE = "dns_failure"
+CONNECTION_ERROR = "connection_error"
+OTHER_ERROR = "error"
+
+# errors caused by a wrong url or configuration. They stop the run instead of being counted.
+CONFIGURATION_ERRORS = (InvalidSchema, MissingSchema, InvalidURL, aiohttp.InvalidURL)
+
+# percentiles of every phase stored in a result row
+PHASE_PERCENTILES = (50, 90, 99)
+
+# parts of error messages that mean the host name could not be resolved. urllib3 does not keep the socket.gaierror
+DNS_FAILURE_MESSAGES = (
+    "Name or service not known",
+    "nodename nor servname provided",
+    "Temporary failure in name resolution",
+    "getaddrinfo failed",
+    "Failed to resolve",
+    "No address associated with hostname",
+)
+CONNECTION_RESET_MESSAGES = (
+    "Connection reset by peer",
+    "Connection aborted",
+    "RemoteDisconnected",
+    "Server disconnected",
+)
+CONNECTION_REFUSED_MESSAGES = ("Connection refused",)
+
+
+def exception_chain(err: BaseException) -> Iterator[BaseException]:
+    """
+    Walk an exception and the exceptions it wraps. requests and aiohttp wrap the socket error that caused a failure.
+    Args:
+        err (BaseException): the exception raised by a request
+    Yields:
+        BaseException: err, then every wrapped exception
+    """
+    seen = set()
+    pending = [err]
+    while pending:
+        current = pending.pop(0)
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        pending.extend([current.__cause__, current.__context__])
+        # urllib3 keeps the cause in reason, aiohttp in os_error
+        for attribute in ("reason", "os_error"):
+            wrapped = getattr(current, attribute, None)
+            if isinstance(wrapped, BaseException):
+                pending.append(wrapped)
+        pending.extend(arg for arg in current.args if isinstance(arg, BaseException))
+
+
+def classify_exception(err: BaseException) -> str:
+    """
+    Get the outcome of a request that raised an exception
+    Args:
+        err (BaseException): the exception raised by a request
+    Returns:
+        str: one of TIMEOUT, DNS_FAILURE, CONNECTION_REFUSED, CONNECTION_RESET, CONNECTION_ERROR or OTHER_ERROR
+    """
+    chain = list(exception_chain(err))
+    messages = " ".join(str(error) for error in chain)
+
+    if any(
+        isinstance(error, (Timeout, asyncio.TimeoutError, socket.timeout))
+        for error in chain
+    ):
+        return TIMEOUT
+    if any(isinstance(error, socket.gaierror) for error in chain) or any(
+        message in messages for message in DNS_FAILURE_MESSAGES
+    ):
+        return DNS_FAILURE
+    if any(isinstance(error, ConnectionRefusedError) for error in chain) or any(
+        message in messages for message in CONNECTION_REFUSED_MESSAGES
+    ):
+        return CONNECTION_REFUSED
+    if any(
+        isinstance(
+            error,
+            (
+                ConnectionResetError,
+                ConnectionAbortedError,
+                BrokenPipeError,
+                ChunkedEncodingError,
+                aiohttp.ServerDisconnectedError,
+            ),
+        )
+        for error in chain
+    ) or any(message in messages for message in CONNECTION_RESET_MESSAGES):
+        return CONNECTION_RESET
+    # requests.exceptions.ConnectionError is not a subclass of the builtin ConnectionError
+    if any(
+        isinstance(
+            error, (ConnectionError, RequestsConnectionError, aiohttp.ClientError)
+        )
+        for error in chain
+    ):
+        return CONNECTION_ERROR
+    return OTHER_ERROR
+
+
+def outcome_of(result: Union[Response, ResponseBody, int, BaseException]) -> str:
+    """
+    Get the outcome of a request
+    Args:
+        result: the response (or its summary), its status code, or the exception raised by the request
+    Returns:
+        str: the status code as a string (for example "200" or "429"), or the kind of failure (for example "timeout")
+    """
+    if isinstance(result, BaseException):
+        return classify_exception(result)
+    if isinstance(result, int):
+        return str(result)
+    return str(result.status_code)
+
+
+def is_success(outcome: str) -> bool:
+    """
+    Check if an outcome is a successful (2xx) response
+    """
+    return outcome.isdigit() and 200 <= int(outcome) < 300
+
+
+class OutcomeCounter:
+    """
+    Number of requests and latency distribution of every outcome of a run: every HTTP status code and every kind of
+    failure (see outcome_of). Missing outcomes count as 0, so counter["500"] works even if no request failed.
+    Requests that were retried are counted once, by the outcome of their last attempt; the latency of their first
+    attempt is kept apart in first_attempt, and the time spent in every phase of the request (see phases.PHASES) in phases. The size and transfer rate of the responses are kept in payload,
+    and the number of requests in flight at the same time in concurrency. The engine that sent the requests sets the start
+    and end of the run in window.
+    """
+
+    def __init__(self):
+        self.latency: Dict[str, LatencyStats] = {}
+        self.first_attempt = LatencyStats()
+        self.retries = 0
+        self.retried_requests = 0
+        self.phases: Dict[str, LatencyStats] = {}
+        self.payload = PayloadStats()
+        self.concurrency = ConcurrencyStats()
+        self.window: Optional[RunWindow] = None
+
+    def record(
+        self,
+        outcome: str,
+        latency: float,
+        first_attempt_latency: Optional[float] = None,
+        retries: int = 0,
+        phases: Optional[Dict[str, float]] = None,
+        body: Optional[ResponseBody] = None,
+        sent_at_ns: Optional[int] = None,
+        finished_at_ns: Optional[int] = None,
+    ) -> None:
+        """
+        Add a request
+        Args:
+            outcome (str): outcome of the request, as returned by outcome_of
+            latency (float): latency of the request in seconds, including its retries
+            first_attempt_latency (float, optional): default to latency. latency of the first attempt in seconds
+            retries (int, optional): default to 0. number of times the request was sent again
+            phases (dict, optional): default to None. seconds spent in every phase of the last attempt
+            body (ResponseBody, optional): default to None. size and read time of the response, if one was received
+            sent_at_ns (int, optional): default to None. time.perf_counter_ns() value at which the request was sent
+            finished_at_ns (int, optional): default to None. time.perf_counter_ns() value at which the request finished
+        """
+        self.latency.setdefault(outcome, LatencyStats()).record(latency)
+        self.first_attempt.record(
+            latency if first_attempt_latency is None else first_attempt_latency
+        )
+        self.retries += retries
+        self.retried_requests += 1 if retries else 0
+        for phase, seconds in (phases or {}).items():
+            self.phases.setdefault(phase, LatencyStats()).record(seconds)
+        if body is not None:
+            self.payload.record(body)
+        if sent_at_ns is not None and finished_at_ns is not None:
+            self.concurrency.record(sent_at_ns, finished_at_ns)
+
+    def merge(self, other: "OutcomeCounter") -> None:
+        """
+        Add the requests recorded by another counter
+        Args:
+            other (OutcomeCounter): counter to merge
+        """
+        for outcome, stats in other.latency.items():
+            self.latency.setdefault(outcome, LatencyStats()).merge(stats)
+        self.first_attempt.merge(other.first_attempt)
+        self.retries += other.retries
+        self.retried_requests += other.retried_requests
+        for phase, stats in other.phases.items():
+            self.phases.setdefault(phase, LatencyStats()).merge(stats)
+        self.payload.merge(other.payload)
+        self.concurrency.merge(other.concurrency)
+        if other.window is not None:
+            self.window = other.window.merge(self.window)
+
+    def __getitem__(self, outcome: str) -> int:
+        stats = self.latency.get(outcome)
+        return stats.count if stats else 0
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        return {outcome: stats.count for outcome, stats in sorted(self.latency.items())}
+
+    @property
+    def total(self) -> int:
+        return sum(stats.count for stats in self.latency.values())
+
+    @property
+    def num_errors(self) -> int:
+        return sum(
+            stats.count
+            for outcome, stats in self.latency.items()
+            if not is_success(outcome)
+        )
+
+    def error_latency(self) -> LatencyStats:
+        """
+        Get the latency distribution of the requests that did not succeed
+        Returns:
+            LatencyStats: latency of every outcome that is not a 2xx response
+        """
+        error_latency = LatencyStats()
+        for outcome, stats in self.latency.items():
+            if not is_success(outcome):
+                error_latency.merge(stats)
+        return error_latency
+
+    def to_dict(self) -> dict:
+        """
+        Serialize the counter without losing precision, for example to send it to another process
+        Returns:
+            dict: json serializable dictionary
+        """
+        return {
+            "latency": {
+                outcome: stats.to_dict() for outcome, stats in self.latency.items()
+            },
+            "first_attempt": self.first_attempt.to_dict(),
+            "retries": self.retries,
+            "retried_requests": self.retried_requests,
+            "phases": {phase: stats.to_dict() for phase, stats in self.phases.items()},
+            "payload": self.payload.to_dict(),
+            "concurrency": self.concurrency.to_dict(),
+            "window": self.window and self.window.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "OutcomeCounter":
+        """
+        Load a counter that was serialized by to_dict
+        Args:
+            values (dict): dictionary returned by to_dict
+        Returns:
+            OutcomeCounter: the loaded counter
+        """
+        counter = cls()
+        counter.latency = {
+            outcome: LatencyStats.from_dict(stats)
+            for outcome, stats in values["latency"].items()
+        }
+        counter.first_attempt = LatencyStats.from_dict(values["first_attempt"])
+        counter.retries = values["retries"]
+        counter.retried_requests = values["retried_requests"]
+        counter.phases = {
+            phase: LatencyStats.from_dict(stats)
+            for phase, stats in values["phases"].items()
+        }
+        counter.payload = PayloadStats.from_dict(values["payload"])
+        counter.concurrency = ConcurrencyStats.from_dict(values["concurrency"])
+        if values["window"]:
+            counter.window = RunWindow.from_dict(values["window"])
+        return counter
+
+    def to_row(self) -> List[Optional[Union[int, float, str]]]:
+        """
+        Get the values stored in a result row. New outcomes do not change the columns: counts and latencies of every
+        outcome are stored as json.
+        Returns:
+            list: number of errors, p50 and p99 of the error latency (in seconds, rounded to 4 decimals),
+                count of every outcome as json and latency summary of every outcome as json
+        """
+        error_latency = self.error_latency()
+        error_percentiles = [
+            None if value is None else round(value, 4)
+            for value in (error_latency.percentile(50), error_latency.percentile(99))
+        ]
+        outcome_latency = {
+            outcome: {
+                "count": stats.count,
+                **{
+                    name: None if value is None else round(value, 4)
+                    for name, value in stats.summary().items()
+                },
+            }
+            for outcome, stats in sorted(self.latency.items())
+        }
+        return [
+            self.num_errors,
+            *error_percentiles,
+            json.dumps(self.counts, separators=(",", ":")),
+            json.dumps(outcome_latency, separators=(",", ":")),
+        ]
+
+    def retry_row(self) -> List[Optional[Union[int, float]]]:
+        """
+        Get the retry values stored in a result row
+        Returns:
+            list: p50 and p99 of the first attempt latency (in seconds, rounded to 4 decimals), number of retries and
+                number of requests that were retried
+        """
+        first_attempt_percentiles = [
+            None if value is None else round(value, 4)
+            for value in (
+                self.first_attempt.percentile(50),
+                self.first_attempt.percentile(99),
+            )
+        ]
+        return [*first_attempt_percentiles, self.retries, self.retried_requests]
+
+    def phase_row(self) -> List[Optional[Union[float, str]]]:
+        """
+        Get the phase values stored in a result row. Connection phases (dns, connect, tls) are only counted for requests
+        that opened a new connection.
+        Returns:
+            list: the PHASE_PERCENTILES of every phase in PHASES (in seconds, rounded to 4 decimals), then the count and
+                latency summary of every phase as json
+        """
+        percentiles = []
+        for phase in PHASES:
+            stats = self.phases.get(phase, LatencyStats())
+            percentiles.extend(
+                None if value is None else round(value, 4)
+                for value in (
+                    stats.percentile(percent) for percent in PHASE_PERCENTILES
+                )
+            )
+        phase_latency = {
+            phase: {
+                "count": self.phases[phase].count,
+                **{
+                    name: None if value is None else round(value, 4)
+                    for name, value in self.phases[phase].summary().items()
+                },
+            }
+            for phase in PHASES
+            if phase in self.phases
+        }
+        return [*percentiles, json.dumps(phase_latency, separators=(",", ":"))]
@@ -0,0 +1,365 @@
+import argparse
+import csv
+import http.client
+import logging
+import os
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from mock_schematic import DEFAULT_BEHAVIORS, EndpointBehavior, MockSchematicProcess
+from outcomes import OutcomeCounter
+from regression import check_regressions, summarize_regressions
+from results_store import ResultsStore, SynapseSync
+from scenario_catalog import ScenarioSpec, save_scenario_result, send_scenario_requests
+from stats import LatencyStats, ThroughputStats
+from timing import elapsed_seconds
+from utils import ENGINE_MODES, MultiRow, Row
+
+logger = logging.getLogger("overhead-benchmark")
+
+# endpoint of the mock server the requests of the benchmark are sent to, and its parameters
+OVERHEAD_ENDPOINT = "storage/project/datasets"
+OVERHEAD_PARAMS = {"asset_view": "syn23643253", "project_id": "syn26251192"}
+# size of the responses of the zero-latency server
+OVERHEAD_RESPONSE_BYTES = 256
+
+# concurrency levels used when none are given
+DEFAULT_CONCURRENCY_LEVELS = [1, 4, 16, 64, 256]
+# number of runs at every concurrency level. The report uses the median of the runs
+DEFAULT_REPEATS = 5
+# requests sent one at a time with a bare http client to measure the latency of the server and the network alone
+FLOOR_REQUESTS = 200
+
+
+def zero_latency_behaviors() -> Dict[Tuple[str, str], EndpointBehavior]:
+    """
+    Get the behavior of a mock server that responds to every endpoint at once, without errors
+    Returns:
+        dict: behavior of every (method, endpoint)
+    """
+    return {
+        route: EndpointBehavior(
+            latency="constant", median=0.0, response_bytes=OVERHEAD_RESPONSE_BYTES
+        )
+        for route in DEFAULT_BEHAVIORS
+    }
+
+
+def overhead_spec(engine: str, concurrency: int) -> ScenarioSpec:
+    """
+    Get the scenario of a run of the benchmark
+    Args:
+        engine (str): one of utils.ENGINE_MODES
+        concurrency (int): number of concurrent requests
+    Returns:
+        ScenarioSpec: the run spec. Its endpoint is profiler-overhead/<engine>, so that the runs of the benchmark are
+            never mixed with the runs of the real endpoint, and every engine is compared with its own earlier runs
+    """
+    return ScenarioSpec(
+        name=f"profiler-overhead-{engine}",
+        endpoint=f"profiler-overhead/{engine}",
+        description=f"Profiler overhead of the {engine} engine, measured against a zero-latency mock server",
+        params=OVERHEAD_PARAMS,
+        tags=("overhead",),
+        concurrent_threads=concurrency,
+        result={"data_schema": "zero-latency mock"},
+    )
+
+
+def measure_floor(base_url: str, requests: int = FLOOR_REQUESTS) -> LatencyStats:
+    """
+    Measure the latency of the requests of the benchmark without the profiler: one request at a time on a single
+    kept-alive connection of http.client. What the profiler measures above this floor is added by the profiler.
+    Args:
+        base_url (str): base url of the mock server
+        requests (int, optional): default to FLOOR_REQUESTS. number of requests
+    Returns:
+        LatencyStats: latency distribution of the requests
+    """
+    url = urlsplit(f"{base_url}/{OVERHEAD_ENDPOINT}")
+    path = f"{url.path}?{urlencode(OVERHEAD_PARAMS)}"
+    floor = LatencyStats()
+    connection = http.client.HTTPConnection(url.hostname, url.port)
+    try:
+        for _ in range(requests):
+            start_ns = time.perf_counter_ns()
+            connection.request("GET", path)
+            connection.getresponse().read()
+            floor.record(elapsed_seconds(start_ns))
+    finally:
+        connection.close()
+    return floor
+
+
+@dataclass
+class OverheadPoint:
+    """
+    What the profiler added to one run of the benchmark
+    """
+
+    engine: str
+    concurrency: int
+    latency_p50: Optional[float]
+    latency_p99: Optional[float]
+    # latency above the same percentile of the floor
+    added_latency_p50: Optional[float]
+    added_latency_p99: Optional[float]
+    # wall time of the run that no request was in flight for: starting threads or an event loop, logging...
+    batch_overhead: Optional[float]
+    achieved_rps: Optional[float]
+    num_errors: int
+
+    @classmethod
+    def from_run(
+        cls,
+        engine: str,
+        concurrency: int,
+        latency_stats: LatencyStats,
+        status_code_dict: OutcomeCounter,
+        elapsed: float,
+        floor: LatencyStats,
+    ) -> "OverheadPoint":
+        """
+        Compare a run with the floor
+        Args:
+            engine (str): engine of the run
+            concurrency (int): number of concurrent requests of the run
+            latency_stats (LatencyStats): latency distribution of the requests of the run
+            status_code_dict (OutcomeCounter): outcome of the requests of the run
+            elapsed (float): wall time of the run in seconds
+            floor (LatencyStats): latency distribution returned by measure_floor
+        Returns:
+            OverheadPoint: the overhead of the run
+        """
+        floor_p50 = floor.percentile(50)
+        floor_p99 = floor.percentile(99)
+        latency_p50 = latency_stats.percentile(50)
+        latency_p99 = latency_stats.percentile(99)
+        return cls(
+            engine=engine,
+            concurrency=concurrency,
+            latency_p50=latency_p50,
+            latency_p99=latency_p99,
+            added_latency_p50=None if latency_p50 is None else latency_p50 - floor_p50,
+            added_latency_p99=None if latency_p99 is None else latency_p99 - floor_p99,
+            batch_overhead=None
+            if latency_stats.max is None
+            else max(elapsed - latency_stats.max, 0.0),
+            achieved_rps=ThroughputStats(status_code_dict.total, elapsed).achieved_rps,
+            num_errors=status_code_dict.num_errors,
+        )
+
+
+def run_overhead(
+    base_url: str, engine: str, concurrency: int, floor: LatencyStats
+) -> Tuple[OverheadPoint, Row]:
+    """
+    Run one batch of concurrent requests against the zero-latency server and record it like any other run
+    Args:
+        base_url (str): base url of the mock server
+        engine (str): one of utils.ENGINE_MODES
+        concurrency (int): number of concurrent requests
+        floor (LatencyStats): latency distribution returned by measure_floor
+    Returns:
+        tuple: the overhead of the run and its result row
+    """
+    spec = overhead_spec(engine, concurrency)
+    (
+        dt_string,
+        time_diff,
+        status_code_dict,
+        latency_stats,
+        num_rows,
+    ) = send_scenario_requests(
+        spec, url=f"{base_url}/{OVERHEAD_ENDPOINT}", engine=engine
+    )
+    # time_diff is rounded to 0.1 ms, too coarse for requests that take a millisecond. The window of the run keeps
+    # its duration to the nanosecond
+    elapsed = status_code_dict.window.duration
+    throughput = ThroughputStats(completed=status_code_dict.total, elapsed=elapsed)
+    row = save_scenario_result(
+        spec,
+        dt_string,
+        time_diff,
+        status_code_dict,
+        latency_stats,
+        num_rows,
+        throughput=throughput,
+    )
+    point = OverheadPoint.from_run(
+        engine, concurrency, latency_stats, status_code_dict, elapsed, floor
+    )
+    return point, row
+
+
+def run_benchmark(
+    base_url: str,
+    floor: LatencyStats,
+    engines: List[str] = None,
+    concurrency_levels: List[int] = None,
+    repeats: int = DEFAULT_REPEATS,
+) -> Tuple[List[OverheadPoint], MultiRow]:
+    """
+    Run every engine at increasing concurrency against the zero-latency server
+    Args:
+        base_url (str): base url of the mock server
+        floor (LatencyStats): latency distribution returned by measure_floor
+        engines (list, optional): default to ENGINE_MODES. engines to benchmark
+        concurrency_levels (list, optional): default to DEFAULT_CONCURRENCY_LEVELS. number of concurrent requests of every run
+        repeats (int, optional): default to DEFAULT_REPEATS. number of runs at every concurrency level
+    Returns:
+        tuple: the overhead and the result row of every run
+    """
+    points = []
+    rows = []
+    for engine in engines or ENGINE_MODES:
+        for concurrency in concurrency_levels or DEFAULT_CONCURRENCY_LEVELS:
+            logger.info(
+                f"Running the {engine} engine with {concurrency} concurrent requests ({repeats} runs)"
+            )
+            for _ in range(repeats):
+                point, row = run_overhead(base_url, engine, concurrency, floor)
+                points.append(point)
+                rows.append(row)
+    return points, rows
+
+
+def median_point(points: List[OverheadPoint]) -> OverheadPoint:
+    """
+    Get the median of every value of the runs of an engine at one concurrency level
+    Args:
+        points (list): overhead of the runs
+    Returns:
+        OverheadPoint: the median run
+    """
+
+    def median(name: str) -> Optional[float]:
+        values = [
+            getattr(point, name) for point in points if getattr(point, name) is not None
+        ]
+        return statistics.median(values) if values else None
+
+    return OverheadPoint(
+        engine=points[0].engine,
+        concurrency=points[0].concurrency,
+        latency_p50=median("latency_p50"),
+        latency_p99=median("latency_p99"),
+        added_latency_p50=median("added_latency_p50"),
+        added_latency_p99=median("added_latency_p99"),
+        batch_overhead=median("batch_overhead"),
+        achieved_rps=median("achieved_rps"),
+        num_errors=sum(point.num_errors for point in points),
+    )
+
+
+def format_ms(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value * 1000:.2f}ms"
+
+
+def report_overhead(
+    points: List[OverheadPoint], floor: LatencyStats, output_path: str = None
+) -> Dict[str, Optional[float]]:
+    """
+    Log the latency added by every engine at every concurrency level and its maximum throughput
+    Args:
+        points (list): points returned by run_benchmark
+        floor (LatencyStats): latency distribution returned by measure_floor
+        output_path (str, optional): default to None. if set, the median runs are also written to this csv file
+    Returns:
+        dict: maximum requests per second of every engine, over the concurrency levels
+    """
+    runs: Dict[Tuple[str, int], List[OverheadPoint]] = {}
+    for point in points:
+        runs.setdefault((point.engine, point.concurrency), []).append(point)
+    medians = [median_point(engine_runs) for engine_runs in runs.values()]
+
+    logger.info(
+        f"Floor (one request at a time with http.client): p50 {format_ms(floor.percentile(50))}, "
+        f"p99 {format_ms(floor.percentile(99))}"
+    )
+    max_rps: Dict[str, Optional[float]] = {}
+    for engine in dict.fromkeys(point.engine for point in medians):
+        logger.info(f"{engine} engine:")
+        engine_points = [point for point in medians if point.engine == engine]
+        for point in engine_points:
+            logger.info(
+                f"  concurrency {point.concurrency}: added latency p50 {format_ms(point.added_latency_p50)}, "
+                f"p99 {format_ms(point.added_latency_p99)}, batch overhead {format_ms(point.batch_overhead)}, "
+                f"{point.achieved_rps or 0:.0f} requests per second, {point.num_errors} errors"
+            )
+        throughputs = [
+            point.achieved_rps for point in engine_points if point.achieved_rps
+        ]
+        max_rps[engine] = max(throughputs) if throughputs else None
+        logger.info(
+            f"  maximum throughput: {max_rps[engine] or 0:.0f} requests per second"
+        )
+
+    if output_path:
+        with open(output_path, "w", newline="") as output:
+            writer = csv.DictWriter(
+                output, fieldnames=list(OverheadPoint.__dataclass_fields__)
+            )
+            writer.writeheader()
+            for point in medians:
+                writer.writerow(asdict(point))
+    return max_rps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the latency added by the profiler and its maximum throughput against a zero-latency mock server"
+    )
+    parser.add_argument(
+        "--engine",
+        action="append",
+        choices=ENGINE_MODES,
+        help="only benchmark this engine (default: every engine)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        action="append",
+        help=f"concurrency level to run (default: {DEFAULT_CONCURRENCY_LEVELS})",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=DEFAULT_REPEATS,
+        help="number of runs per concurrency level",
+    )
+    parser.add_argument("--output", help="csv file to write the median runs to")
+    args = parser.parse_args()
+
+    with MockSchematicProcess(zero_latency_behaviors()) as server:
+        floor_stats = measure_floor(server.base_url)
+        all_points, all_rows = run_benchmark(
+            server.base_url, floor_stats, args.engine, args.concurrency, args.repeats
+        )
+    report_overhead(all_points, floor_stats, args.output)
+
+    # store the runs like any other run, so that the regression check catches a slower profiler
+    run_started_at = time.time()
+    store = ResultsStore()
+    synapse_sync = SynapseSync(store)
+    synapse_sync.start()
+    try:
+        store.insert_rows(all_rows)
+        print(f"Inserting {len(all_rows)} rows to Synapse")
+    finally:
+        synapse_sync.close()
+
+    regressions = [
+        result
+        for result in check_regressions(all_rows, store, run_started_at)
+        if result.is_regression
+    ]
+    if regressions:
+        print(f"Found {len(regressions)} performance regressions:")
+        print(summarize_regressions(regressions))
+        if os.environ.get("PROFILER_FAIL_ON_REGRESSION", "true").lower() != "false":
+            sys.exit(1)
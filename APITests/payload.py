@@ -0,0 +1,274 @@
+import json
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+import aiohttp
+from requests import Response
+
+from stats import LatencyStats
+from transport import IDENTITY, zstandard
+
+# bytes read at a time from a response. Bodies are counted and dropped chunk by chunk, never buffered whole
+BODY_CHUNK_SIZE = 64 * 1024
+
+# zlib window bits of the encodings decompressed with zlib
+ZLIB_WBITS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+
+@dataclass(frozen=True)
+class ResponseBody:
+    """
+    Summary of a response whose body was read and dropped
+    """
+
+    status_code: int
+    # bytes received from the server, compressed if content_encoding is not identity
+    wire_bytes: int
+    # bytes of the body after decompression, or None if the encoding is not supported
+    body_bytes: Optional[int]
+    content_encoding: str
+    # seconds spent reading the body
+    read_seconds: float
+    # bytes of the body of the request, as sent
+    request_bytes: int = 0
+
+    @property
+    def bytes_per_second(self) -> Optional[float]:
+        """
+        Transfer rate of the body as received from the server, or None if it was read too fast to be measured
+        """
+        if self.read_seconds <= 0:
+            return None
+        return self.wire_bytes / self.read_seconds
+
+
+class BodyCounter:
+    """
+    Count the bytes of a response body as received and after decompression, chunk by chunk.
+    Supports gzip, deflate and, if the zstandard package is installed, zstd.
+    """
+
+    def __init__(self, content_encoding: str, chunk_size: int = BODY_CHUNK_SIZE):
+        self.content_encoding = content_encoding.lower()
+        self.chunk_size = chunk_size
+        self.wire_bytes = 0
+        self.body_bytes = 0
+        self.start = time.perf_counter()
+        self._zlib = None
+        self._zstd = None
+        if self.content_encoding in ZLIB_WBITS:
+            self._zlib = zlib.decompressobj(ZLIB_WBITS[self.content_encoding])
+        elif self.content_encoding == "zstd" and zstandard is not None:
+            self._zstd = zstandard.ZstdDecompressor().decompressobj()
+
+    @property
+    def decodable(self) -> bool:
+        return (
+            self.content_encoding == IDENTITY
+            or self._zlib is not None
+            or self._zstd is not None
+        )
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Count a chunk of the body as received
+        """
+        self.wire_bytes += len(chunk)
+        if self._zlib is not None:
+            # bound the output so that a highly compressed body is never expanded in memory at once
+            data = self._zlib.decompress(chunk, self.chunk_size)
+            while data:
+                self.body_bytes += len(data)
+                data = self._zlib.decompress(
+                    self._zlib.unconsumed_tail, self.chunk_size
+                )
+        elif self._zstd is not None:
+            self.body_bytes += len(self._zstd.decompress(chunk))
+        else:
+            self.body_bytes += len(chunk)
+
+    def finish(self, status_code: int, request_bytes: int = 0) -> ResponseBody:
+        """
+        Summarize the body once it was read
+        Args:
+            status_code (int): status code of the response
+            request_bytes (int, optional): default to 0. bytes of the body of the request
+        Returns:
+            ResponseBody: status code, sizes, content encoding and read time of the response
+        """
+        if self._zlib is not None:
+            self.body_bytes += len(self._zlib.flush())
+        return ResponseBody(
+            status_code=status_code,
+            wire_bytes=self.wire_bytes,
+            body_bytes=self.body_bytes if self.decodable else None,
+            content_encoding=self.content_encoding,
+            read_seconds=time.perf_counter() - self.start,
+            request_bytes=request_bytes,
+        )
+
+
+def read_response(
+    response: Response, request_bytes: int = 0, chunk_size: int = BODY_CHUNK_SIZE
+) -> ResponseBody:
+    """
+    Read the body of a response sent with stream=True, counting its bytes without keeping them
+    Args:
+        response (Response): a streamed response
+        request_bytes (int, optional): default to 0. bytes of the body of the request
+        chunk_size (int, optional): default to BODY_CHUNK_SIZE. bytes read at a time
+    Returns:
+        ResponseBody: status code, sizes, content encoding and read time of the response
+    """
+    counter = BodyCounter(
+        response.headers.get("Content-Encoding", IDENTITY), chunk_size
+    )
+    # read the bytes as received; the connection goes back to the pool once the body is read
+    for chunk in response.raw.stream(chunk_size, decode_content=False):
+        counter.feed(chunk)
+    return counter.finish(response.status_code, request_bytes)
+
+
+async def read_response_async(
+    response: aiohttp.ClientResponse,
+    request_bytes: int = 0,
+    chunk_size: int = BODY_CHUNK_SIZE,
+) -> ResponseBody:
+    """
+    Read the body of an aiohttp response, counting its bytes without keeping them. Same as read_response for the
+    async engine. The session must not decompress responses (auto_decompress=False), so that the bytes received
+    can be counted.
+    Args:
+        response (aiohttp.ClientResponse): a response whose body was not read yet
+        request_bytes (int, optional): default to 0. bytes of the body of the request
+        chunk_size (int, optional): default to BODY_CHUNK_SIZE. bytes read at a time
+    Returns:
+        ResponseBody: status code, sizes, content encoding and read time of the response
+    """
+    counter = BodyCounter(
+        response.headers.get("Content-Encoding", IDENTITY), chunk_size
+    )
+    async for chunk in response.content.iter_chunked(chunk_size):
+        counter.feed(chunk)
+    return counter.finish(response.status, request_bytes)
+
+
+class PayloadStats:
+    """
+    Size distribution, content encodings and transfer rate of the responses of a run.
+    Sizes are recorded in the same logarithmic histogram as latencies, so they can be merged exactly.
+    """
+
+    def __init__(self):
+        self.wire_bytes = LatencyStats()
+        self.body_bytes = LatencyStats()
+        self.bytes_per_second = LatencyStats()
+        self.total_wire_bytes = 0
+        self.total_read_seconds = 0.0
+        self.total_request_bytes = 0
+        self.content_encodings: Dict[str, int] = {}
+
+    def record(self, body: ResponseBody) -> None:
+        """
+        Add a response
+        Args:
+            body (ResponseBody): summary of the response
+        """
+        self.wire_bytes.record(body.wire_bytes)
+        if body.body_bytes is not None:
+            self.body_bytes.record(body.body_bytes)
+        if body.bytes_per_second is not None:
+            self.bytes_per_second.record(body.bytes_per_second)
+        self.total_wire_bytes += body.wire_bytes
+        self.total_read_seconds += body.read_seconds
+        self.total_request_bytes += body.request_bytes
+        self.content_encodings[body.content_encoding] = (
+            self.content_encodings.get(body.content_encoding, 0) + 1
+        )
+
+    def merge(self, other: "PayloadStats") -> None:
+        """
+        Add the responses recorded by another PayloadStats object
+        Args:
+            other (PayloadStats): stats to merge
+        """
+        self.wire_bytes.merge(other.wire_bytes)
+        self.body_bytes.merge(other.body_bytes)
+        self.bytes_per_second.merge(other.bytes_per_second)
+        self.total_wire_bytes += other.total_wire_bytes
+        self.total_read_seconds += other.total_read_seconds
+        self.total_request_bytes += other.total_request_bytes
+        for encoding, count in other.content_encodings.items():
+            self.content_encodings[encoding] = (
+                self.content_encodings.get(encoding, 0) + count
+            )
+
+    @property
+    def transfer_rate(self) -> Optional[float]:
+        """
+        Bytes received per second spent reading bodies, over all the responses of the run
+        """
+        if self.total_read_seconds <= 0:
+            return None
+        return self.total_wire_bytes / self.total_read_seconds
+
+    def to_dict(self) -> dict:
+        """
+        Serialize the stats without losing precision, for example to send them to another process
+        Returns:
+            dict: json serializable dictionary
+        """
+        return {
+            "wire_bytes": self.wire_bytes.to_dict(),
+            "body_bytes": self.body_bytes.to_dict(),
+            "bytes_per_second": self.bytes_per_second.to_dict(),
+            "total_wire_bytes": self.total_wire_bytes,
+            "total_read_seconds": self.total_read_seconds,
+            "total_request_bytes": self.total_request_bytes,
+            "content_encodings": self.content_encodings,
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "PayloadStats":
+        """
+        Load stats that were serialized by to_dict
+        Args:
+            values (dict): dictionary returned by to_dict
+        Returns:
+            PayloadStats: the loaded stats
+        """
+        stats = cls()
+        stats.wire_bytes = LatencyStats.from_dict(values["wire_bytes"])
+        stats.body_bytes = LatencyStats.from_dict(values["body_bytes"])
+        stats.bytes_per_second = LatencyStats.from_dict(values["bytes_per_second"])
+        stats.total_wire_bytes = values["total_wire_bytes"]
+        stats.total_read_seconds = values["total_read_seconds"]
+        stats.total_request_bytes = values["total_request_bytes"]
+        stats.content_encodings = dict(values["content_encodings"])
+        return stats
+
+    def to_row(self) -> List[Optional[Union[int, float, str]]]:
+        """
+        Get the values stored in a result row
+        Returns:
+            list: p50 and max of the response size and of the decompressed size in bytes, total bytes received,
+                p50 of the transfer rate of every response and transfer rate of the run in bytes per second,
+                and the number of responses of every content encoding as json
+        """
+        values = [
+            self.wire_bytes.percentile(50),
+            self.wire_bytes.max,
+            self.body_bytes.percentile(50),
+            self.body_bytes.max,
+        ]
+        rates = [self.bytes_per_second.percentile(50), self.transfer_rate]
+        return [
+            *(None if value is None else round(value) for value in values),
+            self.total_wire_bytes,
+            *(None if value is None else round(value, 2) for value in rates),
+            json.dumps(
+                dict(sorted(self.content_encodings.items())), separators=(",", ":")
+            ),
+        ]
@@ -0,0 +1,317 @@
+import contextvars
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Dict, Iterator, Optional
+
+import aiohttp
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+# phases of a request, in the order they happen. dns, connect and tls only happen when a new connection is opened.
+DNS = "dns"
+CONNECT = "connect"
+TLS = "tls"
+SEND = "send"
+TTFB = "ttfb"
+RECEIVE = "receive"
+PHASES = (DNS, CONNECT, TLS, SEND, TTFB, RECEIVE)
+CONNECTION_PHASES = (DNS, CONNECT, TLS)
+
+# measure the phases of every request. Set PROFILER_PHASE_TIMINGS=false to turn the hooks off
+RECORD_PHASES = os.environ.get("PROFILER_PHASE_TIMINGS", "true").lower() != "false"
+
+
+class RequestPhases:
+    """
+    Time spent in every phase of one attempt of a request, in seconds:
+    - dns: resolving the host name
+    - connect: opening the TCP connection
+    - tls: TLS handshake (https only)
+    - send: sending the request line, headers and body
+    - ttfb: waiting for the status line and headers of the response after the request was sent
+    - receive: reading the body of the response
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        # time.perf_counter() value at which the headers of the response were received
+        self.headers_received: Optional[float] = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+
+    def connection_time(self) -> float:
+        """
+        Time spent opening connections so far, so that it can be taken out of the phase it happened in
+        """
+        return sum(self.durations.get(phase, 0.0) for phase in CONNECTION_PHASES)
+
+
+_current_phases: contextvars.ContextVar[
+    Optional[RequestPhases]
+] = contextvars.ContextVar("request_phases", default=None)
+
+
+def current_phases() -> Optional[RequestPhases]:
+    """
+    Get the phases of the request being sent by the current thread or task
+    Returns:
+        RequestPhases: the phases being measured, or None if the request is not measured
+    """
+    return _current_phases.get()
+
+
+@contextmanager
+def measure_phases() -> Iterator[Optional[RequestPhases]]:
+    """
+    Measure the phases of the request sent inside the block. The body is considered received when the block ends.
+    Yields:
+        RequestPhases: the phases of the request, or None if RECORD_PHASES is False
+    """
+    if not RECORD_PHASES:
+        yield None
+        return
+    phases = RequestPhases()
+    token = _current_phases.set(phases)
+    try:
+        yield phases
+    finally:
+        _current_phases.reset(token)
+        if phases.headers_received is not None:
+            phases.add(RECEIVE, time.perf_counter() - phases.headers_received)
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """
+    A urllib3 connection that records the phases of the requests it sends
+    """
+
+    def _new_conn(self) -> socket.socket:
+        phases = current_phases()
+        if phases is None:
+            return super()._new_conn()
+
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(
+                self._dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM
+            )
+        except socket.gaierror:
+            # let urllib3 raise the error it raises for a host that can not be resolved
+            return super()._new_conn()
+        phases.add(DNS, time.perf_counter() - start)
+
+        # like urllib3, try every resolved address (for example IPv6 then IPv4) until one connects. The name is not
+        # resolved again for every address.
+        dns_host = self._dns_host
+        error = None
+        try:
+            for address in dict.fromkeys(info[4][0] for info in addresses):
+                self._dns_host = address
+                attempt_start = time.perf_counter()
+                try:
+                    conn = super()._new_conn()
+                except (ConnectTimeoutError, NewConnectionError) as err:
+                    error = err
+                    continue
+                phases.add(CONNECT, time.perf_counter() - attempt_start)
+                return conn
+        finally:
+            self._dns_host = dns_host
+        raise error
+
+    def request(self, method, url, body=None, headers=None):
+        phases = current_phases()
+        if phases is None:
+            return super().request(method, url, body=body, headers=headers)
+
+        # http.client connects while sending the first request of a connection
+        connection_time = phases.connection_time()
+        start = time.perf_counter()
+        try:
+            return super().request(method, url, body=body, headers=headers)
+        finally:
+            phases.add(
+                SEND,
+                time.perf_counter()
+                - start
+                - (phases.connection_time() - connection_time),
+            )
+
+    def request_chunked(self, method, url, body=None, headers=None):
+        phases = current_phases()
+        if phases is None:
+            return super().request_chunked(method, url, body=body, headers=headers)
+
+        connection_time = phases.connection_time()
+        start = time.perf_counter()
+        try:
+            return super().request_chunked(method, url, body=body, headers=headers)
+        finally:
+            phases.add(
+                SEND,
+                time.perf_counter()
+                - start
+                - (phases.connection_time() - connection_time),
+            )
+
+    def getresponse(self, *args, **kwargs):
+        phases = current_phases()
+        if phases is None:
+            return super().getresponse(*args, **kwargs)
+
+        start = time.perf_counter()
+        response = super().getresponse(*args, **kwargs)
+        phases.headers_received = time.perf_counter()
+        phases.add(TTFB, phases.headers_received - start)
+        return response
+
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    """
+    A urllib3 https connection that also records the TLS handshake
+    """
+
+    def connect(self):
+        phases = current_phases()
+        if phases is None:
+            return super().connect()
+
+        # connect opens the socket (_new_conn records dns and connect), then wraps it in TLS
+        connection_time = phases.connection_time()
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            phases.add(
+                TLS,
+                time.perf_counter()
+                - start
+                - (phases.connection_time() - connection_time),
+            )
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    A requests adapter whose connections record the phases of every request sent inside measure_phases.
+    An adapter replaced by a larger one is retired: its connections are closed once its last request is sent.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._in_flight = 0
+        self._retired = False
+        self._in_flight_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def send(self, *args, **kwargs):
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            return super().send(*args, **kwargs)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+                idle = self._retired and not self._in_flight
+            if idle:
+                self.close()
+
+    def retire(self) -> None:
+        """
+        Close the connections of the adapter now if no request is being sent, or else once the last one is sent.
+        Requests still reading their response keep their connection, which is closed when it is released.
+        """
+        with self._in_flight_lock:
+            self._retired = True
+            idle = not self._in_flight
+        if idle:
+            self.close()
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+# aiohttp trace hooks. They run in the task that sends the request, so they find its phases with current_phases()
+async def _on_request_start(session, context, params) -> None:
+    context.phases = current_phases()
+    context.send_start = time.perf_counter()
+
+
+async def _on_dns_resolvehost_start(session, context, params) -> None:
+    context.dns_start = time.perf_counter()
+
+
+async def _on_dns_resolvehost_end(session, context, params) -> None:
+    if context.phases is not None:
+        context.phases.add(DNS, time.perf_counter() - context.dns_start)
+
+
+async def _on_connection_create_start(session, context, params) -> None:
+    context.connect_start = time.perf_counter()
+    context.dns_time = context.phases.durations.get(DNS, 0.0) if context.phases else 0
+
+
+async def _on_connection_create_end(session, context, params) -> None:
+    context.send_start = time.perf_counter()
+    if context.phases is not None:
+        # aiohttp does not report the TLS handshake separately: connect includes it for https
+        dns_time = context.phases.durations.get(DNS, 0.0) - context.dns_time
+        context.phases.add(
+            CONNECT, context.send_start - context.connect_start - dns_time
+        )
+
+
+async def _on_connection_reuseconn(session, context, params) -> None:
+    context.send_start = time.perf_counter()
+
+
+async def _on_request_sent(session, context, params) -> None:
+    # called after the headers and after every chunk of the body; the last call ends the send phase
+    context.send_end = time.perf_counter()
+
+
+async def _on_request_end(session, context, params) -> None:
+    phases = context.phases
+    if phases is None:
+        return
+    phases.headers_received = time.perf_counter()
+    send_end = getattr(context, "send_end", context.send_start)
+    phases.add(SEND, send_end - context.send_start)
+    phases.add(TTFB, phases.headers_received - send_end)
+
+
+def aiohttp_trace_config() -> aiohttp.TraceConfig:
+    """
+    Create the trace hooks that record the phases of the requests of an aiohttp session
+    Returns:
+        aiohttp.TraceConfig: trace config to pass to aiohttp.ClientSession
+    """
+    trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_dns_resolvehost_start.append(_on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(_on_dns_resolvehost_end)
+    trace_config.on_connection_create_start.append(_on_connection_create_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+    trace_config.on_request_headers_sent.append(_on_request_sent)
+    trace_config.on_request_chunk_sent.append(_on_request_sent)
+    trace_config.on_request_end.append(_on_request_end)
+    return trace_config
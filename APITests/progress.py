@@ -0,0 +1,229 @@
+import contextvars
+import math
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from outcomes import is_success, outcome_of
+
+# seconds between two refreshes of the dashboard
+REFRESH_INTERVAL = 1.0
+# seconds of completed requests used for the rolling throughput and latency
+ROLLING_WINDOW = 10.0
+
+# kinds of events sent by the requests to the dashboard
+STARTED = "started"
+FINISHED = "finished"
+
+
+class ScenarioProgress:
+    """
+    Progress of a scenario, as shown on the dashboard. Only updated by the dashboard thread.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = 0
+        self.finished = 0
+        self.errors = 0
+        # time.perf_counter() value at which the first request started
+        self.first_started: Optional[float] = None
+        # (time.perf_counter(), latency) of the requests that finished within the rolling window
+        self.recent: Deque[Tuple[float, float]] = deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self.started - self.finished
+
+    def expire(self, now: float, window: float) -> None:
+        while self.recent and self.recent[0][0] < now - window:
+            self.recent.popleft()
+
+    def rolling_rps(self, now: float, window: float) -> float:
+        # a scenario that started less than a window ago is measured since it started
+        elapsed = min(window, now - (self.first_started or now))
+        return len(self.recent) / elapsed if elapsed > 0 else 0.0
+
+    def rolling_percentile(self, percent: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        latencies = sorted(latency for _, latency in self.recent)
+        return latencies[max(math.ceil(percent / 100 * len(latencies)) - 1, 0)]
+
+
+class ProgressTracker:
+    """
+    Send the start and end of the requests of a scenario to the dashboard.
+    Events are appended to a deque, which is thread safe without a lock, so requests never wait for the dashboard.
+    """
+
+    def __init__(self, name: str, events: Deque[tuple]):
+        self.name = name
+        self._events = events
+
+    def started(self) -> None:
+        self._events.append((STARTED, self.name, time.perf_counter(), None, None))
+
+    def finished(self, latency: float, response: Any) -> None:
+        self._events.append(
+            (FINISHED, self.name, time.perf_counter(), latency, response)
+        )
+
+
+class Dashboard:
+    """
+    Live view of the scenarios being run: requests in flight, completed requests per second, rolling p50/p99 latency and
+    number of errors of every scenario, refreshed every second from a background thread.
+    The requests only append events to a deque; counting, sorting and drawing happen in the dashboard thread.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO = None,
+        interval: float = REFRESH_INTERVAL,
+        window: float = ROLLING_WINDOW,
+    ):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.window = window
+        self._events: Deque[tuple] = deque()
+        self._scenarios: Dict[str, ScenarioProgress] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._drawn_lines = 0
+        self._started_at = time.perf_counter()
+
+    def tracker(self, name: str) -> ProgressTracker:
+        return ProgressTracker(name, self._events)
+
+    def _drain(self) -> None:
+        # popleft is atomic, so events appended while draining are read by the next refresh
+        while self._events:
+            kind, name, timestamp, latency, response = self._events.popleft()
+            scenario = self._scenarios.get(name)
+            if scenario is None:
+                scenario = self._scenarios[name] = ScenarioProgress(name)
+            if kind == STARTED:
+                if scenario.first_started is None:
+                    scenario.first_started = timestamp
+                scenario.started += 1
+                continue
+            scenario.finished += 1
+            scenario.recent.append((timestamp, latency))
+            if not is_success(outcome_of(response)):
+                scenario.errors += 1
+
+    def render(self) -> List[str]:
+        """
+        Read the events received since the last refresh and format the dashboard
+        Returns:
+            list: the lines of the dashboard
+        """
+        self._drain()
+        now = time.perf_counter()
+        lines = [
+            f"{'scenario':<45} {'in flight':>9} {'done':>7} {'rps':>7} {'p50':>8} {'p99':>8} {'errors':>7}"
+        ]
+        for scenario in self._scenarios.values():
+            scenario.expire(now, self.window)
+            percentiles = [
+                "-" if value is None else f"{value:.2f}s"
+                for value in (
+                    scenario.rolling_percentile(50),
+                    scenario.rolling_percentile(99),
+                )
+            ]
+            lines.append(
+                f"{scenario.name[:45]:<45} {scenario.in_flight:>9} {scenario.finished:>7} "
+                f"{scenario.rolling_rps(now, self.window):>7.1f} {percentiles[0]:>8} {percentiles[1]:>8} {scenario.errors:>7}"
+            )
+        lines.append(
+            f"elapsed {now - self._started_at:.0f}s, rps and latency over the last {self.window:.0f}s"
+        )
+        return lines
+
+    def refresh(self) -> None:
+        """
+        Draw the dashboard. On a terminal, the previous one is replaced.
+        """
+        lines = self.render()
+        if self.stream.isatty() and self._drawn_lines:
+            # move to the first line of the previous dashboard and clear the screen below it
+            self.stream.write(f"\x1b[{self._drawn_lines}F\x1b[J")
+        self.stream.write("\n".join(lines) + "\n")
+        self.stream.flush()
+        self._drawn_lines = len(lines)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def start(self) -> None:
+        """
+        Show the dashboard and make it the one that receives the progress of the scenarios
+        """
+        global _active_dashboard
+        _active_dashboard = self
+        self._thread = threading.Thread(
+            target=self._run, name="progress-dashboard", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Stop refreshing the dashboard, after drawing it a last time
+        """
+        global _active_dashboard
+        if _active_dashboard is self:
+            _active_dashboard = None
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.refresh()
+
+    def __enter__(self) -> "Dashboard":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+_active_dashboard: Optional[Dashboard] = None
+
+_current_tracker: contextvars.ContextVar[
+    Optional[ProgressTracker]
+] = contextvars.ContextVar("progress_tracker", default=None)
+
+
+def current_tracker() -> Optional[ProgressTracker]:
+    """
+    Get the tracker of the scenario being run by the current thread or task
+    Returns:
+        ProgressTracker: the tracker, or None if no dashboard is shown
+    """
+    return _current_tracker.get()
+
+
+@contextmanager
+def track_progress(name: str) -> Iterator[Optional[ProgressTracker]]:
+    """
+    Show the progress of the requests sent inside the block on the active dashboard.
+    Threads only see the tracker if they run in a copy of the context of the block (see contextvars.copy_context).
+    Args:
+        name (str): name of the scenario on the dashboard
+    Yields:
+        ProgressTracker: the tracker of the scenario, or None if no dashboard is shown
+    """
+    if _active_dashboard is None:
+        yield None
+        return
+    tracker = _active_dashboard.tracker(name)
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
@@ -0,0 +1,168 @@
+import json
+import logging
+import math
+import statistics
+from dataclasses import dataclass
+from typing import List, Optional
+
+from results_store import ResultsStore, scenario_key
+from stats import LatencyHistogram
+from utils import MultiRow, row_to_dict
+
+logger = logging.getLogger("regression")
+
+# number of earlier runs of a scenario used as the baseline
+BASELINE_RUNS = 50
+# significance level of the check
+REGRESSION_ALPHA = 0.05
+# scenarios with fewer earlier runs are not checked: the smallest p-value of n baseline runs is 1 / (n + 1),
+# so fewer runs could never reach REGRESSION_ALPHA
+MIN_BASELINE_RUNS = math.ceil(1 / REGRESSION_ALPHA) - 1
+# smallest increase of the median latency (as a fraction of the baseline median) reported as a regression
+REGRESSION_MIN_SLOWDOWN = 0.1
+
+
+@dataclass
+class RegressionResult:
+    """
+    Comparison of a run with the baseline of its scenario
+    """
+
+    endpoint_name: str
+    description: str
+    baseline_runs: int
+    baseline_p50: Optional[float] = None
+    current_p50: Optional[float] = None
+    p_value: Optional[float] = None
+
+    @property
+    def slowdown(self) -> Optional[float]:
+        if not self.baseline_p50 or self.current_p50 is None:
+            return None
+        return self.current_p50 / self.baseline_p50 - 1
+
+    @property
+    def is_regression(self) -> bool:
+        return (
+            self.p_value is not None
+            and self.p_value < REGRESSION_ALPHA
+            and self.slowdown is not None
+            and self.slowdown >= REGRESSION_MIN_SLOWDOWN
+        )
+
+
+def run_p50(run: dict) -> Optional[float]:
+    """
+    Get the median latency of the successful requests of a run
+    Args:
+        run (dict): a run, as returned by row_to_dict or ResultsStore.last_runs
+    Returns:
+        float: the median latency in seconds, or None if no request of the run succeeded
+    """
+    return LatencyHistogram.from_json(run["latency_histogram"]).percentile(50)
+
+
+def rank_p_value(current: float, baseline: List[float]) -> float:
+    """
+    One-sided rank test of whether a run is slower than the baseline runs. Under the null hypothesis the run is
+    exchangeable with the baseline runs, so its rank among them is uniform.
+    Args:
+        current (float): median latency of the current run
+        baseline (list): median latency of every baseline run
+    Returns:
+        float: probability that a run of the baseline is at least as slow as the current run
+    """
+    if not baseline:
+        raise ValueError("The baseline needs at least one run")
+    at_least_as_slow = sum(1 for value in baseline if value >= current)
+    return (at_least_as_slow + 1) / (len(baseline) + 1)
+
+
+def compare_to_baseline(
+    row_values: dict, baseline_runs: List[dict]
+) -> RegressionResult:
+    """
+    Compare a run with the earlier runs of its scenario. Runs are the unit of comparison: the median latency of the
+    run is ranked among the median latencies of the baseline runs, so a run with a single request is checked too.
+    Args:
+        row_values (dict): the run, as returned by row_to_dict
+        baseline_runs (list): earlier runs of the scenario, as returned by ResultsStore.last_runs
+    Returns:
+        RegressionResult: result of the comparison
+    """
+    baseline = [value for value in map(run_p50, baseline_runs) if value is not None]
+    result = RegressionResult(
+        endpoint_name=row_values["endpoint_name"],
+        description=row_values["description"],
+        baseline_runs=len(baseline),
+        current_p50=run_p50(row_values),
+    )
+    if len(baseline) < MIN_BASELINE_RUNS or result.current_p50 is None:
+        return result
+
+    result.baseline_p50 = statistics.median(baseline)
+    result.p_value = rank_p_value(result.current_p50, baseline)
+    return result
+
+
+def check_regressions(
+    rows: MultiRow, store: ResultsStore, before: float
+) -> List[RegressionResult]:
+    """
+    Compare every run with a rolling baseline of the earlier runs of the same scenario
+    Args:
+        rows (MultiRow): rows returned by save_run_time_result
+        store (ResultsStore): store of earlier runs
+        before (float): only runs recorded before this time (seconds since the epoch) are part of the baseline
+    Returns:
+        list: result of every comparison
+    """
+    results = []
+    for row in rows:
+        baseline_runs = store.last_runs(scenario_key(row), BASELINE_RUNS, before=before)
+        result = compare_to_baseline(row_to_dict(row), baseline_runs)
+        results.append(result)
+
+        if result.current_p50 is None:
+            logger.info(f"No successful request to check {result.description}")
+        elif result.p_value is None:
+            logger.info(
+                f"Not enough history to check {result.description}: {result.baseline_runs} earlier runs, "
+                f"at least {MIN_BASELINE_RUNS} are needed"
+            )
+        elif result.is_regression:
+            logger.error(
+                f"Regression in {result.endpoint_name}: {result.description} "
+                f"median latency {result.current_p50:.3f}s vs {result.baseline_p50:.3f}s "
+                f"({result.slowdown:+.0%}, p={result.p_value:.4f})"
+            )
+        else:
+            logger.info(
+                f"No regression in {result.endpoint_name}: {result.description} "
+                f"({result.slowdown:+.0%}, p={result.p_value:.4f})"
+            )
+    return results
+
+
+def summarize_regressions(results: List[RegressionResult]) -> str:
+    """
+    Summarize the regressions found
+    Args:
+        results (list): results returned by check_regressions
+    Returns:
+        str: a json string listing the scenarios that got slower
+    """
+    return json.dumps(
+        [
+            {
+                "endpoint_name": result.endpoint_name,
+                "description": result.description,
+                "baseline_p50": result.baseline_p50,
+                "current_p50": result.current_p50,
+                "p_value": result.p_value,
+            }
+            for result in results
+            if result.is_regression
+        ],
+        indent=2,
+    )
@@ -0,0 +1,380 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Union
+
+import requests
+
+try:
+    import psutil
+except ImportError:
+    # optional: only needed to sample a local process with PsutilSampler
+    psutil = None
+
+logger = logging.getLogger("resources")
+
+# where the resources of the server are sampled from during every scenario, as "kind:target", for example
+# "prometheus:http://localhost:3001/metrics" or "psutil:1234" (a process id). Not set: resources are not sampled
+RESOURCE_SAMPLER = os.environ.get("PROFILER_RESOURCE_SAMPLER")
+# seconds between two samples
+RESOURCE_INTERVAL = float(os.environ.get("PROFILER_RESOURCE_INTERVAL", "1.0"))
+
+# metrics of the prometheus process collector, exported by the prometheus client libraries
+CPU_SECONDS_METRIC = "process_cpu_seconds_total"
+RSS_METRIC = "process_resident_memory_bytes"
+
+
+class ResourceSample(NamedTuple):
+    """
+    Resources used by the server at a point in time
+    """
+
+    # time.time() value at which the sample was taken
+    timestamp: float
+    # cpu time used by the server since it started, in seconds, or None if it is not known
+    cpu_seconds: Optional[float]
+    # resident memory of the server in bytes, or None if it is not known
+    rss_bytes: Optional[int]
+
+
+class ResourceSampler(ABC):
+    """
+    Read the resources used by the server. Subclasses implement sample.
+    """
+
+    def __init__(self, name: str):
+        # stored in the result row, to tell where the resources come from
+        self.name = name
+
+    @abstractmethod
+    def sample(self) -> ResourceSample:
+        """
+        Read the resources used by the server now
+        Returns:
+            ResourceSample: the resources used by the server
+        """
+
+
+class PsutilSampler(ResourceSampler):
+    """
+    Sample a process of this host and its children with psutil, for example a schematic server run locally.
+    Needs the psutil package.
+    """
+
+    def __init__(self, pid: int):
+        if psutil is None:
+            raise ImportError(
+                "Sampling a local process needs the psutil package: pip install psutil"
+            )
+        super().__init__(f"psutil:{pid}")
+        self.process = psutil.Process(pid)
+
+    def sample(self) -> ResourceSample:
+        cpu_seconds = 0.0
+        rss_bytes = 0
+        # a server may run its requests in worker processes, for example gunicorn or uwsgi
+        for process in [self.process] + self.process.children(recursive=True):
+            try:
+                with process.oneshot():
+                    cpu_times = process.cpu_times()
+                    cpu_seconds += cpu_times.user + cpu_times.system
+                    rss_bytes += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                # a child that exited between listing and reading it
+                continue
+        return ResourceSample(time.time(), cpu_seconds, rss_bytes)
+
+
+def parse_prometheus_text(text: str) -> Dict[str, float]:
+    """
+    Read the values of a page in the prometheus text format. Values of the same metric with different labels are
+    added, so that the processes of a server are counted together.
+    Args:
+        text (str): the page, as returned by a /metrics endpoint
+    Returns:
+        dict: value of every metric
+    """
+    values: Dict[str, float] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "{" in line:
+            name = line[: line.index("{")]
+            rest = line[line.rindex("}") + 1 :]
+        else:
+            name, _, rest = line.partition(" ")
+        try:
+            # the value may be followed by a timestamp
+            value = float(rest.split()[0])
+        except (IndexError, ValueError):
+            continue
+        values[name] = values.get(name, 0.0) + value
+    return values
+
+
+class PrometheusSampler(ResourceSampler):
+    """
+    Scrape the process metrics of a server from a prometheus text endpoint, for example the /metrics endpoint of the
+    prometheus client library, of a node exporter or of mock_schematic.py
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 5.0,
+        cpu_metric: str = CPU_SECONDS_METRIC,
+        rss_metric: str = RSS_METRIC,
+    ):
+        super().__init__(f"prometheus:{url}")
+        self.url = url
+        self.timeout = timeout
+        self.cpu_metric = cpu_metric
+        self.rss_metric = rss_metric
+
+    def sample(self) -> ResourceSample:
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        values = parse_prometheus_text(response.text)
+        rss_bytes = values.get(self.rss_metric)
+        return ResourceSample(
+            time.time(),
+            values.get(self.cpu_metric),
+            None if rss_bytes is None else int(rss_bytes),
+        )
+
+
+# kinds of samplers that can be configured with PROFILER_RESOURCE_SAMPLER, created from the target after the colon
+SAMPLER_TYPES: Dict[str, Callable[[str], ResourceSampler]] = {
+    "psutil": lambda target: PsutilSampler(int(target)),
+    "prometheus": PrometheusSampler,
+}
+
+
+def create_sampler(config: str) -> ResourceSampler:
+    """
+    Create a sampler from its configuration
+    Args:
+        config (str): "kind:target", where kind is one of SAMPLER_TYPES. For example, "prometheus:http://localhost:3001/metrics"
+    Returns:
+        ResourceSampler: the sampler
+    """
+    kind, _, target = config.partition(":")
+    if kind not in SAMPLER_TYPES or not target:
+        raise ValueError(
+            f"Unknown resource sampler {config}. Please use kind:target with a kind in {list(SAMPLER_TYPES)}"
+        )
+    return SAMPLER_TYPES[kind](target)
+
+
+@functools.lru_cache(maxsize=None)
+def configured_sampler() -> Optional[ResourceSampler]:
+    """
+    Get the sampler configured with PROFILER_RESOURCE_SAMPLER, shared by all the scenarios
+    Returns:
+        ResourceSampler: the sampler, or None if resources are not sampled
+    """
+    return create_sampler(RESOURCE_SAMPLER) if RESOURCE_SAMPLER else None
+
+
+class ResourceSeries:
+    """
+    Samples of the resources of the server during a run, and the cpu usage between two samples
+    """
+
+    def __init__(self, source: str = None):
+        self.source = source
+        self.samples: List[ResourceSample] = []
+        # percent of one core used between a sample and the previous one. None for the first sample
+        self.cpu_percents: List[Optional[float]] = []
+
+    def add(self, sample: ResourceSample) -> None:
+        cpu_percent = None
+        if self.samples:
+            previous = self.samples[-1]
+            elapsed = sample.timestamp - previous.timestamp
+            if (
+                elapsed > 0
+                and sample.cpu_seconds is not None
+                and previous.cpu_seconds is not None
+                # the cpu time goes back if the server restarted
+                and sample.cpu_seconds >= previous.cpu_seconds
+            ):
+                cpu_percent = (
+                    (sample.cpu_seconds - previous.cpu_seconds) / elapsed * 100
+                )
+        self.samples.append(sample)
+        self.cpu_percents.append(cpu_percent)
+
+    @property
+    def window_start(self) -> Optional[float]:
+        return self.samples[0].timestamp if self.samples else None
+
+    @property
+    def window_end(self) -> Optional[float]:
+        return self.samples[-1].timestamp if self.samples else None
+
+    @property
+    def peak_cpu_percent(self) -> Optional[float]:
+        values = [value for value in self.cpu_percents if value is not None]
+        return max(values) if values else None
+
+    @property
+    def mean_cpu_percent(self) -> Optional[float]:
+        """
+        Cpu usage over the whole window
+        """
+        known = [sample for sample in self.samples if sample.cpu_seconds is not None]
+        if len(known) < 2 or known[-1].timestamp <= known[0].timestamp:
+            return None
+        if known[-1].cpu_seconds < known[0].cpu_seconds:
+            return None
+        return (
+            (known[-1].cpu_seconds - known[0].cpu_seconds)
+            / (known[-1].timestamp - known[0].timestamp)
+            * 100
+        )
+
+    @property
+    def peak_rss_bytes(self) -> Optional[int]:
+        values = [sample.rss_bytes for sample in self.samples if sample.rss_bytes]
+        return max(values) if values else None
+
+    def to_row(self) -> List[Optional[Union[int, float, str]]]:
+        """
+        Get the values stored in a result row
+        Returns:
+            list: peak and mean cpu usage in percent of one core, peak resident memory in bytes, start and end of the
+                sampled window as unix timestamps, the source of the samples, and the samples as json
+                [[timestamp, cpu percent, rss bytes], ...]
+        """
+        cpu_percents = [self.peak_cpu_percent, self.mean_cpu_percent]
+        samples = [
+            [
+                round(sample.timestamp, 3),
+                None if cpu_percent is None else round(cpu_percent, 1),
+                sample.rss_bytes,
+            ]
+            for sample, cpu_percent in zip(self.samples, self.cpu_percents)
+        ]
+        return [
+            *(None if value is None else round(value, 1) for value in cpu_percents),
+            self.peak_rss_bytes,
+            None if self.window_start is None else round(self.window_start, 3),
+            None if self.window_end is None else round(self.window_end, 3),
+            self.source,
+            json.dumps(samples, separators=(",", ":")) if samples else None,
+        ]
+
+
+class ResourceMonitor:
+    """
+    Sample the resources of the server from a background thread while a scenario runs
+    """
+
+    def __init__(self, sampler: ResourceSampler, interval: float = RESOURCE_INTERVAL):
+        self.sampler = sampler
+        self.interval = interval
+        self.series = ResourceSeries(sampler.name)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._failed = False
+
+    def _sample(self) -> None:
+        try:
+            self.series.add(self.sampler.sample())
+        except Exception as err:
+            # a server that can not be sampled does not stop the run; warn once per run
+            if not self._failed:
+                logger.warning(
+                    f"Could not sample the resources of the server from {self.sampler.name}: {err!r}"
+                )
+            self._failed = True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._sample()
+        self._thread = threading.Thread(
+            target=self._run, name="resource-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> ResourceSeries:
+        """
+        Stop sampling, after a last sample
+        Returns:
+            ResourceSeries: the samples of the run
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+        return self.series
+
+
+@contextmanager
+def monitor_resources(
+    sampler: ResourceSampler = None,
+) -> Iterator[Optional[ResourceSeries]]:
+    """
+    Sample the resources of the server while the block runs
+    Args:
+        sampler (ResourceSampler, optional): default to configured_sampler(). where the resources are read from
+    Yields:
+        ResourceSeries: the samples, complete once the block ends, or None if resources are not sampled
+    """
+    sampler = sampler or configured_sampler()
+    if sampler is None:
+        yield None
+        return
+    monitor = ResourceMonitor(sampler)
+    monitor.start()
+    try:
+        yield monitor.series
+    finally:
+        monitor.stop()
+
+
+def current_rss_bytes() -> Optional[int]:
+    """
+    Get the resident memory of the current process
+    Returns:
+        int: resident memory in bytes, or None without psutil on a system without /proc
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+def process_metrics_text() -> str:
+    """
+    Get the cpu time and resident memory of the current process in the prometheus text format, as exported by the
+    prometheus client libraries. Used by mock_schematic.py to stand in for a monitored server.
+    Returns:
+        str: the metrics page
+    """
+    text = (
+        f"# HELP {CPU_SECONDS_METRIC} Total user and system CPU time spent in seconds.\n"
+        f"# TYPE {CPU_SECONDS_METRIC} counter\n"
+        f"{CPU_SECONDS_METRIC} {time.process_time()}\n"
+    )
+    rss_bytes = current_rss_bytes()
+    if rss_bytes is not None:
+        text += (
+            f"# HELP {RSS_METRIC} Resident memory size in bytes.\n"
+            f"# TYPE {RSS_METRIC} gauge\n"
+            f"{RSS_METRIC} {rss_bytes}\n"
+        )
+    return text
@@ -0,0 +1,315 @@
+import argparse
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import List
+
+import synapseclient
+
+from utils import (
+    ADDED_RESULT_COLUMNS,
+    RESULT_COLUMN_NAMES,
+    MultiRow,
+    Row,
+    StoreRuntime,
+    row_to_dict,
+)
+
+logger = logging.getLogger("results-store")
+
+# sqlite database where every result row is saved before it is uploaded to synapse
+RESULTS_DB_PATH = os.environ.get(
+    "PROFILER_RESULTS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.sqlite"),
+)
+
+# number of rows uploaded to synapse at once
+SYNC_BATCH_SIZE = 500
+# seconds between two checks for rows that are not uploaded yet
+SYNC_INTERVAL = 5
+
+# columns that identify a scenario. Runs of the same scenario can be compared with each other.
+SCENARIO_KEY_COLUMNS = [
+    "endpoint_name",
+    "data_schema",
+    "data_type",
+    "output_format",
+    "restrict_rules",
+    "manifest_record_type",
+    "asset_view",
+    "num_rows",
+    "num_concurrent",
+]
+# columns that identify a scenario only when they are set, so that the key of earlier runs does not change
+OPTIONAL_SCENARIO_KEY_COLUMNS = ["compression"]
+
+# sqlite type of the original columns of the result table
+BASE_COLUMN_TYPES = {
+    "num_rows": "INTEGER",
+    "restrict_rules": "INTEGER",
+    "num_concurrent": "INTEGER",
+    "latency": "REAL",
+    "num_status_200": "INTEGER",
+    "num_status_500": "INTEGER",
+    "num_status_504": "INTEGER",
+    "num_status_503": "INTEGER",
+}
+SYNAPSE_TO_SQLITE_TYPES = {"DOUBLE": "REAL", "INTEGER": "INTEGER"}
+
+
+def column_type(name: str) -> str:
+    """
+    Get the sqlite type of a column of the result table
+    Args:
+        name (str): name of the column
+    Returns:
+        str: sqlite type of the column
+    """
+    added_column_types = dict(ADDED_RESULT_COLUMNS)
+    if name in added_column_types:
+        return SYNAPSE_TO_SQLITE_TYPES.get(added_column_types[name], "TEXT")
+    return BASE_COLUMN_TYPES.get(name, "TEXT")
+
+
+def scenario_key(row: Row) -> str:
+    """
+    Get the key that identifies the scenario of a result row
+    Args:
+        row (Row): a row returned by save_run_time_result
+    Returns:
+        str: the values of SCENARIO_KEY_COLUMNS (and of the OPTIONAL_SCENARIO_KEY_COLUMNS that are set) as a json string
+    """
+    values = row_to_dict(row)
+    key = {name: values.get(name) for name in SCENARIO_KEY_COLUMNS}
+    key.update(
+        {
+            name: values[name]
+            for name in OPTIONAL_SCENARIO_KEY_COLUMNS
+            if values.get(name) is not None
+        }
+    )
+    return json.dumps(key)
+
+
+def stored_run_to_row(run: sqlite3.Row) -> Row:
+    """
+    Convert a run saved in the store back to a result row
+    Args:
+        run (sqlite3.Row): a run saved in the store
+    Returns:
+        Row: the row as returned by save_run_time_result
+    """
+    row = [run[name] for name in RESULT_COLUMN_NAMES]
+    # sqlite saves booleans as integers
+    restrict_rules_index = RESULT_COLUMN_NAMES.index("restrict_rules")
+    if row[restrict_rules_index] is not None:
+        row[restrict_rules_index] = bool(row[restrict_rules_index])
+    return row
+
+
+class ResultsStore:
+    """
+    Local store of result rows, indexed by scenario, endpoint and time.
+    Every thread gets its own sqlite connection.
+    """
+
+    def __init__(self, db_path: str = RESULTS_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._create_table()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if not hasattr(self._local, "connection"):
+            self._local.connection = sqlite3.connect(self.db_path, timeout=30)
+            self._local.connection.row_factory = sqlite3.Row
+        return self._local.connection
+
+    def _create_table(self) -> None:
+        """
+        Create the result table and its indexes, and add the columns that were introduced after the table was created
+        """
+        with self.connection as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "scenario_key TEXT NOT NULL, "
+                "recorded_at REAL NOT NULL, "
+                "synced INTEGER NOT NULL DEFAULT 0)"
+            )
+            existing_columns = {
+                column["name"]
+                for column in connection.execute("PRAGMA table_info(results)")
+            }
+            for name in RESULT_COLUMN_NAMES:
+                if name not in existing_columns:
+                    connection.execute(
+                        f'ALTER TABLE results ADD COLUMN "{name}" {column_type(name)}'
+                    )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_scenario ON results (scenario_key, recorded_at)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_endpoint ON results (endpoint_name, recorded_at)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_unsynced ON results (synced, id)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_start_time ON results (start_time_ns)"
+            )
+
+    def insert_rows(self, rows: MultiRow) -> None:
+        """
+        Save result rows
+        Args:
+            rows (MultiRow): rows returned by save_run_time_result
+        """
+        columns = ", ".join(f'"{name}"' for name in RESULT_COLUMN_NAMES)
+        placeholders = ", ".join("?" for _ in RESULT_COLUMN_NAMES)
+        recorded_at = time.time()
+        with self.connection as connection:
+            connection.executemany(
+                f"INSERT INTO results (scenario_key, recorded_at, {columns}) VALUES (?, ?, {placeholders})",
+                [
+                    [scenario_key(row), recorded_at]
+                    + list(row_to_dict(row).get(name) for name in RESULT_COLUMN_NAMES)
+                    for row in rows
+                ],
+            )
+        logger.info(f"Saved {len(rows)} rows to {self.db_path}")
+
+    def last_runs(self, key: str, limit: int = 10, before: float = None) -> List[dict]:
+        """
+        Get the last runs of a scenario, most recent first
+        Args:
+            key (str): key of the scenario, as returned by scenario_key
+            limit (int, optional): default to 10. number of runs to return
+            before (float, optional): default to None. if set, only runs recorded before this time (seconds since the epoch) are returned
+        Returns:
+            list: the runs as dictionaries
+        """
+        cursor = self.connection.execute(
+            "SELECT * FROM results WHERE scenario_key = ? AND recorded_at < ? ORDER BY recorded_at DESC LIMIT ?",
+            (key, math.inf if before is None else before, limit),
+        )
+        return [dict(run) for run in cursor]
+
+    def last_runs_of_endpoint(self, endpoint_name: str, limit: int = 10) -> List[dict]:
+        """
+        Get the last runs of all the scenarios of an endpoint, most recent first
+        Args:
+            endpoint_name (str): name of the endpoint. For example, model/validate
+            limit (int, optional): default to 10. number of runs to return
+        Returns:
+            list: the runs as dictionaries
+        """
+        cursor = self.connection.execute(
+            "SELECT * FROM results WHERE endpoint_name = ? ORDER BY recorded_at DESC LIMIT ?",
+            (endpoint_name, limit),
+        )
+        return [dict(run) for run in cursor]
+
+    def unsynced_rows(self, limit: int = SYNC_BATCH_SIZE) -> List[sqlite3.Row]:
+        """
+        Get the rows that are not uploaded to synapse yet, oldest first
+        Args:
+            limit (int, optional): default to SYNC_BATCH_SIZE. maximum number of rows to return
+        Returns:
+            list: the rows, with their id
+        """
+        return self.connection.execute(
+            "SELECT * FROM results WHERE synced = 0 ORDER BY id LIMIT ?", (limit,)
+        ).fetchall()
+
+    def mark_synced(self, ids: List[int]) -> None:
+        """
+        Mark rows as uploaded to synapse
+        Args:
+            ids (list): ids of the rows
+        """
+        with self.connection as connection:
+            connection.executemany(
+                "UPDATE results SET synced = 1 WHERE id = ?", [(i,) for i in ids]
+            )
+
+
+class SynapseSync:
+    """
+    Upload the rows of a ResultsStore to synapse in batches from a background thread.
+    Rows that fail to upload stay in the store and are uploaded by a later sync.
+    """
+
+    def __init__(self, store: ResultsStore, interval: float = SYNC_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="synapse-sync", daemon=True
+        )
+        self._syn: synapseclient.Synapse = None
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def sync_once(self) -> int:
+        """
+        Upload all the rows that are not uploaded yet
+        Returns:
+            int: number of rows uploaded
+        """
+        uploaded = 0
+        while True:
+            batch = self.store.unsynced_rows()
+            if not batch:
+                return uploaded
+            if self._syn is None:
+                self._syn = StoreRuntime().login_synapse()
+            rows = [stored_run_to_row(run) for run in batch]
+            StoreRuntime().record_run_time_result_synapse(rows, syn=self._syn)
+            self.store.mark_synced([run["id"] for run in batch])
+            uploaded += len(batch)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except Exception as err:
+                logger.error(
+                    f"Failed to upload results to synapse, will try again: {err}"
+                )
+            self._stop.wait(self.interval)
+
+    def close(self) -> None:
+        """
+        Stop the background thread and upload the remaining rows
+        """
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        try:
+            self.sync_once()
+        except Exception as err:
+            logger.error(
+                f"Failed to upload results to synapse. They are kept in {self.store.db_path}: {err}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Show the last runs saved in the local results store"
+    )
+    parser.add_argument("endpoint_name", help="for example, model/validate")
+    parser.add_argument("--last", type=int, default=10, help="number of runs")
+    args = parser.parse_args()
+
+    for run in ResultsStore().last_runs_of_endpoint(args.endpoint_name, args.last):
+        print(
+            f"{run['dt_string']} {run['description']}: latency {run['latency']}, "
+            f"p50 {run['latency_p50']}, p99 {run['latency_p99']}"
+        )
@@ -0,0 +1,205 @@
+import time
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import backoff
+
+from outcomes import CONFIGURATION_ERRORS, outcome_of
+from phases import measure_phases
+from timing import elapsed_seconds
+
+# seconds to wait for a connection to be established
+DEFAULT_CONNECT_TIMEOUT = 10.0
+# seconds to wait for the server to send data. Long enough for the largest synthetic manifests to be validated;
+# a request that waits longer is counted as a timeout instead of stalling its thread forever.
+DEFAULT_READ_TIMEOUT = 900.0
+
+# outcomes retried by default: failures where another attempt can succeed
+DEFAULT_RETRY_OUTCOMES = (
+    "timeout",
+    "connection_reset",
+    "connection_refused",
+    "429",
+    "502",
+    "503",
+    "504",
+)
+
+
+@dataclass(frozen=True)
+class RequestPolicy:
+    """
+    Timeouts and retry policy of the requests of a scenario. Retries are off by default (max_retries = 0),
+    so that the profiler measures the raw behavior of the server.
+    """
+
+    connect_timeout: Optional[float] = DEFAULT_CONNECT_TIMEOUT
+    read_timeout: Optional[float] = DEFAULT_READ_TIMEOUT
+    max_retries: int = 0
+    # the wait before retry n is drawn between 0 and min(backoff_base * 2 ** n, backoff_max) seconds
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    retry_on: Tuple[str, ...] = DEFAULT_RETRY_OUTCOMES
+
+    @property
+    def timeout(self) -> Tuple[Optional[float], Optional[float]]:
+        return self.connect_timeout, self.read_timeout
+
+    def should_retry(self, response: Any) -> bool:
+        """
+        Check if a request should be sent again
+        Args:
+            response: the response, its status code, or the exception raised by the request
+        Returns:
+            bool: True if the outcome of the request is in retry_on
+        """
+        return outcome_of(response) in self.retry_on
+
+    def retrying(self, attempt: Callable) -> Callable:
+        """
+        Wrap a function that sends one attempt so that it is retried with jittered exponential backoff
+        Args:
+            attempt (Callable): a function (or coroutine function) that returns the response of one attempt
+        Returns:
+            Callable: the wrapped function
+        """
+        if not self.max_retries:
+            return attempt
+        return backoff.on_predicate(
+            backoff.expo,
+            self.should_retry,
+            max_tries=self.max_retries + 1,
+            jitter=backoff.full_jitter,
+            logger=None,
+            factor=self.backoff_base,
+            max_value=self.backoff_max,
+        )(attempt)
+
+    def to_row(self) -> List[Optional[Union[int, float]]]:
+        """
+        Get the values stored in a result row
+        Returns:
+            list: connect timeout, read timeout and maximum number of retries
+        """
+        return [self.connect_timeout, self.read_timeout, self.max_retries]
+
+
+class TimedResult(NamedTuple):
+    """
+    Result of sending a request, including its retries
+    """
+
+    # the final response, its status code, or the exception raised by the last attempt
+    response: Any
+    # seconds from the start of the first attempt to the end of the last attempt
+    latency: float
+    # seconds from the start to the end of the first attempt
+    first_attempt_latency: float
+    retries: int
+    # seconds spent in every phase (see phases.PHASES) of the last attempt, or None if phases were not measured
+    phases: Optional[Dict[str, float]] = None
+    # time.perf_counter_ns() values at which the first attempt was sent and the last attempt finished
+    sent_at_ns: Optional[int] = None
+    finished_at_ns: Optional[int] = None
+
+
+def send_with_retries(
+    request_func: Callable,
+    args: tuple,
+    policy: RequestPolicy,
+    start_ns: int,
+) -> TimedResult:
+    """
+    Send a request, retrying it as allowed by the policy
+    Args:
+        request_func (Callable): a function that sends a request and accepts a timeout keyword argument. For example, fetch
+        args (tuple): arguments passed to request_func
+        policy (RequestPolicy): timeouts and retry policy
+        start_ns (int): time.perf_counter_ns() value from which latency is measured
+    Returns:
+        TimedResult: the final response, latency with and without retries and number of retries
+    """
+    attempt_ends: List[int] = []
+    attempt_phases: List[Optional[Dict[str, float]]] = []
+    # start_ns is when the request was scheduled, which is earlier if it waited to be sent
+    sent_at_ns = time.perf_counter_ns()
+
+    def attempt() -> Any:
+        with measure_phases() as phases:
+            try:
+                response = request_func(*args, timeout=policy.timeout)
+            except CONFIGURATION_ERRORS:
+                raise
+            except Exception as err:
+                # a failed request is an outcome of the run, not a reason to stop it
+                response = err
+        attempt_ends.append(time.perf_counter_ns())
+        attempt_phases.append(phases and phases.durations)
+        return response
+
+    response = policy.retrying(attempt)()
+    return TimedResult(
+        response,
+        elapsed_seconds(start_ns, attempt_ends[-1]),
+        elapsed_seconds(start_ns, attempt_ends[0]),
+        len(attempt_ends) - 1,
+        attempt_phases[-1],
+        sent_at_ns,
+        attempt_ends[-1],
+    )
+
+
+async def send_with_retries_async(
+    request_func: Callable[..., Awaitable],
+    args: tuple,
+    policy: RequestPolicy,
+    start_ns: int,
+) -> TimedResult:
+    """
+    Send a request from the async engine, retrying it as allowed by the policy
+    Args:
+        request_func (Callable): a coroutine function that sends a request and accepts a timeout keyword argument. For example, fetch_async
+        args (tuple): arguments passed to request_func
+        policy (RequestPolicy): timeouts and retry policy
+        start_ns (int): time.perf_counter_ns() value from which latency is measured
+    Returns:
+        TimedResult: the final response, latency with and without retries and number of retries
+    """
+    attempt_ends: List[int] = []
+    attempt_phases: List[Optional[Dict[str, float]]] = []
+    # start_ns is when the request was scheduled, which is earlier if it waited to be sent
+    sent_at_ns = time.perf_counter_ns()
+
+    async def attempt() -> Any:
+        with measure_phases() as phases:
+            try:
+                response = await request_func(*args, timeout=policy.timeout)
+            except CONFIGURATION_ERRORS:
+                raise
+            except Exception as err:
+                # a failed request is an outcome of the run, not a reason to stop it
+                response = err
+        attempt_ends.append(time.perf_counter_ns())
+        attempt_phases.append(phases and phases.durations)
+        return response
+
+    response = await policy.retrying(attempt)()
+    return TimedResult(
+        response,
+        elapsed_seconds(start_ns, attempt_ends[-1]),
+        elapsed_seconds(start_ns, attempt_ends[0]),
+        len(attempt_ends) - 1,
+        attempt_phases[-1],
+        sent_at_ns,
+        attempt_ends[-1],
+    )
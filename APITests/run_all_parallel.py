@@ -1,32 +1,114 @@
-import concurrent.futures
-from manifest_validate import monitor_manifest_validator
-from manifest_submit import monitor_manifest_submission
-from manifest_storage import monitor_manifest_storage
-from manifest_generator import monitor_manifest_generator
-from utils import StoreRuntime
+import argparse
+import os
+import sys
+import time
+from distributed import (
+    DEFAULT_COORDINATOR_ADDRESS,
+    Coordinator,
+    parse_address,
+    spawn_local_workers,
+)
+from progress import Dashboard
+from regression import check_regressions, summarize_regressions
+from results_store import ResultsStore, SynapseSync
+from scenario_catalog import (
+    add_catalog_arguments,
+    load_endpoint_limits,
+    run_scenario,
+    select_scenarios,
+)
+from scheduler import DEFAULT_MAX_WORKERS, ScenarioScheduler
+from tracing import shutdown_tracing
 
 
 if __name__ == "__main__":
-    all_rows_to_insert = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as e:
-        funcs = (
-            monitor_manifest_storage,
-            monitor_manifest_generator,
-            monitor_manifest_submission,
-            monitor_manifest_validator,
-        )
-        futures = [e.submit(func) for func in funcs]
+    parser = argparse.ArgumentParser(
+        description="Run the scenarios of the catalog and store the results"
+    )
+    add_catalog_arguments(parser)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="number of scenarios that run at the same time",
+    )
+    parser.add_argument(
+        "--distributed-workers",
+        type=int,
+        help="split the load of every scenario between this number of worker processes, "
+        "started with: python distributed.py --coordinator HOST:PORT",
+    )
+    parser.add_argument(
+        "--listen",
+        default="{}:{}".format(*DEFAULT_COORDINATOR_ADDRESS),
+        help="host:port the coordinator listens on for workers",
+    )
+    parser.add_argument(
+        "--spawn-local-workers",
+        action="store_true",
+        help="start the distributed workers as local processes",
+    )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="show a live view of the requests of every scenario, refreshed every second",
+    )
+    args = parser.parse_args()
+
+    run_func = run_scenario
+    coordinator = None
+    if args.distributed_workers:
+        coordinator = Coordinator(args.distributed_workers, parse_address(args.listen))
+        if args.spawn_local_workers:
+            spawn_local_workers(args.distributed_workers, coordinator.address)
+        coordinator.wait_for_workers()
+        run_func = coordinator.run_scenario
 
-        for f in concurrent.futures.as_completed(futures):
-            row_list = f.result()
+    # all scenarios share one worker pool, within the limits of every endpoint
+    scheduler = ScenarioScheduler(
+        select_scenarios(args),
+        max_workers=args.workers,
+        endpoint_limits=load_endpoint_limits(args.catalog),
+        run_func=run_func,
+    )
+
+    all_rows_to_insert = []
+    # runs saved before this time are the baseline of the regression check
+    run_started_at = time.time()
+    # save results locally as soon as they are available and upload them to synapse in the background
+    store = ResultsStore()
+    synapse_sync = SynapseSync(store)
+    synapse_sync.start()
+    dashboard = Dashboard() if args.progress else None
+    if dashboard:
+        dashboard.start()
+    try:
+        for spec, row in scheduler.run_iter():
+            # save results as soon as a scenario finishes
+            if isinstance(row, list) and row not in all_rows_to_insert:
+                all_rows_to_insert.append(row)
+                store.insert_rows([row])
+            else:
+                print(f"can not insert {row}")
+    finally:
+        if dashboard:
+            dashboard.close()
+        # export the last spans of the requests before the results are uploaded
+        shutdown_tracing()
+        if coordinator:
+            coordinator.close()
+        # store the remaining results on synapse
+        print(f"Inserting {len(all_rows_to_insert)} rows to Synapse")
+        synapse_sync.close()
 
-            # save results to a new list
-            for row in row_list:
-                if isinstance(row, list) and row not in all_rows_to_insert:
-                    all_rows_to_insert.append(row)
-                else:
-                    print(f"can not insert {row}")
-    # store results on synapse
-    srt = StoreRuntime()
-    print(f"Inserting {len(all_rows_to_insert)} rows to Synapse")
-    srt.record_run_time_result_synapse(rows=all_rows_to_insert)
+    # compare every scenario with its earlier runs and fail if a scenario got slower
+    regressions = [
+        result
+        for result in check_regressions(all_rows_to_insert, store, run_started_at)
+        if result.is_regression
+    ]
+    if regressions:
+        print(f"Found {len(regressions)} performance regressions:")
+        print(summarize_regressions(regressions))
+        if os.environ.get("PROFILER_FAIL_ON_REGRESSION", "true").lower() != "false":
+            sys.exit(1)
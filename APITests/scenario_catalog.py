@@ -0,0 +1,589 @@
+import argparse
+import functools
+import itertools
+import logging
+import os
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from outcomes import OutcomeCounter
+from progress import track_progress
+from resources import ResourceSeries, monitor_resources
+from retry import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, RequestPolicy
+from stats import LatencyStats, ThroughputStats
+from synthetic_manifest import count_manifest_rows, generate_synthetic_manifest
+from tracing import trace_attributes
+from transport import check_compression, compression_headers, load_manifest_payload
+from utils import (
+    BASE_URL,
+    DATA_FLOW_SCHEMA_URL,
+    EXAMPLE_SCHEMA_URL,
+    HTAN_SCHEMA_URL,
+    Row,
+    StoreRuntime,
+    fetch,
+    save_run_time_result,
+    send_manifest,
+    send_post_request,
+    send_request,
+    timed_request,
+)
+from warmup import SCHEMA_URL_PARAM, ColdStartStats, cold_probe_params
+
+logger = logging.getLogger("scenario-catalog")
+
+# catalog used when none is given
+SCENARIO_CATALOG_PATH = os.path.join(os.path.dirname(__file__), "scenarios.yaml")
+
+# variables that can be used as parameter values in the catalog
+CATALOG_VARIABLES = {
+    "$EXAMPLE_SCHEMA_URL": EXAMPLE_SCHEMA_URL,
+    "$HTAN_SCHEMA_URL": HTAN_SCHEMA_URL,
+    "$DATA_FLOW_SCHEMA_URL": DATA_FLOW_SCHEMA_URL,
+}
+
+# values of a result row that can be set by a scenario
+RESULT_FIELDS = (
+    "data_schema",
+    "num_rows",
+    "data_type",
+    "output_format",
+    "restrict_rules",
+    "manifest_record_type",
+    "asset_view",
+)
+# result values that default to the request parameter with the same name
+RESULT_FIELDS_FROM_PARAMS = ("data_type", "restrict_rules", "manifest_record_type")
+
+SCENARIO_METHODS = ("get", "post")
+
+# scenarios with one of these tags are only run when the tag or their name is selected. For example, the largest
+# synthetic manifests are only uploaded with `python run_all_parallel.py --tag large`
+OPT_IN_TAGS = ("large",)
+
+
+@dataclass(frozen=True)
+class ScenarioSpec:
+    """
+    One run of an endpoint, as described in the scenario catalog
+    """
+
+    name: str
+    endpoint: str
+    description: str
+    method: str = "get"
+    params: dict = field(default_factory=dict)
+    tags: Tuple[str, ...] = ()
+    auth: bool = False
+    concurrent_threads: int = 1
+    cooldown: float = 0
+    # parameters that identify a shared resource. Scenarios of the same endpoint with the same values never run at once
+    exclusive: Tuple[str, ...] = ()
+    # manifest to upload, relative to the APITests folder. The template of the synthetic manifest if synthetic_rows is set
+    manifest: Optional[str] = None
+    synthetic_rows: Optional[int] = None
+    result: dict = field(default_factory=dict)
+    # timeouts in seconds and retries of every request (see retry.RequestPolicy)
+    connect_timeout: Optional[float] = DEFAULT_CONNECT_TIMEOUT
+    read_timeout: Optional[float] = DEFAULT_READ_TIMEOUT
+    max_retries: int = 0
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    # compression of uploads and responses: None (client default), identity, gzip or zstd. See transport.py
+    compression: Optional[str] = None
+    # requests sent one at a time before the run. They are excluded from the stats and stored as the cold latency
+    warmup_requests: int = 0
+    # send a request with a data model url that the server never saw before the warm-up requests
+    cold_probe: bool = False
+
+    def __post_init__(self):
+        if self.method not in SCENARIO_METHODS:
+            raise ValueError(
+                f"Unknown method {self.method} in scenario {self.name}. Please use one of {SCENARIO_METHODS}"
+            )
+        if self.method == "post" and not self.manifest:
+            raise ValueError(f"Scenario {self.name} needs a manifest to post")
+        if self.compression is not None:
+            check_compression(self.compression)
+        if self.warmup_requests < 0:
+            raise ValueError(
+                f"warmup_requests of scenario {self.name} can not be negative"
+            )
+        if self.cold_probe and SCHEMA_URL_PARAM not in self.params:
+            raise ValueError(
+                f"Scenario {self.name} needs a {SCHEMA_URL_PARAM} parameter to send a cold-start probe"
+            )
+        unknown_fields = set(self.result) - set(RESULT_FIELDS)
+        if unknown_fields:
+            raise ValueError(
+                f"Unknown result fields {sorted(unknown_fields)} in scenario {self.name}. Please use {RESULT_FIELDS}"
+            )
+
+    @property
+    def url(self) -> str:
+        return f"{BASE_URL}/{self.endpoint}"
+
+    @property
+    def headers(self) -> Optional[dict]:
+        if not self.auth:
+            return None
+        return {"Authorization": f"Bearer {StoreRuntime.get_access_token()}"}
+
+    @property
+    def request_policy(self) -> RequestPolicy:
+        return RequestPolicy(
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            max_retries=self.max_retries,
+            backoff_base=self.backoff_base,
+            backoff_max=self.backoff_max,
+        )
+
+    @property
+    def lock_key(self) -> Optional[tuple]:
+        """
+        Key of the resource held by the scenario while it runs, or None if it does not hold one
+        """
+        if not self.exclusive:
+            return None
+        return (self.endpoint,) + tuple(
+            (name, self.params.get(name)) for name in self.exclusive
+        )
+
+    def manifest_path(self) -> Optional[str]:
+        """
+        Get the manifest to upload, generating the synthetic manifest if needed
+        Returns:
+            str: path of the manifest relative to the APITests folder, or None for scenarios that do not upload a manifest
+        """
+        if self.manifest and self.synthetic_rows:
+            return generate_synthetic_manifest(self.manifest, self.synthetic_rows)
+        return self.manifest
+
+    def result_fields(self, num_rows: int = None) -> dict:
+        """
+        Get the values stored in the result row of the scenario
+        Args:
+            num_rows (int, optional): default to None. number of rows of the uploaded manifest
+        Returns:
+            dict: keyword arguments of save_run_time_result
+        """
+        fields = {name: self.params.get(name) for name in RESULT_FIELDS_FROM_PARAMS}
+        fields["num_rows"] = num_rows
+        fields.update(self.result)
+        return fields
+
+    def trace_attributes(self, num_rows: int = None) -> dict:
+        """
+        Get the attributes of the spans of the requests of the scenario (see tracing.py)
+        Args:
+            num_rows (int, optional): default to None. number of rows of the uploaded manifest
+        Returns:
+            dict: the scenario, its endpoint and the values of its result row that describe the request
+        """
+        fields = self.result_fields(num_rows)
+        return {
+            "profiler.scenario": self.name,
+            "profiler.endpoint": self.endpoint,
+            "schematic.data_type": fields["data_type"],
+            "schematic.restrict_rules": fields["restrict_rules"],
+            "schematic.manifest_record_type": fields["manifest_record_type"],
+            "schematic.num_rows": fields["num_rows"],
+        }
+
+
+def resolve_variables(value):
+    """
+    Replace the catalog variables (CATALOG_VARIABLES) in a parameter value
+    """
+    if isinstance(value, str):
+        return CATALOG_VARIABLES.get(value, value)
+    if isinstance(value, list):
+        return [resolve_variables(item) for item in value]
+    return value
+
+
+def expand_entry(entry: dict, defaults: dict) -> List[ScenarioSpec]:
+    """
+    Turn an entry of the catalog into run specs: one for every combination of matrix values and manifest size
+    Args:
+        entry (dict): an entry of the scenarios list
+        defaults (dict): values used for the keys missing from the entry
+    Returns:
+        list: the run specs of the entry
+    """
+    entry = {**defaults, **entry}
+    matrix: Dict[str, list] = entry.pop("matrix", None) or {}
+    manifest_sizes: List[int] = entry.pop("manifest_sizes", None) or [None]
+    base_params = {
+        name: resolve_variables(value)
+        for name, value in (entry.pop("params", None) or {}).items()
+    }
+    entry["tags"] = tuple(entry.get("tags") or ())
+    entry["exclusive"] = tuple(entry.get("exclusive") or ())
+    entry["result"] = dict(entry.get("result") or {})
+
+    specs = []
+    for size in manifest_sizes:
+        for values in itertools.product(*matrix.values()):
+            params = {
+                **base_params,
+                **dict(zip(matrix, map(resolve_variables, values))),
+            }
+            suffix = "".join(f"-{value}" for value in values)
+            if size:
+                suffix += f"-{size}"
+            specs.append(
+                ScenarioSpec(
+                    **{
+                        **entry,
+                        "name": entry["name"] + suffix,
+                        "params": params,
+                        "synthetic_rows": size,
+                    }
+                )
+            )
+    return specs
+
+
+@functools.lru_cache(maxsize=None)
+def parse_catalog(
+    catalog_path: str, modified_time: float
+) -> Tuple[Tuple[ScenarioSpec, ...], Dict[str, int]]:
+    """
+    Parse a scenario catalog. Cached, so a catalog is only read again when it changes.
+    Args:
+        catalog_path (str): path of the yaml catalog
+        modified_time (float): modification time of the catalog, part of the cache key
+    Returns:
+        specs (tuple): the run specs of the catalog
+        endpoint_limits (dict): maximum number of scenarios of an endpoint that run at once
+    """
+    with open(catalog_path) as catalog_file:
+        catalog = yaml.safe_load(catalog_file) or {}
+    defaults = catalog.get("defaults") or {}
+    specs = []
+    for entry in catalog.get("scenarios") or []:
+        specs.extend(expand_entry(entry, defaults))
+
+    names = [spec.name for spec in specs]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate scenario names in {catalog_path}: {duplicates}")
+    endpoint_limits = {
+        endpoint: int(limit)
+        for endpoint, limit in (catalog.get("endpoint_limits") or {}).items()
+    }
+    logger.info(f"Loaded {len(specs)} scenarios from {catalog_path}")
+    return tuple(specs), endpoint_limits
+
+
+def _catalog_cache_key(catalog_path: str = None) -> Tuple[str, float]:
+    # the catalog is parsed again if it was modified since it was cached
+    catalog_path = os.path.abspath(catalog_path or SCENARIO_CATALOG_PATH)
+    return catalog_path, os.path.getmtime(catalog_path)
+
+
+def load_catalog(catalog_path: str = None) -> List[ScenarioSpec]:
+    """
+    Load the run specs of a scenario catalog. Loading has no side effects: nothing is sent until run_scenario is called.
+    Args:
+        catalog_path (str, optional): default to SCENARIO_CATALOG_PATH. path of the yaml catalog
+    Returns:
+        list: the run specs of the catalog
+    """
+    specs, _ = parse_catalog(*_catalog_cache_key(catalog_path))
+    return list(specs)
+
+
+def load_endpoint_limits(catalog_path: str = None) -> Dict[str, int]:
+    """
+    Load the maximum number of scenarios of every endpoint that run at once. Endpoints that are not listed have no limit.
+    Args:
+        catalog_path (str, optional): default to SCENARIO_CATALOG_PATH. path of the yaml catalog
+    Returns:
+        dict: limit of every endpoint
+    """
+    _, endpoint_limits = parse_catalog(*_catalog_cache_key(catalog_path))
+    return dict(endpoint_limits)
+
+
+def filter_scenarios(
+    specs: Iterable[ScenarioSpec],
+    tags: Iterable[str] = None,
+    endpoints: Iterable[str] = None,
+    names: Iterable[str] = None,
+) -> List[ScenarioSpec]:
+    """
+    Select scenarios. A scenario is selected if it matches every filter that is given. Scenarios with an opt-in tag
+    (OPT_IN_TAGS) are left out unless that tag or their name is selected.
+    Args:
+        specs (Iterable): run specs, as returned by load_catalog
+        tags (Iterable, optional): default to None. select scenarios with any of these tags
+        endpoints (Iterable, optional): default to None. select scenarios of any of these endpoints. For example, model/validate
+        names (Iterable, optional): default to None. select scenarios with any of these names
+    Returns:
+        list: the selected run specs
+    """
+    tags = set(tags or ())
+    endpoints = set(endpoints or ())
+    names = set(names or ())
+    return [
+        spec
+        for spec in specs
+        if (not tags or tags.intersection(spec.tags))
+        and (not endpoints or spec.endpoint in endpoints)
+        and (not names or spec.name in names)
+        and (spec.name in names or tags.issuperset(set(spec.tags) & set(OPT_IN_TAGS)))
+    ]
+
+
+def with_concurrency(
+    specs: Iterable[ScenarioSpec], concurrent_threads: int
+) -> List[ScenarioSpec]:
+    """
+    Run scenarios with another number of concurrent requests, without editing the catalog
+    Args:
+        specs (Iterable): run specs
+        concurrent_threads (int): number of concurrent requests
+    Returns:
+        list: copies of the run specs
+    """
+    return [replace(spec, concurrent_threads=concurrent_threads) for spec in specs]
+
+
+def send_scenario_requests(
+    spec: ScenarioSpec,
+    concurrent_threads: int = None,
+    url: str = None,
+    engine: str = None,
+) -> Tuple[str, float, OutcomeCounter, LatencyStats, Optional[int]]:
+    """
+    Send the requests of a scenario
+    Args:
+        spec (ScenarioSpec): the run spec
+        concurrent_threads (int, optional): default to spec.concurrent_threads. number of concurrent requests
+        url (str, optional): default to spec.url. url of the endpoint
+        engine (str, optional): default to utils.ENGINE_MODE. engine that sends the requests, one of utils.ENGINE_MODES
+    Returns:
+        dt_string (str): start time of running the API endpoints.
+        time_diff (float): time of finish running all requests.
+        status_code_dict (OutcomeCounter): number of requests and latency of every outcome of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
+        num_rows (int): number of rows of the uploaded manifest, or None for scenarios that do not upload a manifest
+    """
+    concurrent_threads = concurrent_threads or spec.concurrent_threads
+    url = url or spec.url
+    params = dict(spec.params)
+    headers = spec.headers
+
+    num_rows = None
+    if spec.method == "post":
+        file_path_manifest = spec.manifest_path()
+        num_rows = count_manifest_rows(file_path_manifest)
+
+    # show the requests on the live dashboard and describe them in their spans
+    with track_progress(spec.name), trace_attributes(
+        {
+            **spec.trace_attributes(num_rows),
+            "profiler.stage": "run",
+            "profiler.concurrency": concurrent_threads,
+        }
+    ):
+        if spec.method == "post":
+            dt_string, time_diff, status_code_dict, latency_stats = send_post_request(
+                url,
+                params,
+                concurrent_threads,
+                send_manifest,
+                file_path_manifest=file_path_manifest,
+                headers=headers,
+                policy=spec.request_policy,
+                compression=spec.compression,
+                engine=engine,
+            )
+            # do not keep large manifests in memory once they are sent
+            if spec.synthetic_rows:
+                load_manifest_payload.cache_clear()
+        else:
+            dt_string, time_diff, status_code_dict, latency_stats = send_request(
+                url,
+                params,
+                concurrent_threads,
+                headers=headers,
+                policy=spec.request_policy,
+                compression=spec.compression,
+                engine=engine,
+            )
+    return dt_string, time_diff, status_code_dict, latency_stats, num_rows
+
+
+def warm_up_scenario(spec: ScenarioSpec, url: str = None) -> ColdStartStats:
+    """
+    Send the cold-start probe and the warm-up requests of a scenario, one at a time, before its run.
+    The first requests with a data model make schematic download and parse it, so they are kept out of the stats of the run.
+    Args:
+        spec (ScenarioSpec): the run spec
+        url (str, optional): default to spec.url. url of the endpoint
+    Returns:
+        ColdStartStats: latency of the probe and of the warm-up requests
+    """
+    cold_start = ColdStartStats()
+    if not spec.cold_probe and not spec.warmup_requests:
+        return cold_start
+
+    url = url or spec.url
+    headers = compression_headers(spec.headers, spec.compression)
+    file_path_manifest = spec.manifest_path()
+    num_rows = count_manifest_rows(file_path_manifest) if file_path_manifest else None
+
+    def send(params: dict, stage: str):
+        with trace_attributes(
+            {**spec.trace_attributes(num_rows), "profiler.stage": stage}
+        ):
+            if spec.method == "post":
+                return timed_request(
+                    send_manifest,
+                    url,
+                    params,
+                    headers,
+                    file_path_manifest,
+                    spec.compression,
+                    policy=spec.request_policy,
+                )
+            return timed_request(
+                fetch, url, params, headers, policy=spec.request_policy
+            )
+
+    if spec.cold_probe:
+        cold_start.record_probe(send(cold_probe_params(spec.params), "cold_probe"))
+        logger.info(
+            f"Cold-start probe of {spec.name}: {cold_start.probe_outcome} in {cold_start.probe_latency:.2f}s"
+        )
+    for _ in range(spec.warmup_requests):
+        cold_start.record_warmup(send(dict(spec.params), "warmup"))
+    if spec.warmup_requests:
+        logger.info(
+            f"Warmed up {spec.name} with {spec.warmup_requests} requests, cold latency: {cold_start.cold_latency:.2f}s"
+            + (
+                f", {cold_start.warmup_errors} failed"
+                if cold_start.warmup_errors
+                else ""
+            )
+        )
+    return cold_start
+
+
+def save_scenario_result(
+    spec: ScenarioSpec,
+    dt_string: str,
+    time_diff: float,
+    status_code_dict: OutcomeCounter,
+    latency_stats: LatencyStats,
+    num_rows: int = None,
+    throughput: ThroughputStats = None,
+    cold_start: ColdStartStats = None,
+    resources: ResourceSeries = None,
+) -> Row:
+    """
+    Record the result of a scenario
+    Args:
+        spec (ScenarioSpec): the run spec
+        dt_string (str): start time of running the API endpoints.
+        time_diff (float): time of finish running all requests.
+        status_code_dict (OutcomeCounter): number of requests and latency of every outcome of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
+        num_rows (int, optional): default to None. number of rows of the uploaded manifest
+        throughput (ThroughputStats, optional): default to None. throughput of the run
+        cold_start (ColdStartStats, optional): default to None. requests sent before the run (see warm_up_scenario)
+        resources (ResourceSeries, optional): default to None. resources of the server during the run
+    Returns:
+        Row: the result row of the run
+    """
+    return save_run_time_result(
+        endpoint_name=spec.endpoint,
+        description=spec.description.format(num_rows=num_rows, **spec.params),
+        dt_string=dt_string,
+        num_concurrent=spec.concurrent_threads,
+        latency=time_diff,
+        status_code_dict=status_code_dict,
+        latency_stats=latency_stats,
+        throughput=throughput,
+        request_policy=spec.request_policy,
+        compression=spec.compression,
+        cold_start=cold_start,
+        resources=resources,
+        **spec.result_fields(num_rows),
+    )
+
+
+def run_scenario(spec: ScenarioSpec) -> Row:
+    """
+    Run a scenario and record its result
+    Args:
+        spec (ScenarioSpec): the run spec
+    Returns:
+        Row: the result row of the run
+    """
+    logger.info(f"Running scenario {spec.name}")
+    cold_start = warm_up_scenario(spec)
+    # sample the server while the requests are sent, so that its resources line up with the latency of the run
+    with monitor_resources() as resources:
+        results = send_scenario_requests(spec)
+    return save_scenario_result(
+        spec, *results, cold_start=cold_start, resources=resources
+    )
+
+
+def add_catalog_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the options used to select scenarios to a command line parser
+    """
+    parser.add_argument("--catalog", help="yaml scenario catalog")
+    parser.add_argument(
+        "--tag",
+        action="append",
+        help=f"only run scenarios with this tag. Scenarios tagged {', '.join(OPT_IN_TAGS)} only run if selected",
+    )
+    parser.add_argument(
+        "--endpoint",
+        action="append",
+        help="only run scenarios of this endpoint. For example, model/validate",
+    )
+    parser.add_argument(
+        "--scenario", action="append", help="only run the scenario with this name"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, help="number of concurrent requests of every run"
+    )
+
+
+def select_scenarios(args: argparse.Namespace) -> List[ScenarioSpec]:
+    """
+    Load the scenarios selected on the command line
+    Args:
+        args (argparse.Namespace): arguments parsed with the options of add_catalog_arguments
+    Returns:
+        list: the selected run specs
+    """
+    specs = filter_scenarios(
+        load_catalog(args.catalog),
+        tags=args.tag,
+        endpoints=args.endpoint,
+        names=args.scenario,
+    )
+    if args.concurrency:
+        specs = with_concurrency(specs, args.concurrency)
+    return specs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the scenarios of a catalog")
+    add_catalog_arguments(parser)
+    for spec in select_scenarios(parser.parse_args()):
+        print(
+            f"{spec.name}: {spec.method.upper()} {spec.endpoint} "
+            f"x{spec.concurrent_threads} [{', '.join(spec.tags)}]"
+        )
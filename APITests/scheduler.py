@@ -0,0 +1,143 @@
+import concurrent.futures
+import logging
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from scenario_catalog import ScenarioSpec, run_scenario
+from utils import MultiRow, Row
+
+logger = logging.getLogger("scheduler")
+
+# number of scenarios that run at the same time when none is given
+DEFAULT_MAX_WORKERS = 8
+
+
+class ScenarioScheduler:
+    """
+    Run scenarios on a shared worker pool, as fast as the limits allow.
+    Scenarios are started in the order they are given, skipping the ones that can not start yet, so that a free worker
+    never waits behind a blocked scenario. A scenario can not start while:
+    - its endpoint already runs as many scenarios as its limit in endpoint_limits
+    - another scenario holds the same lock (see ScenarioSpec.lock_key)
+    A finished scenario keeps its endpoint slot and its lock for `cooldown` seconds.
+    """
+
+    def __init__(
+        self,
+        specs: List[ScenarioSpec],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        endpoint_limits: Dict[str, int] = None,
+        run_func: Callable[[ScenarioSpec], Row] = run_scenario,
+    ):
+        for endpoint, limit in (endpoint_limits or {}).items():
+            if limit < 1:
+                raise ValueError(
+                    f"The limit of {endpoint} must be at least 1, got {limit}"
+                )
+        self.specs = list(specs)
+        self.max_workers = max_workers
+        self.endpoint_limits = endpoint_limits or {}
+        self.run_func = run_func
+        # number of running or cooling down scenarios of every endpoint
+        self._endpoint_usage: Counter = Counter()
+        # locks held by running or cooling down scenarios
+        self._held_locks = set()
+        # (time the cooldown ends, spec) of scenarios that are cooling down
+        self._cooling_down: List[Tuple[float, ScenarioSpec]] = []
+
+    def _can_start(self, spec: ScenarioSpec) -> bool:
+        limit = self.endpoint_limits.get(spec.endpoint)
+        if limit is not None and self._endpoint_usage[spec.endpoint] >= limit:
+            return False
+        return spec.lock_key is None or spec.lock_key not in self._held_locks
+
+    def _acquire(self, spec: ScenarioSpec) -> None:
+        self._endpoint_usage[spec.endpoint] += 1
+        if spec.lock_key is not None:
+            self._held_locks.add(spec.lock_key)
+
+    def _release(self, spec: ScenarioSpec) -> None:
+        self._endpoint_usage[spec.endpoint] -= 1
+        if spec.lock_key is not None:
+            self._held_locks.discard(spec.lock_key)
+
+    def _end_cooldowns(self, now: float) -> None:
+        still_cooling_down = []
+        for cooldown_end, spec in self._cooling_down:
+            if cooldown_end <= now:
+                self._release(spec)
+            else:
+                still_cooling_down.append((cooldown_end, spec))
+        self._cooling_down = still_cooling_down
+
+    def _finish(self, spec: ScenarioSpec, now: float) -> None:
+        if spec.cooldown:
+            self._cooling_down.append((now + spec.cooldown, spec))
+        else:
+            self._release(spec)
+
+    def run_iter(self) -> Iterator[Tuple[ScenarioSpec, Row]]:
+        """
+        Run the scenarios and yield their results as soon as they finish. A scenario that raises is logged and
+        skipped.
+        Yields:
+            spec (ScenarioSpec): a scenario that finished
+            row (Row): its result row
+        """
+        pending = list(self.specs)
+        running: Dict[concurrent.futures.Future, ScenarioSpec] = {}
+        started_at = time.monotonic()
+        failed = 0
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="scenario"
+        ) as pool:
+            while pending or running:
+                self._end_cooldowns(time.monotonic())
+                for spec in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    if self._can_start(spec):
+                        pending.remove(spec)
+                        self._acquire(spec)
+                        running[pool.submit(self.run_func, spec)] = spec
+
+                if not running:
+                    # every pending scenario waits for a cooldown to end
+                    next_cooldown_end = min(end for end, _ in self._cooling_down)
+                    time.sleep(max(next_cooldown_end - time.monotonic(), 0))
+                    continue
+
+                timeout = None
+                if pending and self._cooling_down:
+                    next_cooldown_end = min(end for end, _ in self._cooling_down)
+                    timeout = max(next_cooldown_end - time.monotonic(), 0)
+                done, _ = concurrent.futures.wait(
+                    running,
+                    timeout=timeout,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for future in done:
+                    spec = running.pop(future)
+                    self._finish(spec, time.monotonic())
+                    try:
+                        row = future.result()
+                    except Exception:
+                        # the other scenarios keep running and their results are still saved
+                        logger.exception(f"Scenario {spec.name} failed")
+                        failed += 1
+                        continue
+                    yield spec, row
+
+        logger.info(
+            f"Ran {len(self.specs)} scenarios in {time.monotonic() - started_at:.2f} seconds "
+            f"with {self.max_workers} workers, {failed} failed"
+        )
+
+    def run(self) -> MultiRow:
+        """
+        Run the scenarios
+        Returns:
+            MultiRow: the result rows, in the order the scenarios finished
+        """
+        return [row for _, row in self.run_iter()]
@@ -0,0 +1,390 @@
+import json
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from timing import NANOSECONDS_PER_SECOND
+
+# smallest latency (in seconds) the histogram distinguishes. Anything faster lands in the first bucket.
+HISTOGRAM_MIN_VALUE = 1e-6
+# relative width of a histogram bucket. Percentiles read from the histogram are within this error.
+HISTOGRAM_PRECISION = 0.01
+
+# percentiles reported for every run
+PERCENTILES = (50, 90, 95, 99)
+
+
+class LatencyHistogram:
+    """
+    A sparse histogram with logarithmic buckets (similar to an HDR histogram).
+    Every bucket is HISTOGRAM_PRECISION wider than the one before it, so a run can be
+    stored and compared with other runs without keeping every sample. Two histograms can be merged exactly.
+    """
+
+    def __init__(self, buckets: Optional[Dict[int, int]] = None):
+        self.buckets: Dict[int, int] = dict(buckets or {})
+
+    @staticmethod
+    def bucket_index(value: float) -> int:
+        """
+        Get the index of the bucket a value belongs to
+        Args:
+            value (float): a latency in seconds
+        Returns:
+            int: index of the bucket
+        """
+        if value <= HISTOGRAM_MIN_VALUE:
+            return 0
+        return int(
+            math.log(value / HISTOGRAM_MIN_VALUE) / math.log1p(HISTOGRAM_PRECISION)
+        )
+
+    @staticmethod
+    def bucket_value(index: int) -> float:
+        """
+        Get the value that represents a bucket (the geometric middle of the bucket)
+        Args:
+            index (int): index of the bucket
+        Returns:
+            float: a latency in seconds
+        """
+        return HISTOGRAM_MIN_VALUE * (1 + HISTOGRAM_PRECISION) ** (index + 0.5)
+
+    @property
+    def count(self) -> int:
+        return sum(self.buckets.values())
+
+    def record(self, value: float, count: int = 1) -> None:
+        """
+        Add a value to the histogram
+        Args:
+            value (float): a latency in seconds
+            count (int): number of times the value was seen
+        """
+        index = self.bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """
+        Add all the counts of another histogram to this histogram
+        Args:
+            other (LatencyHistogram): histogram to merge
+        """
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Estimate a percentile from the histogram
+        Args:
+            percent (float): percentile between 0 and 100
+        Returns:
+            float: the estimated value or None if the histogram is empty
+        """
+        total = self.count
+        if not total:
+            return None
+        rank = max(1, math.ceil(total * percent / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self.bucket_value(index)
+        return self.bucket_value(max(self.buckets))
+
+    def to_json(self) -> str:
+        """
+        Serialize the histogram to a compact json string
+        Returns:
+            str: json string mapping bucket index to count
+        """
+        return json.dumps(
+            {str(index): self.buckets[index] for index in sorted(self.buckets)},
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, histogram_json: str) -> "LatencyHistogram":
+        """
+        Load a histogram that was serialized by to_json
+        Args:
+            histogram_json (str): json string mapping bucket index to count
+        Returns:
+            LatencyHistogram: the loaded histogram
+        """
+        buckets = json.loads(histogram_json) if histogram_json else {}
+        return cls({int(index): count for index, count in buckets.items()})
+
+
+class LatencyStats:
+    """
+    Latency distribution of a run. Mean, standard deviation, min and max are exact;
+    percentiles are read from the histogram and clamped to the observed min and max.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.histogram = LatencyHistogram()
+
+    @classmethod
+    def from_samples(cls, samples: Iterable[float]) -> "LatencyStats":
+        """
+        Build latency stats from a list of latencies
+        Args:
+            samples (Iterable[float]): latency of each request in seconds
+        Returns:
+            LatencyStats: stats of the samples
+        """
+        stats = cls()
+        for sample in samples:
+            stats.record(sample)
+        return stats
+
+    def record(self, value: float) -> None:
+        """
+        Add the latency of one request
+        Args:
+            value (float): latency in seconds
+        """
+        self.count += 1
+        self.total += value
+        self.total_squares += value * value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.histogram.record(value)
+
+    def merge(self, other: "LatencyStats") -> None:
+        """
+        Add the latencies recorded by another LatencyStats object
+        Args:
+            other (LatencyStats): stats to merge
+        """
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.histogram.merge(other.histogram)
+
+    @property
+    def mean(self) -> Optional[float]:
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    @property
+    def stddev(self) -> Optional[float]:
+        if not self.count:
+            return None
+        variance = self.total_squares / self.count - self.mean**2
+        return math.sqrt(max(variance, 0.0))
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Get a percentile of the latency distribution
+        Args:
+            percent (float): percentile between 0 and 100
+        Returns:
+            float: latency in seconds or None if nothing was recorded
+        """
+        value = self.histogram.percentile(percent)
+        if value is None:
+            return None
+        return min(max(value, self.min), self.max)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """
+        Summarize the distribution
+        Returns:
+            dict: p50, p90, p95, p99, max, mean and stddev in seconds
+        """
+        summary = {f"p{percent}": self.percentile(percent) for percent in PERCENTILES}
+        summary["max"] = self.max
+        summary["mean"] = self.mean
+        summary["stddev"] = self.stddev
+        return summary
+
+    def to_row(self) -> List[Optional[float]]:
+        """
+        Get the values stored in a result row
+        Returns:
+            list: p50, p90, p95, p99, max, mean, stddev (in seconds, rounded to 4 decimals) and the histogram as json
+        """
+        values = [
+            None if value is None else round(value, 4)
+            for value in self.summary().values()
+        ]
+        return values + [self.histogram.to_json()]
+
+    def to_dict(self) -> dict:
+        """
+        Serialize the stats without losing precision, for example to send them to another process
+        Returns:
+            dict: json serializable dictionary
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "total_squares": self.total_squares,
+            "min": self.min,
+            "max": self.max,
+            "histogram": self.histogram.to_json(),
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "LatencyStats":
+        """
+        Load stats that were serialized by to_dict
+        Args:
+            values (dict): dictionary returned by to_dict
+        Returns:
+            LatencyStats: the loaded stats
+        """
+        stats = cls()
+        stats.count = values["count"]
+        stats.total = values["total"]
+        stats.total_squares = values["total_squares"]
+        stats.min = values["min"]
+        stats.max = values["max"]
+        stats.histogram = LatencyHistogram.from_json(values["histogram"])
+        return stats
+
+
+@dataclass
+class ThroughputStats:
+    """
+    Throughput of a run. For open-loop runs, offered_rps is the average rate at which requests were
+    scheduled and shortfall is how far the achieved throughput fell below it.
+    """
+
+    completed: int
+    elapsed: float
+    target_rps: Optional[float] = None
+    offered_rps: Optional[float] = None
+
+    @property
+    def achieved_rps(self) -> Optional[float]:
+        if not self.elapsed:
+            return None
+        return self.completed / self.elapsed
+
+    @property
+    def shortfall(self) -> Optional[float]:
+        if not self.offered_rps or self.achieved_rps is None:
+            return None
+        return max(0.0, 1 - self.achieved_rps / self.offered_rps)
+
+    def to_row(self) -> List[Optional[float]]:
+        """
+        Get the values stored in a result row
+        Returns:
+            list: target requests per second, achieved requests per second and the shortfall as a fraction of the offered rate
+        """
+        return [
+            None if value is None else round(value, 4)
+            for value in (self.target_rps, self.achieved_rps, self.shortfall)
+        ]
+
+
+class ConcurrencyStats:
+    """
+    Number of requests of a run that were in flight at the same time, from the times every request was sent and
+    finished. Shows runs that sent fewer requests at once than asked for, for example because the client ran out of
+    threads or connections.
+    """
+
+    def __init__(self):
+        # (time.perf_counter_ns() value when sent, when finished) of every request recorded in this process
+        self.intervals: List[Tuple[int, int]] = []
+        # seconds spent in flight by all the requests
+        self.busy_seconds = 0.0
+        # peak of the counters merged from other processes. Their clocks can not be compared with this one, so their
+        # peaks are added: the requests of a run split across workers are sent at the same time
+        self.merged_peak = 0
+
+    def record(self, sent_at_ns: int, finished_at_ns: int) -> None:
+        """
+        Add a request
+        Args:
+            sent_at_ns (int): time.perf_counter_ns() value at which the request was sent
+            finished_at_ns (int): time.perf_counter_ns() value at which its response was read
+        """
+        self.intervals.append((sent_at_ns, finished_at_ns))
+        self.busy_seconds += (finished_at_ns - sent_at_ns) / NANOSECONDS_PER_SECOND
+
+    def merge(self, other: "ConcurrencyStats") -> None:
+        """
+        Add the requests recorded by another run or process, sent at the same time as the requests of this one
+        Args:
+            other (ConcurrencyStats): stats to merge
+        """
+        self.merged_peak += other.peak
+        self.busy_seconds += other.busy_seconds
+
+    @property
+    def peak(self) -> int:
+        # a request that finished when another was sent did not overlap it: ends sort before starts
+        events = sorted(
+            [(sent_at, 1) for sent_at, _ in self.intervals]
+            + [(finished_at, -1) for _, finished_at in self.intervals]
+        )
+        in_flight = peak = 0
+        for _, change in events:
+            in_flight += change
+            peak = max(peak, in_flight)
+        return peak + self.merged_peak
+
+    def mean(self, elapsed: float) -> Optional[float]:
+        """
+        Get the average number of requests in flight
+        Args:
+            elapsed (float): wall time of the run in seconds
+        Returns:
+            float: seconds spent in flight by all the requests divided by elapsed, or None if elapsed is 0
+        """
+        if not elapsed:
+            return None
+        return self.busy_seconds / elapsed
+
+    def to_dict(self) -> dict:
+        """
+        Serialize the stats, for example to send them to another process. Only the peak of the intervals is kept.
+        Returns:
+            dict: json serializable dictionary
+        """
+        return {"peak": self.peak, "busy_seconds": self.busy_seconds}
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "ConcurrencyStats":
+        """
+        Load stats that were serialized by to_dict
+        Args:
+            values (dict): dictionary returned by to_dict
+        Returns:
+            ConcurrencyStats: the loaded stats
+        """
+        stats = cls()
+        stats.merged_peak = values["peak"]
+        stats.busy_seconds = values["busy_seconds"]
+        return stats
+
+    def to_row(self, elapsed: float) -> List[Optional[float]]:
+        """
+        Get the values stored in a result row
+        Args:
+            elapsed (float): wall time of the run in seconds
+        Returns:
+            list: peak number of requests in flight (None if no request was recorded) and the average number of
+                requests in flight, rounded to 2 decimals
+        """
+        peak = self.peak
+        mean = self.mean(elapsed)
+        if not peak:
+            return [None, None]
+        return [peak, None if mean is None else round(mean, 2)]
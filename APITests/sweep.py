@@ -0,0 +1,199 @@
+import argparse
+import csv
+import logging
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional
+
+from results_store import ResultsStore, SynapseSync
+from scenario_catalog import (
+    ScenarioSpec,
+    add_catalog_arguments,
+    run_scenario,
+    select_scenarios,
+    with_concurrency,
+)
+from utils import MultiRow, Row, row_to_dict
+
+logger = logging.getLogger("sweep")
+
+# concurrency levels used when none are given
+DEFAULT_CONCURRENCY_LEVELS = [1, 2, 4, 8, 16, 32, 64]
+# scenarios swept when none are selected on the command line
+DEFAULT_SWEEP_SCENARIOS = [
+    "validate-synthetic-HTAN-biospecimen-1000",
+    "validate-synthetic-HTAN-biospecimen-10000",
+    "generate-example-google-sheet",
+]
+
+# throughput has stopped rising when adding concurrency gains less than this fraction of the ideal (linear) gain
+KNEE_MIN_THROUGHPUT_GAIN = 0.1
+# tail latency has jumped when p99 grows by more than this factor from one concurrency level to the next
+KNEE_MAX_LATENCY_JUMP = 2.0
+
+
+@dataclass
+class SweepPoint:
+    """
+    Result of running a scenario at one concurrency level and manifest size
+    """
+
+    concurrency: int
+    num_rows: Optional[int]
+    throughput: Optional[float]
+    latency_p50: Optional[float]
+    latency_p99: Optional[float]
+    num_errors: int
+
+    @classmethod
+    def from_row(cls, row: Row) -> "SweepPoint":
+        """
+        Build a point of the curve from a result row
+        Args:
+            row (Row): a row returned by save_run_time_result
+        Returns:
+            SweepPoint: the point of the curve
+        """
+        values = row_to_dict(row)
+        return cls(
+            concurrency=values["num_concurrent"],
+            num_rows=values["num_rows"],
+            throughput=values["achieved_rps"],
+            latency_p50=values["latency_p50"],
+            latency_p99=values["latency_p99"],
+            num_errors=values["num_errors"],
+        )
+
+
+def run_sweep(
+    specs: Iterable[ScenarioSpec], concurrency_levels: List[int] = None
+) -> MultiRow:
+    """
+    Run scenarios across a grid of concurrency levels. The manifest sizes come from the catalog: an entry with
+    manifest_sizes gives one scenario, and so one curve, per size.
+    Args:
+        specs (Iterable): run specs, as returned by load_catalog. For example, validate-synthetic-HTAN-biospecimen-1000
+        concurrency_levels (list, optional): default to DEFAULT_CONCURRENCY_LEVELS. number of concurrent requests of every run
+    Returns:
+        MultiRow: result row of every run
+    """
+    rows = []
+    for spec in specs:
+        for concurrency in concurrency_levels or DEFAULT_CONCURRENCY_LEVELS:
+            [run_spec] = with_concurrency([spec], concurrency)
+            logger.info(f"Running {spec.name} with {concurrency} concurrent requests")
+            rows.append(run_scenario(run_spec))
+    return rows
+
+
+def find_knee(points: List[SweepPoint]) -> Optional[SweepPoint]:
+    """
+    Find the saturation point of a throughput/latency curve: the last concurrency level before
+    throughput stops rising or tail latency jumps.
+    Args:
+        points (list): points of the curve for one manifest size
+    Returns:
+        SweepPoint: the saturation point, or None if the scenario did not saturate within the grid
+    """
+    points = sorted(points, key=lambda point: point.concurrency)
+    for previous, point in zip(points, points[1:]):
+        if not previous.throughput or not point.throughput:
+            continue
+        ideal_gain = previous.throughput * (
+            point.concurrency / previous.concurrency - 1
+        )
+        throughput_stalled = (
+            point.throughput - previous.throughput
+            < KNEE_MIN_THROUGHPUT_GAIN * ideal_gain
+        )
+        latency_jumped = (
+            previous.latency_p99 is not None
+            and point.latency_p99 is not None
+            and point.latency_p99 > KNEE_MAX_LATENCY_JUMP * previous.latency_p99
+        )
+        if throughput_stalled or latency_jumped:
+            return previous
+    return None
+
+
+def build_curves(rows: MultiRow) -> Dict[Optional[int], List[SweepPoint]]:
+    """
+    Group the result rows of a sweep into one throughput/latency curve per manifest size
+    Args:
+        rows (MultiRow): rows returned by run_sweep
+    Returns:
+        dict: points of the curve, sorted by concurrency, for every manifest size
+    """
+    curves: Dict[Optional[int], List[SweepPoint]] = {}
+    for row in rows:
+        point = SweepPoint.from_row(row)
+        curves.setdefault(point.num_rows, []).append(point)
+    for points in curves.values():
+        points.sort(key=lambda point: point.concurrency)
+    return curves
+
+
+def report_curves(
+    rows: MultiRow, output_path: str = None
+) -> Dict[Optional[int], Optional[SweepPoint]]:
+    """
+    Log the throughput/latency curve and the saturation point of every manifest size
+    Args:
+        rows (MultiRow): rows returned by run_sweep
+        output_path (str, optional): default to None. if set, the points of the curves are also written to this csv file
+    Returns:
+        dict: saturation point of every manifest size
+    """
+    curves = build_curves(rows)
+    knees = {}
+    for size, points in curves.items():
+        knee = find_knee(points)
+        knees[size] = knee
+        logger.info(f"Curve for {size} rows:" if size else "Curve:")
+        for point in points:
+            logger.info(
+                f"  concurrency {point.concurrency}: {point.throughput} requests per second, "
+                f"p50 {point.latency_p50}, p99 {point.latency_p99}, {point.num_errors} errors"
+            )
+        if knee:
+            logger.info(f"  saturation at {knee.concurrency} concurrent requests")
+        else:
+            logger.info("  no saturation within the concurrency levels")
+
+    if output_path:
+        with open(output_path, "w", newline="") as output:
+            writer = csv.DictWriter(
+                output, fieldnames=list(SweepPoint.__dataclass_fields__) + ["is_knee"]
+            )
+            writer.writeheader()
+            for size, points in curves.items():
+                for point in points:
+                    writer.writerow({**asdict(point), "is_knee": point is knees[size]})
+    return knees
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run scenarios across a grid of concurrency levels and find their saturation point"
+    )
+    add_catalog_arguments(parser)
+    parser.add_argument(
+        "--levels",
+        type=int,
+        nargs="+",
+        help=f"concurrency levels (default {DEFAULT_CONCURRENCY_LEVELS})",
+    )
+    args = parser.parse_args()
+    if not (args.tag or args.endpoint or args.scenario):
+        args.scenario = DEFAULT_SWEEP_SCENARIOS
+
+    store = ResultsStore()
+    synapse_sync = SynapseSync(store)
+    synapse_sync.start()
+    try:
+        for spec in select_scenarios(args):
+            rows = run_sweep([spec], args.levels)
+            report_curves(rows, f"sweep_{spec.name}.csv")
+            logger.info(f"Saving {len(rows)} rows of {spec.name}")
+            store.insert_rows(rows)
+    finally:
+        synapse_sync.close()
@@ -0,0 +1,158 @@
+import csv
+import logging
+import os
+import random
+import re
+import tempfile
+import uuid
+from typing import Dict, List
+
+logger = logging.getLogger("synthetic-manifest")
+
+# sizes (number of rows) of the synthetic manifests used to measure how validation and submission scale
+# larger manifests (up to 1M rows, around 380MB for HTAN) are only run with the `large` tag of the scenario catalog
+SYNTHETIC_MANIFEST_SIZES = [1_000, 10_000]
+
+# folder (relative to the APITests folder) where synthetic manifests are written
+SYNTHETIC_MANIFEST_DIR = "test_manifests/synthetic"
+
+# columns that identify a row and must be unique for an upload to be valid
+ID_COLUMNS = ("Patient ID", "HTAN Biospecimen ID", "Uuid", "dataset_id")
+
+# columns that point to existing synapse entities. They are left empty in synthetic manifests.
+CLEARED_COLUMNS = ("entityId",)
+
+UUID_PATTERN = re.compile(
+    r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.IGNORECASE
+)
+# an identifier that ends with a number. For example, HTA7_1_11 or syn123
+NUMBERED_ID_PATTERN = re.compile(r"^(.*?)(\d+)$")
+
+
+def unique_value(template_value: str, row_number: int, rng: random.Random) -> str:
+    """
+    Create a unique identifier with the same shape as the identifier of the template row
+    Args:
+        template_value (str): identifier of the template row
+        row_number (int): number of the row in the synthetic manifest, starting at 1
+        rng (random.Random): random number generator used to create uuids
+    Returns:
+        str: a unique identifier
+    """
+    if UUID_PATTERN.match(template_value):
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    if template_value.isdigit():
+        return str(row_number)
+    numbered_id = NUMBERED_ID_PATTERN.match(template_value)
+    if numbered_id:
+        return f"{numbered_id.group(1)}{row_number}"
+    return f"{template_value}_{row_number}"
+
+
+def synthetic_manifest_path(template_path: str, num_rows: int) -> str:
+    """
+    Get the path (relative to the APITests folder) of a synthetic manifest
+    Args:
+        template_path (str): path of the template manifest relative to the APITests folder. For example, test_manifests/synapse_storage_manifest_patient.csv
+        num_rows (int): number of rows of the synthetic manifest
+    Returns:
+        str: path of the synthetic manifest relative to the APITests folder
+    """
+    template_name = os.path.splitext(os.path.basename(template_path))[0]
+    return f"{SYNTHETIC_MANIFEST_DIR}/{template_name}_{num_rows}.csv"
+
+
+def write_synthetic_manifest(
+    template_full_path: str, output_full_path: str, num_rows: int, seed: int = 0
+) -> None:
+    """
+    Write a manifest of any size by cycling through the rows of a template manifest.
+    The columns and values of the template are kept, except identifiers (ID_COLUMNS) that are made unique
+    and references to synapse entities (CLEARED_COLUMNS) that are left empty. Rows are written one at a time,
+    so the manifest is never held in memory.
+    Args:
+        template_full_path (str): full path of the template manifest
+        output_full_path (str): full path of the manifest to write
+        num_rows (int): number of rows to write
+        seed (int, optional): default to 0. seed of the random generator, so that the same manifest is written every time
+    """
+    with open(template_full_path, newline="") as template:
+        reader = csv.reader(template)
+        header = next(reader)
+        template_rows: List[List[str]] = [row for row in reader if row]
+
+    if not template_rows:
+        raise ValueError(f"The template manifest {template_full_path} has no rows")
+
+    id_columns: Dict[int, str] = {
+        i: column for i, column in enumerate(header) if column in ID_COLUMNS
+    }
+    cleared_columns = [
+        i for i, column in enumerate(header) if column in CLEARED_COLUMNS
+    ]
+    rng = random.Random(seed)
+
+    os.makedirs(os.path.dirname(output_full_path), exist_ok=True)
+    # write to a temporary file first so that an interrupted run does not leave a partial manifest behind.
+    # every writer gets its own file: processes that generate the same manifest at once do not mix their rows
+    with tempfile.NamedTemporaryFile(
+        "w",
+        newline="",
+        dir=os.path.dirname(output_full_path),
+        prefix=f"{os.path.basename(output_full_path)}.",
+        suffix=".partial",
+        delete=False,
+    ) as output:
+        partial_path = output.name
+        try:
+            writer = csv.writer(output)
+            writer.writerow(header)
+            for row_number in range(1, num_rows + 1):
+                row = list(template_rows[(row_number - 1) % len(template_rows)])
+                for i in id_columns:
+                    if i < len(row) and row[i]:
+                        row[i] = unique_value(row[i], row_number, rng)
+                for i in cleared_columns:
+                    if i < len(row):
+                        row[i] = ""
+                writer.writerow(row)
+        except BaseException:
+            output.close()
+            os.remove(partial_path)
+            raise
+    os.replace(partial_path, output_full_path)
+    logger.info(f"Wrote synthetic manifest {output_full_path} with {num_rows} rows")
+
+
+def generate_synthetic_manifest(template_path: str, num_rows: int) -> str:
+    """
+    Generate a synthetic manifest from a test manifest, unless it was already generated
+    Args:
+        template_path (str): path of the template manifest relative to the APITests folder. For example, test_manifests/synapse_storage_manifest_patient.csv
+        num_rows (int): number of rows of the synthetic manifest
+    Returns:
+        str: path of the synthetic manifest relative to the APITests folder, to be used as file_path_manifest
+    """
+    wd = os.getcwd()
+    output_path = synthetic_manifest_path(template_path, num_rows)
+    output_full_path = os.path.join(wd, "APITests", output_path)
+    if not os.path.exists(output_full_path):
+        write_synthetic_manifest(
+            os.path.join(wd, "APITests", template_path), output_full_path, num_rows
+        )
+    return output_path
+
+
+def count_manifest_rows(manifest_path: str) -> int:
+    """
+    Count the rows of a manifest without loading it in memory
+    Args:
+        manifest_path (str): path of a manifest relative to the APITests folder
+    Returns:
+        int: number of rows, not counting the header
+    """
+    full_path = os.path.join(os.getcwd(), "APITests", manifest_path)
+    with open(full_path, newline="") as manifest:
+        reader = csv.reader(manifest)
+        next(reader, None)
+        return sum(1 for row in reader if row)
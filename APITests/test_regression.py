@@ -0,0 +1,61 @@
+import unittest
+from typing import List
+
+from regression import MIN_BASELINE_RUNS, compare_to_baseline
+from stats import LatencyHistogram
+
+
+def make_run(latencies: List[float]) -> dict:
+    """
+    Build a run as it is saved in the results store
+    Args:
+        latencies (list): latency in seconds of every successful request of the run
+    Returns:
+        dict: the run
+    """
+    histogram = LatencyHistogram()
+    for latency in latencies:
+        histogram.record(latency)
+    return {
+        "endpoint_name": "model/validate",
+        "description": "Validating a manifest",
+        "latency_histogram": histogram.to_json(),
+    }
+
+
+class TestCompareToBaseline(unittest.TestCase):
+    # runs of a scenario that sends a single request: one latency per run
+    baseline_runs = [make_run([1.0 + 0.002 * index]) for index in range(30)]
+
+    def test_single_request_slowdown_is_a_regression(self):
+        result = compare_to_baseline(make_run([1.5]), self.baseline_runs)
+        self.assertEqual(result.baseline_runs, 30)
+        self.assertLess(result.p_value, 0.05)
+        self.assertTrue(result.is_regression)
+
+    def test_single_request_within_the_baseline_is_not_a_regression(self):
+        result = compare_to_baseline(make_run([1.03]), self.baseline_runs)
+        self.assertIsNotNone(result.p_value)
+        self.assertFalse(result.is_regression)
+
+    def test_small_slowdown_is_not_a_regression(self):
+        # slower than every baseline run, but by less than REGRESSION_MIN_SLOWDOWN
+        result = compare_to_baseline(make_run([1.1]), self.baseline_runs)
+        self.assertLess(result.p_value, 0.05)
+        self.assertFalse(result.is_regression)
+
+    def test_short_history_is_not_checked(self):
+        result = compare_to_baseline(
+            make_run([5.0]), self.baseline_runs[: MIN_BASELINE_RUNS - 1]
+        )
+        self.assertIsNone(result.p_value)
+        self.assertFalse(result.is_regression)
+
+    def test_run_without_successful_requests_is_not_checked(self):
+        result = compare_to_baseline(make_run([]), self.baseline_runs)
+        self.assertIsNone(result.current_p50)
+        self.assertFalse(result.is_regression)
+
+
+if __name__ == "__main__":
+    unittest.main()
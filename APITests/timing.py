@@ -0,0 +1,102 @@
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import List, Optional, Union
+
+NANOSECONDS_PER_SECOND = 1_000_000_000
+
+
+def elapsed_seconds(start_ns: int, end_ns: int = None) -> float:
+    """
+    Get the seconds between two time.perf_counter_ns() values. Integer nanoseconds keep their precision however long
+    the host has been up, unlike the float seconds of time.perf_counter()
+    Args:
+        start_ns (int): time.perf_counter_ns() value at the start
+        end_ns (int, optional): default to now. time.perf_counter_ns() value at the end
+    Returns:
+        float: seconds from start_ns to end_ns
+    """
+    if end_ns is None:
+        end_ns = time.perf_counter_ns()
+    return (end_ns - start_ns) / NANOSECONDS_PER_SECOND
+
+
+def iso_utc(epoch_ns: int) -> str:
+    """
+    Format a time as ISO-8601 in UTC, to the nanosecond. For example, 2024-01-31T14:05:09.123456789Z
+    Args:
+        epoch_ns (int): nanoseconds since the epoch
+    Returns:
+        str: the formatted time
+    """
+    seconds, nanoseconds = divmod(epoch_ns, NANOSECONDS_PER_SECOND)
+    return f"{datetime.fromtimestamp(seconds, timezone.utc):%Y-%m-%dT%H:%M:%S}.{nanoseconds:09d}Z"
+
+
+@dataclass
+class RunWindow:
+    """
+    Start and end of a run, in nanoseconds since the epoch
+    """
+
+    start_ns: int
+    end_ns: int
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / NANOSECONDS_PER_SECOND
+
+    def merge(self, other: Optional["RunWindow"]) -> "RunWindow":
+        """
+        Get the window that covers this run and another one, for example the runs of the workers of a distributed run
+        Args:
+            other (RunWindow): the other run, or None
+        Returns:
+            RunWindow: the window from the first start to the last end
+        """
+        if other is None:
+            return self
+        return RunWindow(
+            min(self.start_ns, other.start_ns), max(self.end_ns, other.end_ns)
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "RunWindow":
+        return cls(**values)
+
+    def to_row(self) -> List[Union[int, str]]:
+        """
+        Get the values stored in a result row
+        Returns:
+            list: start and end as ISO-8601 UTC strings, then as nanoseconds since the epoch
+        """
+        return [
+            iso_utc(self.start_ns),
+            iso_utc(self.end_ns),
+            self.start_ns,
+            self.end_ns,
+        ]
+
+
+class RunTimer:
+    """
+    Time a run with the monotonic clock. The wall clock is read once, at the start: the end of the run is the start plus
+    the monotonic duration, so the clock of the host being adjusted during a run (for example by NTP) changes neither
+    the duration nor the end of the run.
+    """
+
+    def __init__(self):
+        self.start_epoch_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+
+    def stop(self) -> RunWindow:
+        """
+        Get the window of the run, from the start of the timer to now
+        Returns:
+            RunWindow: start and end of the run
+        """
+        duration_ns = time.perf_counter_ns() - self.start_ns
+        return RunWindow(self.start_epoch_ns, self.start_epoch_ns + duration_ns)
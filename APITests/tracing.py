@@ -0,0 +1,175 @@
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Union
+from urllib.parse import urlsplit
+
+from opentelemetry import propagate, trace
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter
+from opentelemetry.semconv.trace import SpanAttributes
+
+from payload import ResponseBody
+
+# send a client span for every request. On if PROFILER_TRACING=true or if an OTLP endpoint is set with the standard
+# OTEL_EXPORTER_OTLP_ENDPOINT or OTEL_EXPORTER_OTLP_TRACES_ENDPOINT variables
+TRACING_ENABLED = os.environ.get("PROFILER_TRACING", "").lower() == "true" or bool(
+    os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+    or os.environ.get("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")
+)
+# name of the profiler in the traces
+TRACING_SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "schematic-profiler")
+
+AttributeValue = Union[str, bool, int, float]
+
+_tracer_provider: Optional[TracerProvider] = None
+_tracer_lock = threading.Lock()
+
+_current_attributes: contextvars.ContextVar[
+    Dict[str, AttributeValue]
+] = contextvars.ContextVar("trace_attributes", default={})
+
+
+def create_tracer_provider(exporter: SpanExporter = None) -> TracerProvider:
+    """
+    Create a tracer provider that exports spans in batches from a background thread, so that requests never wait
+    for the export
+    Args:
+        exporter (SpanExporter, optional): default to an OTLP http exporter configured with the OTEL_EXPORTER_OTLP_*
+            variables (http://localhost:4318/v1/traces if they are not set)
+    Returns:
+        TracerProvider: the provider
+    """
+    provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: TRACING_SERVICE_NAME})
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter or OTLPSpanExporter()))
+    return provider
+
+
+def get_tracer_provider() -> Optional[TracerProvider]:
+    """
+    Get the tracer provider of the profiler. Created on first use; spans left in the batch are exported when the
+    process exits.
+    Returns:
+        TracerProvider: the provider, or None if TRACING_ENABLED is False
+    """
+    global _tracer_provider
+    if not TRACING_ENABLED:
+        return None
+    # the first requests of a run are sent from many threads at once, and they must share one provider
+    with _tracer_lock:
+        if _tracer_provider is None:
+            _tracer_provider = create_tracer_provider()
+    return _tracer_provider
+
+
+def get_tracer() -> Optional[trace.Tracer]:
+    """
+    Get the tracer of the profiler
+    Returns:
+        trace.Tracer: the tracer, or None if TRACING_ENABLED is False
+    """
+    provider = get_tracer_provider()
+    return provider.get_tracer("schematic-profiler") if provider else None
+
+
+def shutdown_tracing() -> None:
+    """
+    Export the spans that are still in the batch and stop tracing, for example once all the scenarios finished.
+    Spans of requests sent afterwards are dropped.
+    """
+    provider = get_tracer_provider()
+    if provider is not None:
+        # unlike force_flush, shutdown waits until every span in the queue is exported
+        provider.shutdown()
+
+
+@contextmanager
+def trace_attributes(attributes: Dict[str, Optional[AttributeValue]]) -> Iterator[None]:
+    """
+    Add attributes to the spans of the requests sent inside the block, for example the scenario being run.
+    Threads only see them if they run in a copy of the context of the block (see contextvars.copy_context).
+    Args:
+        attributes (dict): attributes to add. None values are left out
+    """
+    token = _current_attributes.set(
+        {
+            **_current_attributes.get(),
+            **{name: value for name, value in attributes.items() if value is not None},
+        }
+    )
+    try:
+        yield
+    finally:
+        _current_attributes.reset(token)
+
+
+class RequestSpan:
+    """
+    Span of a request being sent, and the headers to send with it
+    """
+
+    def __init__(self, span: Optional[trace.Span], headers: Optional[dict]):
+        self.span = span
+        # the headers of the request, with the trace context if the request is traced
+        self.headers = headers
+
+    def record_response(
+        self, body: ResponseBody, request_bytes: int = 0
+    ) -> ResponseBody:
+        """
+        Add the response to the span
+        Args:
+            body (ResponseBody): summary of the response
+            request_bytes (int, optional): default to 0. bytes of the body of the request
+        Returns:
+            ResponseBody: body, so that it can be returned by the caller
+        """
+        if self.span is None:
+            return body
+        self.span.set_attributes(
+            {
+                SpanAttributes.HTTP_STATUS_CODE: body.status_code,
+                SpanAttributes.HTTP_RESPONSE_CONTENT_LENGTH: body.wire_bytes,
+                SpanAttributes.HTTP_REQUEST_CONTENT_LENGTH: request_bytes,
+            }
+        )
+        # client spans count 4xx and 5xx responses as errors
+        if body.status_code >= 400:
+            self.span.set_status(trace.StatusCode.ERROR)
+        return body
+
+
+@contextmanager
+def client_span(method: str, url: str, headers: dict = None) -> Iterator[RequestSpan]:
+    """
+    Wrap a request in a client span and add the W3C trace context (traceparent) to its headers, so that the spans of
+    the server join the trace. The span ends when the block ends; an exception raised in the block is recorded on it.
+    Args:
+        method (str): http method of the request
+        url (str): url of the request
+        headers (dict, optional): default to None. headers of the request, not modified
+    Yields:
+        RequestSpan: the span and the headers to send. Without tracing, the span is None and the headers are unchanged
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield RequestSpan(None, headers)
+        return
+    attributes = {
+        SpanAttributes.HTTP_METHOD: method,
+        SpanAttributes.HTTP_URL: url,
+        **_current_attributes.get(),
+    }
+    with tracer.start_as_current_span(
+        f"{method} {urlsplit(url).path}",
+        kind=trace.SpanKind.CLIENT,
+        attributes=attributes,
+    ) as span:
+        headers = dict(headers or {})
+        propagate.inject(headers)
+        yield RequestSpan(span, headers)
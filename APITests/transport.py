@@ -0,0 +1,272 @@
+import functools
+import gzip
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import requests
+from urllib3.fields import RequestField
+from urllib3.filepost import encode_multipart_formdata
+
+from phases import TimedHTTPAdapter
+
+try:
+    import zstandard
+except ImportError:
+    # zstd compression is optional: pip install zstandard
+    zstandard = None
+
+logger = logging.getLogger("transport")
+
+# reuse keep-alive connections across requests. Set to False (or set PROFILER_CONNECTION_POOL=false) to open
+# a new connection for every request, for example to measure the latency of cold connections on purpose.
+USE_CONNECTION_POOL = (
+    os.environ.get("PROFILER_CONNECTION_POOL", "true").lower() != "false"
+)
+
+# default number of connections kept alive per host. The pool grows to the number of concurrent threads of a run.
+DEFAULT_POOL_SIZE = 10
+
+# number of encoded manifests kept in memory. Every request of a scenario shares the same encoded manifest.
+MANIFEST_PAYLOAD_CACHE_SIZE = 4
+
+# compression of a run: "identity" sends and accepts uncompressed bodies only; "gzip" or "zstd" compresses uploaded
+# manifests with that codec and accepts compressed responses. None keeps the default of the http client
+# (uncompressed uploads, gzip or deflate responses).
+IDENTITY = "identity"
+REQUEST_CODECS = ("gzip", "zstd")
+COMPRESSION_MODES = (IDENTITY,) + REQUEST_CODECS
+# level used to compress uploaded manifests
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_session = None
+_pool_size = 0
+_session_lock = threading.Lock()
+
+
+def set_connection_pooling(enabled: bool) -> None:
+    """
+    Turn connection pooling on or off
+    Args:
+        enabled (bool): if True, requests share keep-alive connections. If False, every request opens a new connection.
+    """
+    global USE_CONNECTION_POOL
+    USE_CONNECTION_POOL = enabled
+    if not enabled:
+        close_session()
+
+
+def _mount_adapters(session: requests.Session, pool_size: int) -> None:
+    """
+    Mount http and https adapters that keep up to pool_size connections per host and record the phases of every request
+    Args:
+        session (requests.Session): session to mount the adapters on
+        pool_size (int): maximum number of connections kept alive per host
+    """
+    for prefix in ("http://", "https://"):
+        replaced = session.adapters.get(prefix)
+        session.mount(
+            prefix,
+            TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size),
+        )
+        # other scenarios may still be sending requests with the replaced adapter. Its keep-alive connections are
+        # closed once they are done
+        if isinstance(replaced, TimedHTTPAdapter):
+            replaced.retire()
+
+
+def ensure_pool_size(pool_size: int) -> None:
+    """
+    Make sure that the shared session can keep pool_size connections alive per host.
+    Should be called before timing starts so that resizing the pool is not measured.
+    Args:
+        pool_size (int): number of concurrent requests that will share the session
+    """
+    if USE_CONNECTION_POOL:
+        _resize_pool(pool_size)
+
+
+def _resize_pool(pool_size: int) -> None:
+    """
+    Create the shared session if needed and grow its connection pool to pool_size
+    Args:
+        pool_size (int): maximum number of connections kept alive per host
+    """
+    global _session, _pool_size
+    with _session_lock:
+        pool_size = max(pool_size, DEFAULT_POOL_SIZE)
+        if _session is None:
+            _session = requests.Session()
+        if pool_size > _pool_size:
+            _mount_adapters(_session, pool_size)
+            _pool_size = pool_size
+            logger.debug(f"Connection pool size set to {pool_size}")
+
+
+def get_session() -> requests.Session:
+    """
+    Get the session shared by all the threads. The session is created on first use.
+    Returns:
+        requests.Session: a session backed by a thread-safe connection pool
+    """
+    if _session is None:
+        _resize_pool(DEFAULT_POOL_SIZE)
+    return _session
+
+
+def close_session() -> None:
+    """
+    Close the shared session and all of its connections
+    """
+    global _session, _pool_size
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _pool_size = 0
+
+
+@contextmanager
+def request_session() -> Iterator[requests.Session]:
+    """
+    Get a session to send one request with. If connection pooling is turned off,
+    a new session is opened for the request and closed afterwards.
+    Yields:
+        requests.Session: session to send the request with
+    """
+    if USE_CONNECTION_POOL:
+        yield get_session()
+        return
+
+    session = requests.Session()
+    _mount_adapters(session, 1)
+    session.headers["Connection"] = "close"
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def check_compression(compression: Optional[str]) -> None:
+    """
+    Check that a compression mode is known and that its codec is installed
+    Args:
+        compression (str): None or one of COMPRESSION_MODES
+    """
+    if compression is not None and compression not in COMPRESSION_MODES:
+        raise ValueError(
+            f"Unknown compression {compression}. Please use one of {COMPRESSION_MODES}"
+        )
+    if compression == "zstd" and zstandard is None:
+        raise ImportError("zstd compression needs the zstandard package")
+
+
+def accept_encoding(compression: Optional[str]) -> Optional[str]:
+    """
+    Get the Accept-Encoding header of a compression mode
+    Args:
+        compression (str): None or one of COMPRESSION_MODES
+    Returns:
+        str: the value of the header, or None to keep the default of the http client
+    """
+    if compression is None:
+        return None
+    if compression == IDENTITY:
+        return IDENTITY
+    # only offer the encodings that payload.read_response can decompress
+    return "gzip, deflate, zstd" if zstandard is not None else "gzip, deflate"
+
+
+def compression_headers(headers: dict = None, compression: str = None) -> dict:
+    """
+    Add the Accept-Encoding header of a compression mode to the headers of a request
+    Args:
+        headers (dict, optional): default to None. headers used for API requests. For example, authorization headers.
+        compression (str, optional): default to None. None or one of COMPRESSION_MODES
+    Returns:
+        dict: the headers, or None if there are none
+    """
+    encoding = accept_encoding(compression)
+    if encoding is None:
+        return headers
+    return {**(headers or {}), "Accept-Encoding": encoding}
+
+
+def compress_body(body: bytes, codec: str) -> bytes:
+    """
+    Compress a request body
+    Args:
+        body (bytes): the body
+        codec (str): one of REQUEST_CODECS
+    Returns:
+        bytes: the compressed body
+    """
+    if codec == "gzip":
+        # mtime=0 so that the same manifest always gives the same body
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    check_compression(codec)
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+
+@dataclass(frozen=True)
+class ManifestPayload:
+    """
+    A manifest encoded once as a multipart/form-data body. The body is read-only and shared by every request
+    that uploads the manifest, so concurrent uploads neither open the file again nor copy it.
+    """
+
+    body: bytes
+    content_type: str
+    # codec the body was compressed with, or None if it was not compressed
+    content_encoding: Optional[str] = None
+
+    def headers(self, headers: dict = None) -> dict:
+        """
+        Get the headers to send with the body
+        Args:
+            headers (dict): headers used for API requests. For example, authorization headers.
+        Returns:
+            dict: headers with the content type (and content encoding) of the multipart body
+        """
+        headers = {**(headers or {}), "Content-Type": self.content_type}
+        if self.content_encoding:
+            headers["Content-Encoding"] = self.content_encoding
+        return headers
+
+
+@functools.lru_cache(maxsize=MANIFEST_PAYLOAD_CACHE_SIZE)
+def load_manifest_payload(
+    manifest_path: str, compression: str = None
+) -> ManifestPayload:
+    """
+    Read a manifest and encode it as the "file_name" field of a multipart body, the same way requests encodes files.
+    The result is cached so the manifest is only read, encoded and compressed once.
+    Args:
+        manifest_path (str): full file path of a manifest
+        compression (str, optional): default to None. if "gzip" or "zstd", the body is compressed with this codec
+    Returns:
+        ManifestPayload: the encoded manifest
+    """
+    with open(manifest_path, "rb") as manifest:
+        data = manifest.read()
+    field = RequestField(
+        name="file_name", data=data, filename=os.path.basename(manifest_path)
+    )
+    field.make_multipart(content_type=None)
+    body, content_type = encode_multipart_formdata([field])
+    content_encoding = compression if compression in REQUEST_CODECS else None
+    if content_encoding:
+        encoded_size = len(body)
+        body = compress_body(body, content_encoding)
+        logger.debug(
+            f"Compressed manifest {manifest_path} with {content_encoding} "
+            f"({encoded_size} to {len(body)} bytes)"
+        )
+    logger.debug(f"Encoded manifest {manifest_path} ({len(body)} bytes)")
+    return ManifestPayload(
+        body=body, content_type=content_type, content_encoding=content_encoding
+    )
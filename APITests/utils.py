@@ -1,17 +1,37 @@
 import concurrent.futures
+import contextvars
 import logging
+import math
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Callable, Tuple, List, Union
+from typing import Any, Callable, Tuple, List, Optional, Union
 
 import pytz
-import requests
 import synapseclient
 from requests import Response
 from requests.exceptions import InvalidSchema
-from synapseclient import Table
+from synapseclient import Column, Table
+
+import async_engine
+from outcomes import PHASE_PERCENTILES, OutcomeCounter, is_success, outcome_of
+from payload import ResponseBody, read_response
+from phases import PHASES
+from progress import current_tracker
+from resources import ResourceSeries
+from timing import NANOSECONDS_PER_SECOND, RunTimer, elapsed_seconds
+from tracing import client_span
+from retry import RequestPolicy, TimedResult, send_with_retries
+from stats import LatencyStats, ThroughputStats
+from transport import (
+    check_compression,
+    compression_headers,
+    ensure_pool_size,
+    load_manifest_payload,
+    request_session,
+)
+from warmup import ColdStartStats
+from worker_pool import reserve_workers
 
 
 # Create a custom formatter with colors
@@ -54,38 +74,232 @@ HTAN_SCHEMA_URL = (
 
 DATA_FLOW_SCHEMA_URL = "https://raw.githubusercontent.com/Sage-Bionetworks/data_flow/main/inst/data_model/dataflow_component.csv"
 
-BASE_URL = "https://schematic-dev.api.sagebionetworks.org/v1"
+# set SCHEMATIC_BASE_URL to run against another deployment, for example the local mock server in mock_schematic.py
+BASE_URL = os.environ.get(
+    "SCHEMATIC_BASE_URL", "https://schematic-dev.api.sagebionetworks.org/v1"
+)
+
+# engine used to send concurrent requests: "thread" sends blocking requests from a thread pool,
+# "async" sends them from a single asyncio event loop and can hold thousands of requests in flight.
+ENGINE_MODE = os.environ.get("PROFILER_ENGINE", "thread")
+ENGINE_MODES = ("thread", "async")
+
+# synapse table the result rows are uploaded to
+RESULT_TABLE_ID = "syn51385540"
+
+# format and timezone of the dt_string column. The start_time_* and end_time_* columns store the same time in UTC
+DT_STRING_FORMAT = "%d/%m/%Y %H:%M:%S"
+DT_STRING_TIMEZONE = "US/Eastern"
 
 # define type Row
-Row = List[Union[str, int, dict, bool]]
+Row = List[Union[str, int, float, dict, bool]]
 MultiRow = List[Row]
 
+# columns appended to the original result table for the latency distribution of the successful requests of each run
+LATENCY_STATS_COLUMNS = [
+    ("latency_p50", "DOUBLE"),
+    ("latency_p90", "DOUBLE"),
+    ("latency_p95", "DOUBLE"),
+    ("latency_p99", "DOUBLE"),
+    ("latency_max", "DOUBLE"),
+    ("latency_mean", "DOUBLE"),
+    ("latency_stddev", "DOUBLE"),
+    ("latency_histogram", "LARGETEXT"),
+]
+
+# columns appended to the original result table for the throughput of each run
+THROUGHPUT_COLUMNS = [
+    ("target_rps", "DOUBLE"),
+    ("achieved_rps", "DOUBLE"),
+    ("throughput_shortfall", "DOUBLE"),
+]
+
+# columns appended to the original result table for the outcome (status code, timeout, connection error...) of
+# every request. Counts and latencies of every outcome are stored as json, so new outcomes do not change the schema.
+OUTCOME_COLUMNS = [
+    ("num_errors", "INTEGER"),
+    ("error_latency_p50", "DOUBLE"),
+    ("error_latency_p99", "DOUBLE"),
+    ("outcome_counts", "LARGETEXT"),
+    ("outcome_latency", "LARGETEXT"),
+]
+
+# columns appended to the original result table for the timeouts and retries of each run.
+# first_attempt_latency is the latency without retries, latency_p50/p99 the latency seen by a retrying client.
+RETRY_COLUMNS = [
+    ("first_attempt_latency_p50", "DOUBLE"),
+    ("first_attempt_latency_p99", "DOUBLE"),
+    ("num_retries", "INTEGER"),
+    ("num_retried_requests", "INTEGER"),
+    ("connect_timeout", "DOUBLE"),
+    ("read_timeout", "DOUBLE"),
+    ("max_retries", "INTEGER"),
+]
+
+# columns appended to the original result table for the time spent in every phase of the requests
+# (dns, connect, tls, send, ttfb, receive), for example dns_p50 or ttfb_p99. See phases.py
+PHASE_COLUMNS = [
+    (f"{phase}_p{percent}", "DOUBLE")
+    for phase in PHASES
+    for percent in PHASE_PERCENTILES
+] + [("phase_latency", "LARGETEXT")]
+
+# columns appended to the original result table for the size of the responses and the rate they were received at.
+# Sizes are in bytes, rates in bytes per second
+PAYLOAD_COLUMNS = [
+    ("response_bytes_p50", "INTEGER"),
+    ("response_bytes_max", "INTEGER"),
+    ("decompressed_bytes_p50", "INTEGER"),
+    ("decompressed_bytes_max", "INTEGER"),
+    ("response_bytes_total", "INTEGER"),
+    ("bytes_per_second_p50", "DOUBLE"),
+    ("transfer_rate", "DOUBLE"),
+    ("content_encodings", "LARGETEXT"),
+]
+
+# columns appended to the original result table for the compression of each run (see transport.COMPRESSION_MODES)
+# and the bytes of the request bodies that were sent
+COMPRESSION_COLUMNS = [
+    ("compression", "STRING"),
+    ("request_bytes_total", "INTEGER"),
+]
+
+# columns appended to the original result table for the requests sent before each run (see warmup.ColdStartStats):
+# the warm-up requests, excluded from the other columns, and the cold-start probe
+WARMUP_COLUMNS = [
+    ("warmup_requests", "INTEGER"),
+    ("cold_latency", "DOUBLE"),
+    ("warmup_latency_p50", "DOUBLE"),
+    ("cold_probe_latency", "DOUBLE"),
+    ("cold_probe_outcome", "STRING"),
+    ("cold_probe_ratio", "DOUBLE"),
+]
+
+# columns appended to the original result table for the resources of the server sampled during each run (see
+# resources.ResourceSeries): cpu in percent of one core, memory in bytes and the window as unix timestamps
+RESOURCE_COLUMNS = [
+    ("peak_cpu_percent", "DOUBLE"),
+    ("mean_cpu_percent", "DOUBLE"),
+    ("peak_rss_bytes", "INTEGER"),
+    ("resource_window_start", "DOUBLE"),
+    ("resource_window_end", "DOUBLE"),
+    ("resource_source", "STRING"),
+    ("resource_samples", "LARGETEXT"),
+]
+
+# columns appended to the original result table for the number of requests of each run that were actually in flight
+# at the same time (see stats.ConcurrencyStats), to compare with the concurrency asked for (num_concurrent)
+CONCURRENCY_COLUMNS = [
+    ("achieved_concurrency", "INTEGER"),
+    ("mean_concurrency", "DOUBLE"),
+]
+
+# columns appended to the original result table for the start and end of each run (see timing.RunWindow): ISO-8601
+# strings in UTC to read, and nanoseconds since the epoch to index and query by range
+TIMESTAMP_COLUMNS = [
+    ("start_time_utc", "STRING"),
+    ("end_time_utc", "STRING"),
+    ("start_time_ns", "INTEGER"),
+    ("end_time_ns", "INTEGER"),
+]
+
+# all the columns that were added to the original result table, in the order they are stored in a row
+ADDED_RESULT_COLUMNS = (
+    LATENCY_STATS_COLUMNS
+    + THROUGHPUT_COLUMNS
+    + OUTCOME_COLUMNS
+    + RETRY_COLUMNS
+    + PHASE_COLUMNS
+    + PAYLOAD_COLUMNS
+    + COMPRESSION_COLUMNS
+    + WARMUP_COLUMNS
+    + RESOURCE_COLUMNS
+    + CONCURRENCY_COLUMNS
+    + TIMESTAMP_COLUMNS
+)
+
+# maximum number of characters of the STRING columns in ADDED_RESULT_COLUMNS. Synapse limits STRING columns to 50
+# characters unless a size is set, and rejects rows with longer values. json values are stored as LARGETEXT instead
+STRING_COLUMN_SIZES = {
+    "compression": 16,
+    "cold_probe_outcome": 32,
+    # "prometheus:<url>" or "docker:<container>"
+    "resource_source": 500,
+    # for example 2024-01-31T14:05:09.123456789Z
+    "start_time_utc": 32,
+    "end_time_utc": 32,
+}
+
+
+def result_column(name: str, column_type: str) -> Column:
+    """
+    Get the synapse column of an added column of the result table
+    Args:
+        name (str): name of the column
+        column_type (str): synapse type of the column
+    Returns:
+        Column: the column, with its maximum size if it is a STRING column (see STRING_COLUMN_SIZES)
+    """
+    if column_type == "STRING":
+        return Column(
+            name=name,
+            columnType=column_type,
+            maximumSize=STRING_COLUMN_SIZES[name],
+        )
+    return Column(name=name, columnType=column_type)
+
+
+# name of every value of a row returned by save_run_time_result, in order
+RESULT_COLUMN_NAMES = [
+    "endpoint_name",
+    "description",
+    "data_schema",
+    "num_rows",
+    "data_type",
+    "output_format",
+    "restrict_rules",
+    "asset_view",
+    "dt_string",
+    "manifest_record_type",
+    "num_concurrent",
+    "latency",
+    "num_status_200",
+    "num_status_500",
+    "num_status_504",
+    "num_status_503",
+] + [name for name, _ in ADDED_RESULT_COLUMNS]
+
+# maximum number of requests in flight when sending requests at a fixed rate with the thread engine
+RATE_MODE_MAX_IN_FLIGHT = 200
 
-def fetch(url: str, params: dict, headers: dict = None) -> Response:
+
+def fetch(
+    url: str, params: dict, headers: dict = None, timeout: Tuple[float, float] = None
+) -> ResponseBody:
     """
-    Trigger a get request
+    Trigger a get request. The body of the response is streamed and dropped, so large responses are never buffered.
     Args:
         url (str): the url to run a given api request
         params (dict): parameter of running a given api request
         headers (dict): headers used for API requests. For example, authorization headers.
+        timeout (tuple, optional): default to None (wait forever). connect and read timeouts in seconds
     Returns:
-        Response: a response object
+        ResponseBody: status code, size and read time of the response
     """
-    response = requests.get(url, params=params, headers=headers)
-    return response
+    with request_session() as session, client_span("GET", url, headers) as span:
+        response = session.get(
+            url, params=params, headers=span.headers, timeout=timeout, stream=True
+        )
+        return span.record_response(read_response(response))
 
 
-def send_manifest(
-    url: str, params: dict, headers: dict = None, manifest_path=None
-) -> Response:
-    """Send an API request to an endpoint
+def get_test_manifest_path(manifest_path: str) -> str:
+    """
+    Get the full path of a test manifest
     Args:
-        url (str): the url to run a given api request
-        params (dict): parameters of running the post request
-        headers (dict): headers used for API requests. For example, authorization headers.
-        manifest_path (str): file path of a manifest
+        manifest_path (str): file path of a manifest relative to the APITests folder
     Returns:
-        Response: a response object
+        str: full path of the manifest
     """
     wd = os.getcwd()
     test_manifest_path = os.path.join(wd, "APITests", manifest_path)
@@ -94,23 +308,58 @@ def send_manifest(
         logger.error(
             "the manifest does not exist. Please provide a valid manifest file path"
         )
+    return test_manifest_path
 
-    return requests.post(
-        url,
-        params=params,
-        headers=headers,
-        files={"file_name": open(test_manifest_path, "rb")},
-    )
+
+def send_manifest(
+    url: str,
+    params: dict,
+    headers: dict = None,
+    manifest_path=None,
+    compression: str = None,
+    timeout: Tuple[float, float] = None,
+) -> ResponseBody:
+    """Send an API request to an endpoint. The body of the response is streamed and dropped.
+    Args:
+        url (str): the url to run a given api request
+        params (dict): parameters of running the post request
+        headers (dict): headers used for API requests. For example, authorization headers.
+        manifest_path (str): file path of a manifest
+        compression (str, optional): default to None. if "gzip" or "zstd", the manifest is compressed with this codec
+        timeout (tuple, optional): default to None (wait forever). connect and read timeouts in seconds
+    Returns:
+        ResponseBody: status code, size and read time of the response
+    """
+    # the manifest is read and encoded once and shared by all the requests
+    payload = load_manifest_payload(get_test_manifest_path(manifest_path), compression)
+
+    with request_session() as session, client_span(
+        "POST", url, payload.headers(headers)
+    ) as span:
+        response = session.post(
+            url,
+            params=params,
+            headers=span.headers,
+            data=payload.body,
+            timeout=timeout,
+            stream=True,
+        )
+        return span.record_response(
+            read_response(response, len(payload.body)), len(payload.body)
+        )
 
 
 def send_post_request(
     base_url: str,
     params: dict,
     concurrent_threads: int,
-    manifest_to_send_func: Callable[[str, dict], Response],
+    manifest_to_send_func: Callable[[str, dict], ResponseBody],
     file_path_manifest: str,
     headers: dict = None,
-) -> Tuple[str, float, dict]:
+    policy: RequestPolicy = None,
+    compression: str = None,
+    engine: str = None,
+) -> Tuple[str, float, OutcomeCounter, LatencyStats]:
     """
     sending post requests
     Args:
@@ -119,35 +368,53 @@ def send_post_request(
         concurrent_threads (int): number of concurrent threads
         manifest_to_send_func (Callable): a function that sends a post request that upload a manifest to be sent
         headers (dict): headers used for API requests. For example, authorization headers.
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+        compression (str, optional): default to None. None, "identity", "gzip" or "zstd" (see transport.COMPRESSION_MODES)
+        engine (str, optional): default to ENGINE_MODE. engine that sends the requests, one of ENGINE_MODES
 
     Returns:
         dt_string (str): start time of running the API endpoints.
         time_diff (float): time of finish running all requests.
-        all_status_code (dict): dict; a dictionary that records the status code of run.
+        all_status_code (OutcomeCounter): number of requests and latency of every outcome (status code, timeout...) of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
     Todo:
         specify exception
     """
     try:
         # send request and calculate run time
-        dt_string, time_diff, status_code_dict = cal_time_api_call_post_request(
+        (
+            dt_string,
+            time_diff,
+            status_code_dict,
+            latency_stats,
+        ) = cal_time_api_call_post_request(
             base_url,
             params,
             concurrent_threads,
             manifest_to_send_func,
             file_path_manifest=file_path_manifest,
             headers=headers,
+            policy=policy,
+            compression=compression,
+            engine=engine,
         )
     # TO DO: add more details about raising different exception
     # Should exception based on response type?
     except Exception as err:
         print(f"Unexpected {err=}, {type(err)=}")
         raise
-    return dt_string, time_diff, status_code_dict
+    return dt_string, time_diff, status_code_dict, latency_stats
 
 
 def send_request(
-    base_url: str, params: dict, concurrent_threads: int, headers: dict = None
-) -> Tuple[str, float, dict]:
+    base_url: str,
+    params: dict,
+    concurrent_threads: int,
+    headers: dict = None,
+    policy: RequestPolicy = None,
+    compression: str = None,
+    engine: str = None,
+) -> Tuple[str, float, OutcomeCounter, LatencyStats]:
     """
     sending requests to different endpoint
     Args:
@@ -155,35 +422,41 @@ def send_request(
         base_url (str): url of endpoint
         concurrent_threads (int): number of concurrent threads
         headers (dict): headers used for API requests. For example, authorization headers.
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+        compression (str, optional): default to None. None, "identity", "gzip" or "zstd" (see transport.COMPRESSION_MODES)
+        engine (str, optional): default to ENGINE_MODE. engine that sends the requests, one of ENGINE_MODES
     Returns:
         dt_string (str): start time of running the API endpoints.
         time_diff (float): time of finish running all requests.
-        all_status_code (dict): dict; a dictionary that records the status code of run.
+        all_status_code (OutcomeCounter): number of requests and latency of every outcome (status code, timeout...) of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
     """
 
     try:
         # send request and calculate run time
-        dt_string, time_diff, status_code_dict = cal_time_api_call(
-            base_url, params, concurrent_threads, headers
+        dt_string, time_diff, status_code_dict, latency_stats = cal_time_api_call(
+            base_url, params, concurrent_threads, headers, policy, compression, engine
         )
     # TO DO: add more details about raising different exception
     # Should exception based on response type?
     except Exception as err:
         print(f"Unexpected {err=}, {type(err)=}")
         raise
-    return dt_string, time_diff, status_code_dict
+    return dt_string, time_diff, status_code_dict, latency_stats
 
 
-def return_time_now(name_funct_call: Callable = None) -> str:
+def return_time_now(name_funct_call: Callable = None, epoch_ns: int = None) -> str:
     """
     Get the time now
     Args:
         name_funct_call (Callable): name of function call (for logging purposes)
+        epoch_ns (int, optional): default to now. nanoseconds since the epoch of the time to format
     Returns:
-        current time formatted as "%d/%m/%Y %H:%M:%S" as a string
+        current time formatted as DT_STRING_FORMAT in DT_STRING_TIMEZONE as a string
     """
-    now = datetime.now(pytz.timezone("US/Eastern"))
-    dt_string = now.strftime("%d/%m/%Y %H:%M:%S")
+    seconds = time.time() if epoch_ns is None else epoch_ns / NANOSECONDS_PER_SECOND
+    now = datetime.fromtimestamp(seconds, pytz.timezone(DT_STRING_TIMEZONE))
+    dt_string = now.strftime(DT_STRING_FORMAT)
 
     if name_funct_call:
         logger.info(
@@ -193,9 +466,193 @@ def return_time_now(name_funct_call: Callable = None) -> str:
     return dt_string
 
 
+def format_seconds(value: Optional[float]) -> str:
+    """
+    Format a duration for logging
+    Args:
+        value (float): a duration in seconds, or None. For example, a percentile of a run where every request failed
+    Returns:
+        str: the duration with 2 decimals, or "n/a"
+    """
+    return "n/a" if value is None else f"{value:.2f}"
+
+
+def get_engine_mode(engine: str = None) -> str:
+    """
+    Get the engine used to send concurrent requests
+    Args:
+        engine (str, optional): default to ENGINE_MODE. the engine asked for
+    Returns:
+        str: "thread" or "async"
+    """
+    engine = engine or ENGINE_MODE
+    if engine not in ENGINE_MODES:
+        raise ValueError(
+            f"Unknown engine mode {engine}. Please use one of {ENGINE_MODES}"
+        )
+    return engine
+
+
+def timed_request(
+    request_func: Callable[..., ResponseBody],
+    *args: Any,
+    intended_start_ns: int = None,
+    policy: RequestPolicy = None,
+) -> TimedResult:
+    """
+    Send a single request, with its retries, and measure how long it takes
+    Args:
+        request_func (Callable): a function that sends a request. For example, fetch or send_manifest
+        args: arguments passed to request_func
+        intended_start_ns (int, optional): default to None. time.perf_counter_ns() value at which the request was scheduled to be sent.
+            If set, latency is measured from this time so that time spent waiting to be sent is included.
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy
+    Returns:
+        TimedResult: the response (or the exception raised if the request failed, for example a timeout),
+            latency with and without retries in seconds and number of retries
+    """
+    start_ns = (
+        time.perf_counter_ns() if intended_start_ns is None else intended_start_ns
+    )
+    # the live dashboard, if one is shown (see progress.Dashboard)
+    tracker = current_tracker()
+    if tracker is not None:
+        tracker.started()
+    result = send_with_retries(request_func, args, policy or RequestPolicy(), start_ns)
+    if tracker is not None:
+        tracker.finished(result.latency, result.response)
+    return result
+
+
+def record_response(
+    all_status_code: OutcomeCounter,
+    latency_stats: LatencyStats,
+    response: Union[ResponseBody, Response, int, Exception],
+    latency: float,
+    url: str,
+    params: dict,
+    first_attempt_latency: float = None,
+    retries: int = 0,
+    phases: dict = None,
+    sent_at_ns: int = None,
+    finished_at_ns: int = None,
+) -> None:
+    """
+    Record the outcome and latency of a finished request
+    Args:
+        all_status_code (OutcomeCounter): number of requests and latency of every outcome of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
+        response (ResponseBody): summary of the response, its status code, or the exception raised by the request
+        latency (float): time of finishing the request, including retries, in seconds
+        url (str): the url that users want to access
+        params (dict): the parameters used for the request
+        first_attempt_latency (float, optional): default to latency. time of finishing the first attempt in seconds
+        retries (int, optional): default to 0. number of times the request was sent again
+        phases (dict, optional): default to None. seconds spent in every phase of the last attempt of the request
+        sent_at_ns (int, optional): default to None. time.perf_counter_ns() value at which the request was sent
+        finished_at_ns (int, optional): default to None. time.perf_counter_ns() value at which the request finished
+    """
+    outcome = outcome_of(response)
+    if not is_success(outcome):
+        detail = f" ({response!r})" if isinstance(response, Exception) else ""
+        logger.error(
+            f"Encountered error {outcome}{detail} while running: {url} using params {params}"
+        )
+    body = response if isinstance(response, ResponseBody) else None
+    all_status_code.record(
+        outcome,
+        latency,
+        first_attempt_latency,
+        retries,
+        phases,
+        body,
+        sent_at_ns,
+        finished_at_ns,
+    )
+    # errors are only recorded in all_status_code, so that errors that fail fast do not hide in the latency of the run
+    if is_success(outcome):
+        latency_stats.record(latency)
+
+
+def collect_responses(
+    futures: List[concurrent.futures.Future], url: str, params: dict
+) -> Tuple[OutcomeCounter, LatencyStats]:
+    """
+    Wait for concurrent requests to finish and record their outcome and latency
+    Args:
+        futures (list): futures returned by submitting timed_request to an executor
+        url (str): the url that users want to access
+        params (dict): the parameters used for the request
+    Returns:
+        all_status_code (OutcomeCounter): number of requests and latency of every outcome (status code, timeout...) of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
+    """
+    all_status_code = OutcomeCounter()
+    latency_stats = LatencyStats()
+    for f in concurrent.futures.as_completed(futures):
+        try:
+            result = f.result()
+            record_response(
+                all_status_code,
+                latency_stats,
+                result.response,
+                result.latency,
+                url,
+                params,
+                first_attempt_latency=result.first_attempt_latency,
+                retries=result.retries,
+                phases=result.phases,
+                sent_at_ns=result.sent_at_ns,
+                finished_at_ns=result.finished_at_ns,
+            )
+        except InvalidSchema:
+            raise InvalidSchema(
+                f"No connection adapters were found for {url}. Please make sure that your URL is correct. "
+            )
+    return all_status_code, latency_stats
+
+
+def collect_async_results(
+    results: List[TimedResult], url: str, params: dict
+) -> Tuple[OutcomeCounter, LatencyStats]:
+    """
+    Record the outcome and latency of requests sent by the async engine
+    Args:
+        results (list): status code (or exception raised), latency and retries of every request
+        url (str): the url that users want to access
+        params (dict): the parameters used for the request
+    Returns:
+        all_status_code (OutcomeCounter): number of requests and latency of every outcome (status code, timeout...) of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
+    """
+    all_status_code = OutcomeCounter()
+    latency_stats = LatencyStats()
+    for result in results:
+        record_response(
+            all_status_code,
+            latency_stats,
+            result.response,
+            result.latency,
+            url,
+            params,
+            first_attempt_latency=result.first_attempt_latency,
+            retries=result.retries,
+            phases=result.phases,
+            sent_at_ns=result.sent_at_ns,
+            finished_at_ns=result.finished_at_ns,
+        )
+    return all_status_code, latency_stats
+
+
 def cal_time_api_call(
-    url: str, params: dict, concurrent_threads: int, headers: dict = None
-) -> Tuple[str, float, dict]:
+    url: str,
+    params: dict,
+    concurrent_threads: int,
+    headers: dict = None,
+    policy: RequestPolicy = None,
+    compression: str = None,
+    engine: str = None,
+) -> Tuple[str, float, OutcomeCounter, LatencyStats]:
     """
     calculate the latency of api calls by sending get requests.
     Args:
@@ -203,49 +660,67 @@ def cal_time_api_call(
         params (dict): the parameters need to use for the request
         concurrent_threads (int): number of concurrent threads requested by users
         headers (dict): a header of dictionary
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+        compression (str, optional): default to None. None, "identity", "gzip" or "zstd" (see transport.COMPRESSION_MODES)
+        engine (str, optional): default to ENGINE_MODE. engine that sends the requests, one of ENGINE_MODES
     Returns:
         dt_string (str): start time of running the API endpoints.
         time_diff (float): time of finish running all requests.
-        all_status_code (dict): dict; a dictionary that records the status code of run.
+        all_status_code (OutcomeCounter): number of requests and latency of every outcome (status code, timeout...) of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
     """
-    start_time = time.time()
-    # get time of running the api endpoint
-    dt_string = return_time_now()
+    # size the connection pool and start the threads of the thread engine before timing starts
+    check_compression(compression)
+    headers = compression_headers(headers, compression)
+    ensure_pool_size(concurrent_threads)
+    engine = get_engine_mode(engine)
 
-    # execute concurrent requests
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(fetch, url, params, headers)
-            for x in range(concurrent_threads)
-        ]
-        all_status_code = {"200": 0, "500": 0, "503": 0, "504": 0}
-        for f in concurrent.futures.as_completed(futures):
-            try:
-                status_code = f.result().status_code
-                status_code_str = str(status_code)
-                if status_code_str != "200":
-                    logger.error(
-                        f"{status_code} error running: {url} with using params {params}"
-                    )
-                all_status_code[status_code_str] = all_status_code[status_code_str] + 1
-            except InvalidSchema:
-                raise InvalidSchema(
-                    f"No connection adapters were found for {url}. Please make sure that your URL is correct. "
+    with reserve_workers(0 if engine == "async" else concurrent_threads) as executor:
+        timer = RunTimer()
+
+        # execute concurrent requests
+        if engine == "async":
+            results = async_engine.run_get_requests(
+                url, params, concurrent_threads, headers, policy
+            )
+            all_status_code, latency_stats = collect_async_results(results, url, params)
+        else:
+            futures = [
+                # every request runs in its own copy of the context, which holds the tracker of the scenario
+                executor.submit(
+                    contextvars.copy_context().run,
+                    timed_request,
+                    fetch,
+                    url,
+                    params,
+                    headers,
+                    policy=policy,
                 )
+                for x in range(concurrent_threads)
+            ]
+            all_status_code, latency_stats = collect_responses(futures, url, params)
+        all_status_code.window = timer.stop()
 
-    time_diff = round(time.time() - start_time, 2)
-    logger.info(f"duration time of running {url}: {time_diff}")
-    return dt_string, time_diff, all_status_code
+    # the start time is formatted once the requests are done, so that formatting it is not timed
+    dt_string = return_time_now(epoch_ns=all_status_code.window.start_ns)
+    time_diff = round(all_status_code.window.duration, 4)
+    logger.info(
+        f"duration time of running {url} ({engine} engine): {time_diff}, p50: {format_seconds(latency_stats.percentile(50))}, p99: {format_seconds(latency_stats.percentile(99))}"
+    )
+    return dt_string, time_diff, all_status_code, latency_stats
 
 
 def cal_time_api_call_post_request(
     url: str,
     params: dict,
     concurrent_threads: int,
-    manifest_to_send_func: Callable[[str, dict], Response],
+    manifest_to_send_func: Callable[[str, dict], ResponseBody],
     file_path_manifest: str,
     headers: dict = None,
-) -> Tuple[str, float, dict]:
+    policy: RequestPolicy = None,
+    compression: str = None,
+    engine: str = None,
+) -> Tuple[str, float, OutcomeCounter, LatencyStats]:
     """
     calculate the latency of api calls by sending post.
     Args:
@@ -254,41 +729,300 @@ def cal_time_api_call_post_request(
         concurrent_threads (int): number of concurrent threads requested by users
         manifest_to_send_func (Callable): a function that sends a post request that upload a manifest to be sent
         headers (dict): headers used for API requests. For example, authorization headers.
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+        compression (str, optional): default to None. None, "identity", "gzip" or "zstd" (see transport.COMPRESSION_MODES)
+        engine (str, optional): default to ENGINE_MODE. engine that sends the requests, one of ENGINE_MODES
     Returns:
         dt_string (str): start time of running the API endpoints.
         time_diff (float): time of finish running all requests.
-        all_status_code (dict): dict; a dictionary that records the status code of run.
+        all_status_code (OutcomeCounter): number of requests and latency of every outcome (status code, timeout...) of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
     """
-    start_time = time.time()
-    # get time of running the api endpoint
-    dt_string = return_time_now()
+    # size the connection pool, encode the manifest and start the threads of the thread engine before timing starts
+    check_compression(compression)
+    headers = compression_headers(headers, compression)
+    ensure_pool_size(concurrent_threads)
+    load_manifest_payload(get_test_manifest_path(file_path_manifest), compression)
+    engine = get_engine_mode(engine)
 
-    # execute concurrent requests
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(
-                manifest_to_send_func, url, params, headers, file_path_manifest
+    with reserve_workers(0 if engine == "async" else concurrent_threads) as executor:
+        timer = RunTimer()
+
+        # execute concurrent requests
+        if engine == "async":
+            # the async engine uploads the manifest the same way as send_manifest
+            results = async_engine.run_post_requests(
+                url,
+                params,
+                concurrent_threads,
+                get_test_manifest_path(file_path_manifest),
+                headers,
+                policy,
+                compression,
             )
-            for x in range(concurrent_threads)
-        ]
-        all_status_code = {"200": 0, "500": 0, "503": 0, "504": 0}
-        for f in concurrent.futures.as_completed(futures):
-            try:
-                status_code = f.result().status_code
-                status_code_str = str(status_code)
-                if status_code_str != "200":
-                    logger.error(
-                        f"Encountered error {status_code_str} while running: {url} using params {params}"
+            all_status_code, latency_stats = collect_async_results(results, url, params)
+        else:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    timed_request,
+                    manifest_to_send_func,
+                    url,
+                    params,
+                    headers,
+                    file_path_manifest,
+                    compression,
+                    policy=policy,
+                )
+                for x in range(concurrent_threads)
+            ]
+            all_status_code, latency_stats = collect_responses(futures, url, params)
+        all_status_code.window = timer.stop()
+
+    # the start time is formatted once the requests are done, so that formatting it is not timed
+    dt_string = return_time_now(epoch_ns=all_status_code.window.start_ns)
+    time_diff = round(all_status_code.window.duration, 4)
+    logger.info(
+        f"duration time of running {url} ({engine} engine): {time_diff}, p50: {format_seconds(latency_stats.percentile(50))}, p99: {format_seconds(latency_stats.percentile(99))}"
+    )
+    return dt_string, time_diff, all_status_code, latency_stats
+
+
+def arrival_schedule(
+    target_rps: float, duration: float, ramp_up: float = 0
+) -> List[float]:
+    """
+    Get the times at which requests should be sent to reach a constant arrival rate.
+    The rate grows linearly from 0 to target_rps during the ramp up period and stays at target_rps afterwards.
+    Args:
+        target_rps (float): number of requests sent per second after the ramp up period
+        duration (float): total duration of the run in seconds, including the ramp up period
+        ramp_up (float, optional): default to 0. duration of the ramp up period in seconds
+    Returns:
+        list: offset in seconds from the start of the run of every request
+    """
+    if target_rps <= 0 or duration <= 0:
+        raise ValueError("target_rps and duration must be positive")
+    ramp_up = min(ramp_up, duration)
+    # number of requests sent by the end of the ramp up period
+    ramp_up_requests = target_rps * ramp_up / 2
+    schedule = []
+    i = 0
+    while True:
+        if i < ramp_up_requests:
+            offset = math.sqrt(2 * ramp_up * i / target_rps)
+        else:
+            offset = ramp_up + (i - ramp_up_requests) / target_rps
+        if offset >= duration:
+            return schedule
+        schedule.append(offset)
+        i += 1
+
+
+def cal_time_api_call_at_rate(
+    url: str,
+    params: dict,
+    target_rps: float,
+    duration: float,
+    ramp_up: float,
+    request_func: Callable[..., ResponseBody],
+    request_args: tuple,
+    async_request: Tuple[Callable, tuple],
+    policy: RequestPolicy = None,
+    engine: str = None,
+) -> Tuple[str, float, OutcomeCounter, LatencyStats, ThroughputStats]:
+    """
+    calculate the latency of api calls sent at a constant arrival rate (open loop).
+    Requests are sent at their scheduled time whether or not earlier requests have finished,
+    and latency is measured from the scheduled time so that queueing delay is not hidden (coordinated omission).
+    Args:
+        url (str): the url that users want to access
+        params (dict): the parameters need to use for the request
+        target_rps (float): number of requests sent per second after the ramp up period
+        duration (float): total duration of the run in seconds, including the ramp up period
+        ramp_up (float): duration of the ramp up period in seconds
+        request_func (Callable): a function that sends a request with the thread engine. For example, fetch
+        request_args (tuple): arguments passed to request_func
+        async_request (tuple): a coroutine function that sends the same request with the async engine and its arguments
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+        engine (str, optional): default to ENGINE_MODE. engine that sends the requests, one of ENGINE_MODES
+    Returns:
+        dt_string (str): start time of running the API endpoints.
+        time_diff (float): time of finish running all requests.
+        all_status_code (OutcomeCounter): number of requests and latency of every outcome (status code, timeout...) of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
+        throughput (ThroughputStats): achieved throughput compared to the offered rate.
+    """
+    schedule = arrival_schedule(target_rps, duration, ramp_up)
+
+    # size the connection pool and start the threads of the thread engine before timing starts
+    ensure_pool_size(RATE_MODE_MAX_IN_FLIGHT)
+    engine = get_engine_mode(engine)
+
+    with reserve_workers(
+        0 if engine == "async" else RATE_MODE_MAX_IN_FLIGHT
+    ) as executor:
+        timer = RunTimer()
+
+        if engine == "async":
+            async_request_func, async_args = async_request
+            results = async_engine.run_requests_at_rate(
+                async_request_func, schedule, *async_args, policy=policy
+            )
+            all_status_code, latency_stats = collect_async_results(results, url, params)
+        else:
+            futures = []
+            run_start_ns = time.perf_counter_ns()
+            for offset in schedule:
+                intended_start_ns = run_start_ns + round(
+                    offset * NANOSECONDS_PER_SECOND
+                )
+                delay = elapsed_seconds(time.perf_counter_ns(), intended_start_ns)
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        timed_request,
+                        request_func,
+                        *request_args,
+                        intended_start_ns=intended_start_ns,
+                        policy=policy,
                     )
-                all_status_code[status_code_str] = all_status_code[status_code_str] + 1
-            except InvalidSchema:
-                raise InvalidSchema(
-                    f"No connection adapters were found for {url}. Please make sure that your URL is correct. "
                 )
+            all_status_code, latency_stats = collect_responses(futures, url, params)
+        all_status_code.window = timer.stop()
 
-    time_diff = round(time.time() - start_time, 2)
-    logger.info(f"duration time of running {url}: {time_diff}")
-    return dt_string, time_diff, all_status_code
+    # the start time is formatted once the requests are done, so that formatting it is not timed
+    dt_string = return_time_now(epoch_ns=all_status_code.window.start_ns)
+    elapsed = all_status_code.window.duration
+    time_diff = round(elapsed, 4)
+    throughput = ThroughputStats(
+        completed=all_status_code.total,
+        elapsed=elapsed,
+        target_rps=target_rps,
+        offered_rps=len(schedule) / duration,
+    )
+    logger.info(
+        f"duration time of running {url} at {target_rps} requests per second ({engine} engine): {time_diff}, "
+        f"achieved: {throughput.achieved_rps:.2f} requests per second, p50: {format_seconds(latency_stats.percentile(50))}, p99: {format_seconds(latency_stats.percentile(99))}"
+    )
+    return dt_string, time_diff, all_status_code, latency_stats, throughput
+
+
+def send_request_at_rate(
+    base_url: str,
+    params: dict,
+    target_rps: float,
+    duration: float,
+    ramp_up: float = 0,
+    headers: dict = None,
+    policy: RequestPolicy = None,
+    compression: str = None,
+    engine: str = None,
+) -> Tuple[str, float, OutcomeCounter, LatencyStats, ThroughputStats]:
+    """
+    sending get requests to an endpoint at a constant arrival rate
+    Args:
+        base_url (str): url of endpoint
+        params (dict): a dictionary of parameters to send
+        target_rps (float): number of requests sent per second after the ramp up period
+        duration (float): total duration of the run in seconds, including the ramp up period
+        ramp_up (float, optional): default to 0. duration of the ramp up period in seconds
+        headers (dict): headers used for API requests. For example, authorization headers.
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+        compression (str, optional): default to None. None, "identity", "gzip" or "zstd" (see transport.COMPRESSION_MODES)
+        engine (str, optional): default to ENGINE_MODE. engine that sends the requests, one of ENGINE_MODES
+    Returns:
+        dt_string (str): start time of running the API endpoints.
+        time_diff (float): time of finish running all requests.
+        all_status_code (OutcomeCounter): number of requests and latency of every outcome (status code, timeout...) of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
+        throughput (ThroughputStats): achieved throughput compared to the offered rate.
+    """
+    check_compression(compression)
+    headers = compression_headers(headers, compression)
+    try:
+        return cal_time_api_call_at_rate(
+            base_url,
+            params,
+            target_rps,
+            duration,
+            ramp_up,
+            fetch,
+            (base_url, params, headers),
+            (async_engine.fetch_async, (base_url, params, headers)),
+            policy,
+            engine,
+        )
+    except Exception as err:
+        print(f"Unexpected {err=}, {type(err)=}")
+        raise
+
+
+def send_post_request_at_rate(
+    base_url: str,
+    params: dict,
+    target_rps: float,
+    duration: float,
+    manifest_to_send_func: Callable[[str, dict], ResponseBody],
+    file_path_manifest: str,
+    ramp_up: float = 0,
+    headers: dict = None,
+    policy: RequestPolicy = None,
+    compression: str = None,
+    engine: str = None,
+) -> Tuple[str, float, OutcomeCounter, LatencyStats, ThroughputStats]:
+    """
+    sending post requests that upload a manifest at a constant arrival rate
+    Args:
+        base_url (str): url of endpoint
+        params (dict): a dictionary of parameters to send
+        target_rps (float): number of requests sent per second after the ramp up period
+        duration (float): total duration of the run in seconds, including the ramp up period
+        manifest_to_send_func (Callable): a function that sends a post request that upload a manifest to be sent
+        file_path_manifest (str): file path of the manifest to send
+        ramp_up (float, optional): default to 0. duration of the ramp up period in seconds
+        headers (dict): headers used for API requests. For example, authorization headers.
+        policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the requests
+        compression (str, optional): default to None. None, "identity", "gzip" or "zstd" (see transport.COMPRESSION_MODES)
+        engine (str, optional): default to ENGINE_MODE. engine that sends the requests, one of ENGINE_MODES
+    Returns:
+        dt_string (str): start time of running the API endpoints.
+        time_diff (float): time of finish running all requests.
+        all_status_code (OutcomeCounter): number of requests and latency of every outcome (status code, timeout...) of the run.
+        latency_stats (LatencyStats): latency distribution of the successful requests.
+        throughput (ThroughputStats): achieved throughput compared to the offered rate.
+    """
+    try:
+        # encode the manifest before timing starts
+        check_compression(compression)
+        headers = compression_headers(headers, compression)
+        load_manifest_payload(get_test_manifest_path(file_path_manifest), compression)
+        return cal_time_api_call_at_rate(
+            base_url,
+            params,
+            target_rps,
+            duration,
+            ramp_up,
+            manifest_to_send_func,
+            (base_url, params, headers, file_path_manifest, compression),
+            (
+                async_engine.send_manifest_async,
+                (
+                    base_url,
+                    params,
+                    headers,
+                    get_test_manifest_path(file_path_manifest),
+                    compression,
+                ),
+            ),
+            policy,
+            engine,
+        )
+    except Exception as err:
+        print(f"Unexpected {err=}, {type(err)=}")
+        raise
 
 
 def save_run_time_result(
@@ -297,7 +1031,7 @@ def save_run_time_result(
     dt_string: str,
     num_concurrent: int,
     latency: float,
-    status_code_dict: dict,
+    status_code_dict: OutcomeCounter,
     data_schema: str = None,
     num_rows: int = None,
     data_type: str = None,
@@ -305,6 +1039,12 @@ def save_run_time_result(
     restrict_rules: bool = None,
     manifest_record_type: str = None,
     asset_view: str = None,
+    latency_stats: LatencyStats = None,
+    throughput: ThroughputStats = None,
+    request_policy: RequestPolicy = None,
+    compression: str = None,
+    cold_start: ColdStartStats = None,
+    resources: ResourceSeries = None,
 ) -> Row:
     """
     Record the result of running an endpoint as a dataframe
@@ -313,7 +1053,7 @@ def save_run_time_result(
         description (str): more details description of the case being run
         num_concurrent (int): number of concurrent requests
         latency (float): latency of finishing the run
-        status_code_dict (dict): dictionary of status code
+        status_code_dict (OutcomeCounter): number of requests and latency of every outcome of the run. Stored as the columns in OUTCOME_COLUMNS, its concurrency as the columns in CONCURRENCY_COLUMNS and its window as the columns in TIMESTAMP_COLUMNS.
         dt_string (str): start time of the test
         data_schema (str, optional): default to None. the data schema used by the function
         num_rows (int, optional): default to None. number of rows of a given manifest
@@ -322,6 +1062,13 @@ def save_run_time_result(
         restrict_rules (bool, optional): default to None. if restrict_rules parameter gets set to true
         manifest_record_type (str, optional): default to None. Manifest storage type. Four options: file only, file+entities, table+file, table+file+entities
         asset view (str, optional): default to None. asset view of the asset store.
+        latency_stats (LatencyStats, optional): default to None. latency distribution of the successful requests. Stored as the columns in LATENCY_STATS_COLUMNS.
+        throughput (ThroughputStats, optional): default to None. throughput of the run. Stored as the columns in THROUGHPUT_COLUMNS.
+            If not provided, the achieved throughput is the number of requests divided by the latency of the run.
+        request_policy (RequestPolicy, optional): default to RequestPolicy(). timeouts and retry policy of the run. Stored with the retries of the run as the columns in RETRY_COLUMNS.
+        compression (str, optional): default to None. compression of the run (see transport.COMPRESSION_MODES), or None if the run used the default of the http client
+        cold_start (ColdStartStats, optional): default to None (no warm-up). requests sent before the run. Stored as the columns in WARMUP_COLUMNS.
+        resources (ResourceSeries, optional): default to None (not sampled). resources of the server during the run. Stored as the columns in RESOURCE_COLUMNS.
     """
     # get specific number of status code
     num_status_200 = status_code_dict["200"]
@@ -348,9 +1095,63 @@ def save_run_time_result(
         num_status_503,
     ]
 
+    # latency distribution of the run
+    if latency_stats is None:
+        latency_stats = LatencyStats()
+    new_row.extend(latency_stats.to_row())
+
+    # throughput of the run
+    if throughput is None:
+        throughput = ThroughputStats(completed=status_code_dict.total, elapsed=latency)
+    new_row.extend(throughput.to_row())
+
+    # outcome of every request, including status codes other than 200/500/503/504 and failed requests
+    new_row.extend(status_code_dict.to_row())
+
+    # retries of the run and the policy that allowed them
+    new_row.extend(status_code_dict.retry_row())
+    new_row.extend((request_policy or RequestPolicy()).to_row())
+
+    # where the time of the requests went: dns, connect, tls, send, time to first byte and receive
+    new_row.extend(status_code_dict.phase_row())
+
+    # size of the responses, to tell payload growth from slower server compute
+    new_row.extend(status_code_dict.payload.to_row())
+
+    # compression of the run and the bytes it uploaded
+    new_row.extend([compression, status_code_dict.payload.total_request_bytes])
+
+    # requests sent before the run, compared with the median warm request of the run
+    new_row.extend(
+        (cold_start or ColdStartStats()).to_row(latency_stats.percentile(50))
+    )
+
+    # cpu and memory of the server during the run
+    new_row.extend((resources or ResourceSeries()).to_row())
+
+    # number of requests in flight at the same time, which falls short of num_concurrent if the client could not keep up
+    new_row.extend(status_code_dict.concurrency.to_row(throughput.elapsed))
+
+    # start and end of the run, in UTC
+    if status_code_dict.window is None:
+        new_row.extend([None] * len(TIMESTAMP_COLUMNS))
+    else:
+        new_row.extend(status_code_dict.window.to_row())
+
     return new_row
 
 
+def row_to_dict(row: Row) -> dict:
+    """
+    Get the values of a result row by column name
+    Args:
+        row (Row): a row returned by save_run_time_result
+    Returns:
+        dict: a dictionary that maps the names in RESULT_COLUMN_NAMES to the values of the row
+    """
+    return dict(zip(RESULT_COLUMN_NAMES, row))
+
+
 class StoreRuntime:
     # store run time result
     @staticmethod
@@ -387,12 +1188,85 @@ class StoreRuntime:
             raise e
         return syn
 
-    def record_run_time_result_synapse(self, rows: MultiRow) -> None:
+    @staticmethod
+    def add_missing_columns(
+        syn: synapseclient.Synapse, table_schema: synapseclient.Schema
+    ) -> synapseclient.Schema:
+        """
+        Add the columns that were introduced after the result table was created, and widen the STRING columns that
+        were added with a smaller maximum size than STRING_COLUMN_SIZES
+        Args:
+            syn (synapseclient.Synapse): synapse object
+            table_schema (synapseclient.Schema): schema of the result table
+        Returns:
+            synapseclient.Schema: schema of the result table with all the columns
+        """
+        existing_columns = {col.name: col for col in syn.getTableColumns(table_schema)}
+        added_column_types = dict(ADDED_RESULT_COLUMNS)
+        narrow_columns = [
+            col
+            for name, col in existing_columns.items()
+            if added_column_types.get(name) == "STRING"
+            and col.columnType == "STRING"
+            and int(col.get("maximumSize", 50)) < STRING_COLUMN_SIZES[name]
+        ]
+        if narrow_columns:
+            # a column can not be edited: it is replaced by a wider one. Storing the schema with the new column would
+            # drop the values of the old one; they are only kept by a TableSchemaChangeRequest that maps the old column
+            # to the new one. synapseclient has no public method to send it, so this uses its private
+            # _async_table_update, which is why synapseclient is pinned in requirements.txt
+            changes = [
+                {
+                    "oldColumnId": col.id,
+                    "newColumnId": syn.store(result_column(col.name, "STRING")).id,
+                }
+                for col in narrow_columns
+            ]
+            logger.info(
+                f"Widening columns {[col.name for col in narrow_columns]} of the result table"
+            )
+            syn._async_table_update(
+                table_schema,
+                changes=[
+                    {
+                        "concreteType": "org.sagebionetworks.repo.model.table.TableSchemaChangeRequest",
+                        "entityId": table_schema.id,
+                        "changes": changes,
+                    }
+                ],
+            )
+            table_schema = syn.get(table_schema.id)
+
+        missing_columns = [
+            (name, column_type)
+            for name, column_type in ADDED_RESULT_COLUMNS
+            if name not in existing_columns
+        ]
+        if not missing_columns:
+            return table_schema
+
+        for name, column_type in missing_columns:
+            table_schema.addColumn(result_column(name, column_type))
+        logger.info(
+            f"Adding columns {[name for name, _ in missing_columns]} to the result table"
+        )
+        return syn.store(table_schema)
+
+    def record_run_time_result_synapse(
+        self, rows: MultiRow, syn: synapseclient.Synapse = None
+    ) -> None:
+        """
+        Add rows to the result table on synapse
+        Args:
+            rows (MultiRow): rows returned by save_run_time_result
+            syn (synapseclient.Synapse, optional): default to None. a synapse object that is already logged in. If not provided, login to synapse.
+        """
         # Load existing data from synapse
-        syn = self.login_synapse()
+        if syn is None:
+            syn = self.login_synapse()
 
         # get existing table from synapse
-        existing_table_schema = syn.get("syn51385540")
+        existing_table_schema = self.add_missing_columns(syn, syn.get(RESULT_TABLE_ID))
 
         # add new row to table
         syn.store(Table(existing_table_schema, rows))
@@ -0,0 +1,113 @@
+import uuid
+from typing import List, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from outcomes import is_success, outcome_of
+from retry import TimedResult
+from stats import LatencyStats
+
+# request parameter holding the url of the data model. Schematic downloads and parses the data model the first time
+# it sees a url, so the first requests of a scenario are slower than the next ones
+SCHEMA_URL_PARAM = "schema_url"
+
+# query parameter added to the data model url of a cold-start probe, so that the url was never seen by the server.
+# The file server ignores it, so the same data model is downloaded
+COLD_PROBE_QUERY_PARAM = "profiler_cold_start"
+
+
+def cold_probe_url(schema_url: str) -> str:
+    """
+    Get a url of a data model that the server never saw, so that a request using it misses any cache keyed by the url
+    Args:
+        schema_url (str): url of the data model
+    Returns:
+        str: the url with a unique COLD_PROBE_QUERY_PARAM
+    """
+    parts = urlsplit(schema_url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query.append((COLD_PROBE_QUERY_PARAM, uuid.uuid4().hex))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def cold_probe_params(params: dict) -> dict:
+    """
+    Get the parameters of a cold-start probe
+    Args:
+        params (dict): parameters of the scenario. Must have a SCHEMA_URL_PARAM
+    Returns:
+        dict: a copy of the parameters with a data model url that the server never saw
+    """
+    return {**params, SCHEMA_URL_PARAM: cold_probe_url(params[SCHEMA_URL_PARAM])}
+
+
+class ColdStartStats:
+    """
+    Latency of the requests sent before a run: the warm-up requests, which are excluded from the stats of the run,
+    and the cold-start probe, which shows how much slower a request is when the server did not cache the data model
+    """
+
+    def __init__(self):
+        self.warmup = LatencyStats()
+        # latency of the first warm-up request, the one that found the server cold
+        self.cold_latency: Optional[float] = None
+        self.warmup_errors = 0
+        self.probe_latency: Optional[float] = None
+        self.probe_outcome: Optional[str] = None
+
+    def record_warmup(self, result: TimedResult) -> None:
+        """
+        Add a warm-up request
+        Args:
+            result (TimedResult): result of the request
+        """
+        if self.cold_latency is None:
+            self.cold_latency = result.latency
+        self.warmup.record(result.latency)
+        if not is_success(outcome_of(result.response)):
+            self.warmup_errors += 1
+
+    def record_probe(self, result: TimedResult) -> None:
+        """
+        Add the cold-start probe
+        Args:
+            result (TimedResult): result of the request
+        """
+        self.probe_latency = result.latency
+        self.probe_outcome = outcome_of(result.response)
+
+    def probe_ratio(self, warm_latency: Optional[float]) -> Optional[float]:
+        """
+        Get how many times slower the cold-start probe was than a warm request. Close to 1 if the server does not
+        gain anything from caching the data model
+        Args:
+            warm_latency (float): latency of a warm request, for example the p50 latency of the run
+        Returns:
+            float: latency of the probe divided by warm_latency, or None if there was no probe
+        """
+        if self.probe_latency is None or not warm_latency:
+            return None
+        return self.probe_latency / warm_latency
+
+    def to_row(
+        self, warm_latency: Optional[float] = None
+    ) -> List[Optional[Union[int, float, str]]]:
+        """
+        Get the values stored in a result row
+        Args:
+            warm_latency (float, optional): default to None. latency of a warm request, for example the p50 latency of the run
+        Returns:
+            list: number of warm-up requests, latency of the first one and p50 latency of all of them (in seconds,
+                rounded to 4 decimals), latency and outcome of the cold-start probe and its ratio to warm_latency
+        """
+        latencies = [
+            self.cold_latency,
+            self.warmup.percentile(50),
+            self.probe_latency,
+        ]
+        ratio = self.probe_ratio(warm_latency)
+        return [
+            self.warmup.count,
+            *(None if value is None else round(value, 4) for value in latencies),
+            self.probe_outcome,
+            None if ratio is None else round(ratio, 2),
+        ]
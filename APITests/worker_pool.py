@@ -0,0 +1,132 @@
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List
+
+logger = logging.getLogger("worker-pool")
+
+# maximum number of threads of the shared pool. A run that asks for more concurrent requests is capped, and its
+# achieved_concurrency column shows it
+MAX_WORKERS = int(os.environ.get("PROFILER_MAX_WORKERS", "1000"))
+
+
+class WorkerPool:
+    """
+    A pool of threads that send the requests of the thread engine. It grows to the number of workers asked for and
+    keeps its threads for the next runs. Unlike ThreadPoolExecutor, which starts a thread when a task is submitted,
+    the threads are started and waiting before any task is submitted, so starting them is never timed.
+    """
+
+    def __init__(self, name: str = "request-worker"):
+        self.name = name
+        self._tasks: queue.SimpleQueue = queue.SimpleQueue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self._threads)
+
+    def _work(self, started: threading.Semaphore) -> None:
+        started.release()
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            future, func, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as err:
+                future.set_exception(err)
+            else:
+                future.set_result(result)
+
+    def resize(self, workers: int) -> None:
+        """
+        Start threads until the pool has `workers` threads, and wait for them to be ready. The pool never shrinks.
+        Args:
+            workers (int): number of threads
+        """
+        with self._lock:
+            new_workers = workers - len(self._threads)
+            if new_workers <= 0:
+                return
+            started = threading.Semaphore(0)
+            for _ in range(new_workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(started,),
+                    name=f"{self.name}-{len(self._threads)}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+            for _ in range(new_workers):
+                started.acquire()
+            logger.debug(f"Worker pool size set to {len(self._threads)}")
+
+    def submit(
+        self, func: Callable, *args: Any, **kwargs: Any
+    ) -> concurrent.futures.Future:
+        """
+        Run a function on a thread of the pool
+        Args:
+            func (Callable): the function
+            args: arguments passed to func
+            kwargs: keyword arguments passed to func
+        Returns:
+            concurrent.futures.Future: the result of the function
+        """
+        future = concurrent.futures.Future()
+        self._tasks.put((future, func, args, kwargs))
+        return future
+
+    def shutdown(self) -> None:
+        """
+        Stop the threads once the tasks already submitted are done
+        """
+        with self._lock:
+            for _ in self._threads:
+                self._tasks.put(None)
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+
+
+_pool = WorkerPool()
+# number of workers reserved by the runs in progress
+_reserved = 0
+_reserved_lock = threading.Lock()
+
+
+@contextmanager
+def reserve_workers(workers: int) -> Iterator[WorkerPool]:
+    """
+    Get the shared pool with enough threads for `workers` more concurrent requests, up to MAX_WORKERS threads.
+    Runs in progress at the same time reserve their own workers, so they never wait for each other's threads.
+    The threads are started before the block, so workers should be reserved before timing starts.
+    Args:
+        workers (int): number of requests the block sends at the same time
+    Yields:
+        WorkerPool: the shared pool
+    """
+    global _reserved
+    with _reserved_lock:
+        _reserved += workers
+        reserved = _reserved
+    if reserved > MAX_WORKERS:
+        logger.warning(
+            f"{reserved} concurrent requests need more than {MAX_WORKERS} threads (PROFILER_MAX_WORKERS). "
+            "Some requests will wait for a thread."
+        )
+    try:
+        _pool.resize(min(reserved, MAX_WORKERS))
+        yield _pool
+    finally:
+        with _reserved_lock:
+            _reserved -= workers